@@ -1,11 +1,15 @@
 """
 Spotify Podcast Summarizer - Backend API
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
 import ssl
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # 確保 ffmpeg 路徑在 PATH 中
 home_bin = os.path.expanduser("~/bin")
@@ -24,8 +28,18 @@ except ImportError:
 ssl._create_default_https_context = ssl._create_unverified_context
 
 from services.spotify import SpotifyService
-from services.transcriber import TranscriberService
+from services.transcriber import TranscriberService, TranscriberBusyError
 from services.summarizer import SummarizerService
+from services.cache import SummaryCache
+from services.jobs import JobQueue, QueueFullError
+from services.transcript_store import TranscriptStore, SOURCES
+from services.batch import StageLimits, BatchProgress
+from services.offline_batch import OfflineBatchSummarizer
+from services.singleflight import SingleFlight
+from services.rate_limit import ModelBusyError, lane
+from services.model_router import DETAILS
+from services.metrics import prometheus_histogram, prometheus_values
+from services import tracing
 
 load_dotenv()
 
@@ -36,6 +50,16 @@ CORS(app)
 spotify_service = SpotifyService()
 transcriber_service = TranscriberService()
 summarizer_service = SummarizerService()
+summary_cache = SummaryCache()
+job_queue = JobQueue()
+transcript_store = TranscriptStore()
+singleflight = SingleFlight()
+# 批次工作進度（batch_id（即工作 ID）→ BatchProgress）
+batches = {}
+
+# 可選：啟動時預先載入 Whisper 模型（搭配 gunicorn --preload 可讓各 worker 共用記憶體）
+if os.getenv('WHISPER_PRELOAD', '').lower() in ('1', 'true', 'yes') and transcriber_service.available:
+    transcriber_service.preload()
 
 
 @app.route('/api/health', methods=['GET'])
@@ -44,13 +68,238 @@ def health_check():
     return jsonify({"status": "ok", "message": "Server is running"})
 
 
+def lookup_cached_summary(url: str, detail: str = "full") -> tuple:
+    """
+    查詢快取（以影片 / 節目 ID + 詳細程度為鍵，不需連網）
+
+    Returns:
+        tuple: (來源 ID, 快取鍵, 快取內容或 None)
+    """
+    source_id = spotify_service.get_source_id(url)
+    if not source_id:
+        return None, None, None
+
+    cache_key = SummaryCache.make_key(source_id, summarizer_service.cache_version(detail))
+    cached = summary_cache.get(cache_key)
+    if cached:
+        print(f"[Cache] 命中快取: {source_id}")
+        cached['cached'] = True
+    return source_id, cache_key, cached
+
+
+def fetch_transcript(url: str, report=None, source_id: str = None, model_size: str = None) -> tuple:
+    """
+    下載並取得文字稿（呼叫端需負責清理音訊檔案）
+    已儲存過的文字稿直接讀取，不需重新下載或轉錄
+
+    Args:
+        model_size: Whisper 模型大小（僅在需要轉錄時使用）
+
+    Returns:
+        tuple: (音訊檔案路徑或 None, 文字稿, 元資料)
+    """
+    report = report or (lambda stage, progress: None)
+
+    stored = load_stored_transcript(source_id)
+    if stored:
+        return stored
+
+    if transcriber_service.streaming and 'spotify.com' in url:
+        # Spotify 音訊：邊下載邊轉錄，不落地暫存檔
+        print(f"[Step 1] 解析音訊來源: {url}")
+        report('download', 10)
+        audio_url, metadata = spotify_service.resolve_spotify_audio(url)
+        print(f"[Step 2] 邊下載邊轉錄...")
+        report('transcribe', 30)
+        audio_path = None
+        transcript = transcriber_service.transcribe_stream(
+            spotify_service.stream_audio(audio_url), model_size=model_size
+        )
+        print(f"[Step 2] 轉錄完成，共 {len(transcript.get('segments', []))} 段")
+        return audio_path, _save_transcript(source_id, transcript, metadata), metadata
+
+    # Step 1: 下載 Podcast（YouTube 會優先嘗試取得字幕）
+    print(f"[Step 1] 開始下載: {url}")
+    report('download', 10)
+    audio_path, metadata = spotify_service.download_podcast(url)
+
+    # Step 2: 取得文字稿
+    # V2: 如果已有字幕，直接使用（跳過 Whisper）
+    transcript = subtitle_transcript(metadata)
+    if transcript is None:
+        print(f"[Step 1] 下載完成: {audio_path}")
+        print(f"[Step 2] 開始轉錄...")
+        report('transcribe', 30)
+        try:
+            transcript = transcriber_service.transcribe(audio_path, model_size=model_size)
+        except Exception:
+            spotify_service.cleanup(audio_path)
+            raise
+        print(f"[Step 2] 轉錄完成，共 {len(transcript.get('segments', []))} 段")
+
+    return audio_path, _save_transcript(source_id, transcript, metadata), metadata
+
+
+def load_stored_transcript(source_id: str) -> tuple:
+    """
+    讀取已儲存的文字稿
+
+    Returns:
+        tuple: (None, 文字稿, 元資料)，格式同 fetch_transcript；沒有儲存過時為 None
+    """
+    stored = transcript_store.load(source_id) if source_id else None
+    if not stored:
+        return None
+    transcript, metadata = stored
+    print(f"[Step 2] 使用已儲存的文字稿: {source_id}（{metadata.get('source')}）")
+    return None, transcript, metadata
+
+
+def subtitle_transcript(metadata: dict) -> dict:
+    """下載時已取得字幕則取出作為文字稿（不需 Whisper），否則為 None"""
+    if not (metadata.get('has_subtitles') and metadata.get('transcript')):
+        return None
+    print(f"[Step 2] 使用 YouTube 字幕（快速模式）")
+    transcript = metadata.pop('transcript')
+    print(f"[Step 2] 字幕載入完成，共 {len(transcript.get('segments', []))} 段")
+    return transcript
+
+
+def _save_transcript(source_id: str, transcript: dict, metadata: dict) -> dict:
+    """儲存文字稿供之後重新摘要使用（失敗不影響本次請求）"""
+    if source_id and transcript.get('segments'):
+        source = "subtitles" if metadata.get('has_subtitles') else "whisper"
+        try:
+            transcript_store.save(source_id, source, transcript, metadata)
+        except Exception as e:
+            print(f"[TranscriptStore] 儲存失敗: {e}")
+    return transcript
+
+
+def build_result(metadata: dict, summary: dict) -> dict:
+    """組合 API 回應內容"""
+    return {
+        "success": True,
+        "version": "v3",
+        "title": metadata.get('title', '未知標題'),
+        "duration": metadata.get('duration', ''),
+        "source": "subtitles" if metadata.get('has_subtitles') else "whisper",
+        # V3 精華內容版
+        "one_liner": summary.get('one_liner', ''),
+        "article": summary.get('article', []),
+        "insights": summary.get('insights', []),
+        "data_highlights": summary.get('data_highlights', []),
+        "quotes": summary.get('quotes', []),
+        "timestamps": summary.get('timestamps', []),
+        # 使用的詳細程度、tier 與模型
+        "routing": summary.get('routing'),
+    }
+
+
+def store_result(source_id: str, cache_key: str, result: dict):
+    """寫入快取；JSON 解析失敗時（無 one_liner）不寫入，避免快取錯誤結果"""
+    if cache_key and result['one_liner']:
+        summary_cache.set(cache_key, source_id, result)
+
+
+def finish_result(source_id: str, cache_key: str, metadata: dict, summary: dict) -> dict:
+    """組合回應並寫入快取"""
+    result = build_result(metadata, summary)
+    store_result(source_id, cache_key, result)
+    return result
+
+
+def transcript_events(transcript: dict, metadata: dict) -> list:
+    """取得文字稿後送出的串流事件（metadata、transcript）"""
+    return [
+        sse_event('metadata', {
+            "title": metadata.get('title', '未知標題'),
+            "duration": metadata.get('duration', ''),
+        }),
+        sse_event('transcript', {
+            "source": "subtitles" if metadata.get('has_subtitles') else "whisper",
+            "segments": len(transcript.get('segments', [])),
+        }),
+    ]
+
+
+def finish_flight(cache_key: str, flight, result: dict, error: Exception):
+    """
+    結束串流流程的 single-flight，讓等待同一來源的請求取得結果
+    用戶端中斷連線時 result / error 皆為空，等待者收到錯誤後可自行重試
+    """
+    if flight:
+        if result is None and error is None:
+            error = RuntimeError("摘要流程已中斷，請重新送出")
+        singleflight.finish(cache_key, flight, result=result, error=error)
+
+
+def run_summary_pipeline(url: str, report=None, model_size: str = None, limits: StageLimits = None,
+                         detail: str = "full") -> dict:
+    """
+    執行完整摘要流程：快取 → 下載 / 字幕 → 轉錄 → 摘要
+
+    Args:
+        url: YouTube 或 Spotify 連結
+        report: 進度回報函式 report(stage, progress)，可選
+        model_size: Whisper 模型大小，可選
+        limits: 各階段（fetch / summarize）的同時執行上限，批次處理時使用
+        detail: full（完整精華文章）/ quick（只有一句話總結與時間軸）
+
+    Returns:
+        dict: API 回應內容（含本次請求各階段耗時 timings）
+    """
+    with tracing.start_trace() as trace:
+        source_id, cache_key, cached = lookup_cached_summary(url, detail)
+        if cached:
+            result = cached
+        elif not cache_key:
+            result = _summarize_uncached(url, source_id, cache_key, report, model_size, limits, detail)
+        else:
+            # 同一來源同時有多個請求時只執行一次，其他請求共用結果
+            result, shared = singleflight.do(
+                cache_key, _summarize_uncached, url, source_id, cache_key, report, model_size, limits, detail
+            )
+            if shared:
+                print(f"[SingleFlight] 共用進行中的結果: {source_id}")
+                result = dict(result, coalesced=True)
+    return dict(result, timings=trace.timings())
+
+
+def _summarize_uncached(url: str, source_id: str, cache_key: str, report=None, model_size: str = None,
+                        limits: StageLimits = None, detail: str = "full") -> dict:
+    """下載 / 字幕 → 轉錄 → 摘要 → 寫入快取"""
+    report = report or (lambda stage, progress: None)
+    limits = limits or StageLimits()
+    # Claude 呼叫已排隊過久時，在下載與轉錄前就先拒絕
+    summarizer_service.rate_limiter.check()
+
+    with limits.stage('fetch'):
+        audio_path, transcript, metadata = fetch_transcript(url, report, source_id, model_size)
+    try:
+        # Step 3: 生成摘要
+        print(f"[Step 3] 開始生成摘要...")
+        report('summarize', 60)
+        with limits.stage('summarize'):
+            summary = summarizer_service.generate_summary(transcript, metadata, detail=detail)
+        print(f"[Step 3] 摘要完成")
+    finally:
+        # 清理暫存檔案
+        if audio_path:
+            spotify_service.cleanup(audio_path)
+
+    return finish_result(source_id, cache_key, metadata, summary)
+
+
 @app.route('/api/summarize', methods=['POST'])
 def summarize_podcast():
     """
-    摘要 Podcast 節目
+    摘要 Podcast 節目（同步，等待完成才回應）
 
     Request Body:
         - url: Spotify Podcast 連結
+        - model_size: Whisper 模型大小（可選）
+        - detail: full（預設，完整精華文章）/ quick（只有一句話總結與時間軸，使用較快的模型）
 
     Response:
         - title: 節目標題
@@ -61,54 +310,597 @@ def summarize_podcast():
 
     if not data or 'url' not in data:
         return jsonify({"error": "請提供 Spotify Podcast 連結"}), 400
+    if data.get('detail', 'full') not in DETAILS:
+        return jsonify({"error": f"detail 必須為 {' / '.join(DETAILS)}"}), 400
+
+    try:
+        return jsonify(run_summary_pipeline(
+            data['url'], model_size=data.get('model_size'), detail=data.get('detail', 'full')
+        ))
+    except TranscriberBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "60"}
+    except ModelBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        import traceback
+        print(f"[ERROR] {traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/summarize/stream', methods=['POST'])
+def summarize_podcast_stream():
+    """
+    摘要 Podcast 節目（Server-Sent Events 串流）
+
+    Request Body:
+        - url: YouTube 或 Spotify 連結
+        - model_size: Whisper 模型大小（可選）
+        - detail: full / quick（同 /api/summarize）
+
+    Events:
+        - stage: {"stage": "download" / "summarize"}（download 包含取得字幕或 Whisper 轉錄）
+        - metadata: {"title", "duration"}
+        - transcript: {"source", "segments"} 文字稿段落數
+        - section: {"key", "value"} 每完成一個摘要欄位送出一次
+        - done: 完整結果（格式同 /api/summarize）
+        - error: {"error"}（Claude 忙碌時另含 retry_after 秒數）
+    """
+    data = request.get_json(silent=True)
+
+    if not data or 'url' not in data:
+        return jsonify({"error": "請提供 YouTube 或 Spotify 連結"}), 400
+    if data.get('detail', 'full') not in DETAILS:
+        return jsonify({"error": f"detail 必須為 {' / '.join(DETAILS)}"}), 400
 
     url = data['url']
+    detail = data.get('detail', 'full')
+
+    def generate():
+        with tracing.start_trace() as trace:
+            yield from _stream_pipeline(trace)
+
+    def _stream_pipeline(trace):
+        source_id, cache_key, cached = lookup_cached_summary(url, detail)
+        if cached:
+            yield sse_event('done', dict(cached, timings=trace.timings()))
+            return
+
+        # 同一來源已有進行中的流程（串流或一般請求）時，等待並共用其結果
+        flight, leader = singleflight.begin(cache_key) if cache_key else (None, True)
+        if not leader:
+            print(f"[SingleFlight] 串流請求共用進行中的結果: {source_id}")
+            yield sse_event('stage', {"stage": "summarize"})
+            try:
+                yield sse_event('done', dict(flight.wait(), coalesced=True, timings=trace.timings()))
+            except Exception as e:
+                yield sse_event('error', error_payload(e))
+            return
+
+        audio_path = None
+        result = None
+        error = None
+        try:
+            summarizer_service.rate_limiter.check()
+            yield sse_event('stage', {"stage": "download"})
+            audio_path, transcript, metadata = fetch_transcript(
+                url, source_id=source_id, model_size=data.get('model_size')
+            )
+            yield from transcript_events(transcript, metadata)
+
+            print(f"[Step 3] 開始串流生成摘要...")
+            yield sse_event('stage', {"stage": "summarize"})
+            summary = {}
+            for event, payload in summarizer_service.stream_summary(transcript, metadata, detail=detail):
+                if event == 'section':
+                    yield sse_event('section', payload)
+                else:
+                    summary = payload
+            print(f"[Step 3] 摘要完成")
+
+            result = finish_result(source_id, cache_key, metadata, summary)
+            yield sse_event('done', dict(result, timings=trace.timings()))
+
+        except Exception as e:
+            import traceback
+            print(f"[ERROR] {traceback.format_exc()}")
+            error = e
+            yield sse_event('error', error_payload(e))
+        finally:
+            if audio_path:
+                spotify_service.cleanup(audio_path)
+            finish_flight(cache_key, flight, result, error)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def sse_event(event: str, data: dict) -> str:
+    """格式化 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def error_payload(error: Exception) -> dict:
+    """串流 error 事件內容；Claude 忙碌時附上建議的重試秒數"""
+    payload = {"error": str(error)}
+    if isinstance(error, ModelBusyError):
+        payload["retry_after"] = error.retry_after
+    return payload
+
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    提交摘要工作（立即回傳工作 ID，背景執行）
+
+    Request Body:
+        - url: YouTube 或 Spotify 連結
+        - model_size: Whisper 模型大小（可選）
+        - detail: full / quick（同 /api/summarize）
+
+    Response (202):
+        - job_id: 工作 ID，用 GET /api/jobs/<job_id> 查詢進度
+    """
+    data = request.get_json(silent=True)
+
+    if not data or 'url' not in data:
+        return jsonify({"error": "請提供 YouTube 或 Spotify 連結"}), 400
+    if data.get('detail', 'full') not in DETAILS:
+        return jsonify({"error": f"detail 必須為 {' / '.join(DETAILS)}"}), 400
 
     try:
-        # Step 1: 下載 Podcast（YouTube 會優先嘗試取得字幕）
-        print(f"[Step 1] 開始下載: {url}")
-        audio_path, metadata = spotify_service.download_podcast(url)
-
-        # Step 2: 取得文字稿
-        # V2: 如果已有字幕，直接使用（跳過 Whisper）
-        if metadata.get('has_subtitles') and metadata.get('transcript'):
-            print(f"[Step 2] 使用 YouTube 字幕（快速模式）")
-            transcript = metadata['transcript']
-            print(f"[Step 2] 字幕載入完成，共 {len(transcript.get('segments', []))} 段")
+        summarizer_service.rate_limiter.check()
+        job_id = job_queue.submit(run_summary_pipeline, data['url'], model_size=data.get('model_size'),
+                                  detail=data.get('detail', 'full'))
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    except ModelBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    查詢工作狀態
+
+    Response:
+        - status: queued / running / done / failed
+        - stage: queued / download / transcribe / summarize / done
+        - progress: 0-100
+        - result: 完成時為摘要內容（格式同 /api/summarize）
+        - error: 失敗時的錯誤訊息
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "找不到此工作"}), 404
+    return jsonify(job)
+
+
+@app.route('/api/batch', methods=['POST'])
+def create_batch():
+    """
+    批次摘要（背景工作）
+
+    Request Body:
+        - url: YouTube 播放清單 / 頻道、Spotify 節目或 Podcast RSS 網址
+        - urls: 或直接提供連結清單
+        - limit: 最多處理幾集（可選，預設 BATCH_MAX_ITEMS）
+
+    Response (202):
+        - batch_id: 用 GET /api/batch/<batch_id> 查詢各項目狀態
+    """
+    data = request.get_json(silent=True) or {}
+    max_items = int(os.getenv('BATCH_MAX_ITEMS', 200))
+    limit = data.get('limit')
+    if limit is None:
+        limit = max_items
+    # bool 是 int 的子類別，需另外排除
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+        return jsonify({"error": "limit 必須為正整數"}), 400
+    limit = min(limit, max_items)
+
+    urls = data.get('urls')
+    if urls is not None and not _is_string_list(urls):
+        return jsonify({"error": "urls 必須為非空字串的清單"}), 400
+
+    if urls:
+        items = [{"url": url.strip(), "title": ""} for url in urls[:limit]]
+    elif data.get('url'):
+        try:
+            # 只展開清單（一次請求），各集內容在背景工作中處理
+            items = spotify_service.expand_collection(data['url'], limit)
+        except Exception as e:
+            return jsonify({"error": f"無法展開清單：{str(e)}"}), 400
+    else:
+        return jsonify({"error": "請提供清單網址或連結清單"}), 400
+
+    if not items:
+        return jsonify({"error": "清單中沒有可處理的項目"}), 400
+
+    progress = BatchProgress(items)
+    try:
+        job_id = job_queue.submit(run_batch, progress)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    _prune_batches()
+    batches[job_id] = progress
+    return jsonify({"success": True, "batch_id": job_id, "total": len(items)}), 202
+
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """
+    查詢批次進度
+
+    Response:
+        - status: queued / running / done / failed
+        - total / counts: 各狀態數量（pending / running / cached / done / failed / duplicate）
+        - items_per_minute: 實際處理的吞吐量
+        - items: 各項目狀態（完成的摘要請用 /api/summarize 取得，會直接命中快取）
+    """
+    job = job_queue.get(batch_id)
+    progress = batches.get(batch_id)
+    if job is None or progress is None:
+        return jsonify({"error": "找不到此批次"}), 404
+
+    snapshot = progress.snapshot()
+    snapshot.update(status=job['status'], error=job['error'])
+    return jsonify(snapshot)
+
+
+def _is_string_list(value) -> bool:
+    """是否為由非空字串組成的清單"""
+    return isinstance(value, list) and all(isinstance(item, str) and item.strip() for item in value)
+
+
+def _prune_batches():
+    """移除工作已過期的批次進度"""
+    for batch_id in [batch_id for batch_id in batches if job_queue.get(batch_id) is None]:
+        batches.pop(batch_id, None)
+
+
+def run_batch(progress: BatchProgress, report=None) -> dict:
+    """
+    依各階段上限平行處理批次項目；已摘要過（快取命中）與重複的項目直接略過
+    """
+    report = report or (lambda stage, progress: None)
+    fetch_limit = int(os.getenv('BATCH_FETCH_CONCURRENCY', 2))
+    summarize_limit = int(os.getenv('BATCH_SUMMARIZE_CONCURRENCY', 2))
+    limits = StageLimits(fetch=fetch_limit, summarize=summarize_limit)
+
+    pending = []
+    seen = set()
+    for index, item in enumerate(progress.items):
+        source_id, _, cached = lookup_cached_summary(item['url'])
+        if source_id in seen:
+            progress.update(index, status="duplicate")
+        elif cached:
+            progress.update(index, status="cached", title=cached.get('title', item['title']))
         else:
-            print(f"[Step 1] 下載完成: {audio_path}")
-            print(f"[Step 2] 開始轉錄...")
-            transcript = transcriber_service.transcribe(audio_path)
-            print(f"[Step 2] 轉錄完成，共 {len(transcript.get('segments', []))} 段")
+            pending.append(index)
+        if source_id:
+            seen.add(source_id)
 
-        # Step 3: 生成摘要
-        print(f"[Step 3] 開始生成摘要...")
-        summary = summarizer_service.generate_summary(transcript, metadata)
-        print(f"[Step 3] 摘要完成")
+    completed = [0]
+    lock = threading.Lock()
 
-        # 清理暫存檔案
-        if audio_path:
-            spotify_service.cleanup(audio_path)
+    def process(index):
+        item = progress.items[index]
+        start = time.perf_counter()
+        progress.update(index, status="running")
+        try:
+            # 批次項目使用 batch 優先順序，不搶互動請求的 Claude 額度
+            with lane("batch"):
+                result = run_summary_pipeline(
+                    item['url'],
+                    report=lambda stage, _: progress.update(index, stage=stage),
+                    limits=limits,
+                )
+            progress.update(index, status="done", title=result.get('title', item['title']))
+        except Exception as e:
+            print(f"[Batch] {item['url']} 失敗: {e}")
+            progress.update(index, status="failed", error=str(e))
+        progress.update(index, stage=None, seconds=round(time.perf_counter() - start, 1))
 
-        return jsonify({
-            "success": True,
-            "version": "v3",
-            "title": metadata.get('title', '未知標題'),
-            "duration": metadata.get('duration', ''),
-            "source": "subtitles" if metadata.get('has_subtitles') else "whisper",
-            # V3 精華內容版
-            "one_liner": summary.get('one_liner', ''),
-            "article": summary.get('article', []),
-            "insights": summary.get('insights', []),
-            "data_highlights": summary.get('data_highlights', []),
-            "quotes": summary.get('quotes', []),
-            "timestamps": summary.get('timestamps', [])
-        })
+        with lock:
+            completed[0] += 1
+            report('batch', int(completed[0] * 100 / len(pending)))
 
-    except Exception as e:
-        import traceback
-        print(f"[ERROR] {traceback.format_exc()}")
-        return jsonify({"error": str(e)}), 500
+    print(f"[Batch] 共 {len(progress.items)} 項，需處理 {len(pending)} 項")
+    report('batch', 0)
+    # 執行緒數 = 各階段上限總和，讓下載 / 轉錄與摘要可以同時進行
+    with ThreadPoolExecutor(max_workers=fetch_limit + summarize_limit, thread_name_prefix='batch') as executor:
+        list(executor.map(process, pending))
+
+    progress.finish()
+    snapshot = progress.snapshot()
+    return {key: snapshot[key] for key in ("total", "counts", "elapsed_seconds", "items_per_minute")}
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """快取命中與相同請求合併統計"""
+    stats = summary_cache.stats()
+    stats["coalescing"] = singleflight.stats()
+    return jsonify(stats)
+
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """
+    清除摘要快取
+
+    Request Body:
+        - url 或 source_id: 指定要清除的節目
+        - all: true 時清除全部（需明確指定，避免誤送空白請求清掉所有已付費的摘要）
+    """
+    data = request.get_json(silent=True) or {}
+
+    source_id = data.get('source_id')
+    if not source_id and data.get('url'):
+        source_id = spotify_service.get_source_id(data['url'])
+        if not source_id:
+            return jsonify({"error": "無法辨識的連結"}), 400
+    if not source_id and data.get('all') is not True:
+        return jsonify({"error": "請提供 url 或 source_id；清除全部快取需指定 all: true"}), 400
+
+    removed = summary_cache.invalidate(source_id)
+    return jsonify({"success": True, "source_id": source_id, "removed": removed})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 指標（各階段延遲分佈、token 用量、快取與佇列狀態）"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def render_metrics() -> str:
+    """組合各服務的統計為 Prometheus 文字格式"""
+    traced = tracing.snapshot()
+    transcriber = transcriber_service.get_metrics()
+    summarizer = summarizer_service.get_metrics()
+    resolver = spotify_service.get_resolver_metrics()
+
+    lines = prometheus_histogram(
+        "podcast_stage_duration_seconds",
+        [({"stage": stage}, snap) for stage, snap in sorted(traced["durations"].items())],
+        "各階段耗時（下載、字幕、轉錄、摘要、模型呼叫）",
+    )
+    lines += prometheus_values(
+        "podcast_stage_errors_total",
+        [({"stage": stage}, count) for stage, count in sorted(traced["errors"].items())],
+        "counter", "各階段失敗次數",
+    )
+    # 各階段累計數量：bytes_downloaded、segments、audio_seconds、input_tokens、output_tokens 等
+    names = sorted({name for totals in traced["totals"].values() for name in totals})
+    for name in names:
+        lines += prometheus_values(
+            f"podcast_stage_{name}_total",
+            [({"stage": stage}, totals[name]) for stage, totals in sorted(traced["totals"].items())
+             if name in totals],
+            "counter", f"各階段累計 {name}",
+        )
+
+    lines += prometheus_histogram(
+        "podcast_transcriber_queue_wait_seconds", [({}, transcriber["queue_wait_seconds"])], "轉錄排隊等待時間")
+    lines += prometheus_histogram(
+        "podcast_transcriber_inference_seconds", [({}, transcriber["inference_seconds"])], "Whisper 推論時間")
+    lines += prometheus_values(
+        "podcast_transcriber_jobs",
+        [({"state": "waiting"}, transcriber["waiting"]), ({"state": "active"}, transcriber["active"])],
+        help_text="轉錄中 / 排隊中的工作數",
+    )
+    lines += prometheus_histogram(
+        "podcast_llm_call_seconds",
+        [({"kind": kind, "prompt_cache": state}, snap)
+         for kind, states in sorted(summarizer["latency_seconds"].items())
+         for state, snap in sorted(states.items()) if isinstance(snap, dict)],
+        "Claude 呼叫延遲（依 prompt cache 命中與否）",
+    )
+    lines += prometheus_values(
+        "podcast_llm_usage_total",
+        [({"type": key}, value) for key, value in sorted(summarizer["usage"].items())],
+        "counter", "Claude 呼叫次數與 token 用量",
+    )
+    tiers = summarizer["routing"]["tiers"]
+    lines += prometheus_histogram(
+        "podcast_summary_tier_seconds",
+        [({"tier": name, "model": tier["model"]}, tier["latency_seconds"]) for name, tier in sorted(tiers.items())],
+        "各 tier 完整摘要耗時",
+    )
+    lines += prometheus_values(
+        "podcast_summary_tier_usage_total",
+        [({"tier": name, "type": key}, tier[key]) for name, tier in sorted(tiers.items())
+         for key in ("summaries", "calls", "batch_calls", "input_tokens", "output_tokens", "cost_usd")],
+        "counter", "各 tier 摘要次數、Claude 呼叫次數（含 Message Batches）、token 用量與估算費用（美元）",
+    )
+    rate_limit = summarizer["rate_limit"]
+    lines += prometheus_histogram(
+        "podcast_llm_rate_limit_wait_seconds",
+        [({"lane": name}, snap) for name, snap in sorted(rate_limit["wait_seconds"].items())],
+        "Claude 呼叫等待額度的時間（依優先順序）",
+    )
+    lines += prometheus_values(
+        "podcast_llm_rate_limit_waiting",
+        [({"lane": name}, count) for name, count in sorted(rate_limit["waiting"].items())],
+        help_text="等待額度中的 Claude 呼叫數",
+    )
+    lines += prometheus_values(
+        "podcast_llm_rate_limit_available",
+        [({"bucket": name}, bucket["available"]) for name, bucket in sorted(rate_limit["buckets"].items())],
+        help_text="各項每分鐘額度的剩餘量",
+    )
+    lines += prometheus_values(
+        "podcast_llm_rate_limit_events_total",
+        [({"event": key}, rate_limit[key]) for key in
+         ("acquired", "rejected", "retries", "rate_limited", "overloaded", "server_error", "connection_error")],
+        "counter", "Claude 呼叫取得額度、拒絕與重試次數",
+    )
+    lines += prometheus_histogram(
+        "podcast_resolver_seconds",
+        [({"source": source}, snap) for source, snap in sorted(resolver["latency_seconds"].items())],
+        "Spotify 音訊來源查詢延遲",
+    )
+
+    for name, stats in (("summary_cache", summary_cache.stats()),
+                        ("coalescing", singleflight.stats()),
+                        ("resolution_index", spotify_service.resolution_index.stats())):
+        lines += prometheus_values(
+            f"podcast_{name}", [({"field": key}, value) for key, value in sorted(stats.items())],
+            help_text=f"{name} 統計",
+        )
+    return "\n".join(lines) + "\n"
+
+
+@app.route('/api/spotify/prefetch', methods=['POST'])
+def spotify_prefetch():
+    """
+    預先匯入節目 RSS 到解析索引（背景工作），之後該節目的 Spotify 連結可立即解析
+
+    Request Body:
+        - feed_url: Podcast RSS 網址
+        - show_url: Spotify 節目連結（可選，需設定 SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET）
+    """
+    data = request.get_json(silent=True)
+
+    if not data or 'feed_url' not in data:
+        return jsonify({"error": "請提供 Podcast RSS 網址"}), 400
+
+    try:
+        job_id = job_queue.submit(prefetch_feed, data['feed_url'], data.get('show_url'))
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+def prefetch_feed(feed_url: str, show_url: str = None, report=None) -> dict:
+    """背景匯入 RSS"""
+    if report:
+        report('download', 0)
+    return spotify_service.prefetch_feed(feed_url, show_url)
+
+
+@app.route('/api/spotify/index/stats', methods=['GET'])
+def spotify_index_stats():
+    """Spotify 解析索引統計與各來源解析延遲"""
+    stats = spotify_service.resolution_index.stats()
+    stats["resolver"] = spotify_service.get_resolver_metrics()
+    return jsonify(stats)
+
+
+@app.route('/api/transcriber/stats', methods=['GET'])
+def transcriber_stats():
+    """Whisper 模型與佇列統計（等待時間 vs 推論時間）"""
+    return jsonify(transcriber_service.get_metrics())
+
+
+@app.route('/api/summarizer/stats', methods=['GET'])
+def summarizer_stats():
+    """Claude token 用量與 prompt cache 命中統計"""
+    return jsonify(summarizer_service.get_metrics())
+
+
+@app.route('/api/transcripts', methods=['GET'])
+def list_transcripts():
+    """列出已儲存的文字稿"""
+    return jsonify({"transcripts": transcript_store.list_transcripts()})
+
+
+@app.route('/api/transcripts/<source_id>', methods=['GET'])
+def get_transcript(source_id):
+    """
+    取得已儲存的文字稿
+
+    Query:
+        - source: subtitles / whisper（可選）
+    """
+    source = request.args.get('source')
+    if source is not None and source not in SOURCES:
+        return jsonify({"error": f"source 必須為 {' / '.join(SOURCES)}"}), 400
+
+    stored = transcript_store.load(source_id, source)
+    if stored is None:
+        return jsonify({"error": "找不到此文字稿"}), 404
+
+    transcript, metadata = stored
+    return jsonify({"metadata": metadata, "transcript": transcript})
+
+
+@app.route('/api/transcripts/resummarize', methods=['POST'])
+def resummarize_transcripts():
+    """
+    以已儲存的文字稿批次重新生成摘要（背景工作），結果寫入快取
+
+    Request Body:
+        - source_ids: 來源 ID 清單（未提供時處理全部文字稿）
+        - offline: true 時改用 Message Batches API（較便宜，但可能需數小時才完成）
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get('source_ids') is not None and not _is_string_list(data['source_ids']):
+        return jsonify({"error": "source_ids 必須為非空字串的清單"}), 400
+    source_ids = data.get('source_ids') or sorted({
+        item['source_id'] for item in transcript_store.list_transcripts() if item['source_id']
+    })
+    func = resummarize_offline if data.get('offline') else resummarize_from_store
+
+    try:
+        job_id = job_queue.submit(func, source_ids)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    return jsonify({"success": True, "job_id": job_id, "count": len(source_ids)}), 202
+
+
+def resummarize_from_store(source_ids: list, report=None) -> dict:
+    """逐一以已儲存文字稿重新摘要，回傳各項處理結果"""
+    report = report or (lambda stage, progress: None)
+    results = {}
+
+    for index, source_id in enumerate(source_ids):
+        report('summarize', int(index * 100 / max(len(source_ids), 1)))
+        stored = transcript_store.load(source_id)
+        if stored is None:
+            results[source_id] = "not_found"
+            continue
+
+        transcript, metadata = stored
+        try:
+            with lane("batch"):
+                summary = summarizer_service.generate_summary(transcript, metadata)
+            result = build_result(metadata, summary)
+            store_result(source_id, SummaryCache.make_key(source_id, summarizer_service.version), result)
+            results[source_id] = "done"
+        except Exception as e:
+            print(f"[Resummarize] {source_id} 失敗: {e}")
+            results[source_id] = f"failed: {e}"
+
+    return {"results": results}
+
+
+def resummarize_offline(source_ids: list, report=None) -> dict:
+    """以 Message Batches API 批次重新摘要已儲存的文字稿，結果寫入快取"""
+    items = []
+    missing = {}
+    for source_id in source_ids:
+        stored = transcript_store.load(source_id)
+        if stored is None:
+            missing[source_id] = "not_found"
+            continue
+        transcript, metadata = stored
+        items.append((source_id, transcript, metadata))
+
+    def on_result(source_id, metadata, summary):
+        store_result(source_id, SummaryCache.make_key(source_id, summarizer_service.version),
+                     build_result(metadata, summary))
+
+    outcome = OfflineBatchSummarizer(summarizer_service).run(items, on_result, report)
+    outcome["results"].update(missing)
+    return outcome
 
 
 if __name__ == '__main__':
@@ -0,0 +1,273 @@
+"""
+Spotify Podcast Summarizer - ASGI 入口（非同步模式）
+
+/api/summarize 與 /api/summarize/stream 以 asyncio 處理：查詢類 HTTP 請求走 httpx 非同步連線池、
+Claude 呼叫使用 AsyncAnthropic，等待網路時不佔用執行緒，單一行程可同時處理數百個摘要。
+yt-dlp、音訊檔下載、Whisper 轉錄與 SQLite（摘要快取、文字稿）沒有非同步 API，在執行緒池中執行（ASYNC_THREAD_WORKERS）。
+流程中與 I/O 無關的步驟（事件內容、組合結果等）與 app.py 共用同一組函式，這裡只保留非同步的 I/O 呼叫。
+其餘路由（工作佇列、批次、快取、/metrics 等）交給原本的 Flask app 處理。
+
+啟動:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+import os
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    app as flask_app,
+    spotify_service,
+    transcriber_service,
+    summarizer_service,
+    singleflight,
+    lookup_cached_summary,
+    load_stored_transcript,
+    subtitle_transcript,
+    finish_result,
+    transcript_events,
+    finish_flight,
+    sse_event,
+    error_payload,
+    _save_transcript,
+)
+from services import tracing
+from services.transcriber import TranscriberBusyError
+from services.rate_limit import ModelBusyError
+from services.model_router import DETAILS
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def afetch_transcript(url: str, source_id: str = None, model_size: str = None) -> tuple:
+    """
+    fetch_transcript 的非同步版本
+
+    Returns:
+        tuple: (音訊檔案路徑或 None, 文字稿, 元資料)
+    """
+    stored = await asyncio.to_thread(load_stored_transcript, source_id)
+    if stored:
+        return stored
+
+    if transcriber_service.streaming and 'spotify.com' in url:
+        # Spotify 音訊：邊下載邊轉錄，不落地暫存檔
+        print(f"[Step 1] 解析音訊來源: {url}")
+        audio_url, metadata = await spotify_service.aresolve_spotify_audio(url)
+        print(f"[Step 2] 邊下載邊轉錄...")
+        transcript = await asyncio.to_thread(
+            transcriber_service.transcribe_stream, spotify_service.stream_audio(audio_url), model_size=model_size
+        )
+        print(f"[Step 2] 轉錄完成，共 {len(transcript.get('segments', []))} 段")
+        return None, await asyncio.to_thread(_save_transcript, source_id, transcript, metadata), metadata
+
+    print(f"[Step 1] 開始下載: {url}")
+    audio_path, metadata = await spotify_service.adownload_podcast(url)
+
+    transcript = subtitle_transcript(metadata)
+    if transcript is None:
+        print(f"[Step 1] 下載完成: {audio_path}")
+        print(f"[Step 2] 開始轉錄...")
+        try:
+            transcript = await asyncio.to_thread(transcriber_service.transcribe, audio_path, model_size=model_size)
+        except Exception:
+            spotify_service.cleanup(audio_path)
+            raise
+        print(f"[Step 2] 轉錄完成，共 {len(transcript.get('segments', []))} 段")
+
+    return audio_path, await asyncio.to_thread(_save_transcript, source_id, transcript, metadata), metadata
+
+
+async def arun_summary_pipeline(url: str, model_size: str = None, detail: str = "full") -> dict:
+    """run_summary_pipeline 的非同步版本（同樣合併同一來源的同時請求、附上 timings）"""
+    with tracing.start_trace() as trace:
+        source_id, cache_key, cached = await asyncio.to_thread(lookup_cached_summary, url, detail)
+        if cached:
+            result = cached
+        elif not cache_key:
+            result = await _asummarize_uncached(url, source_id, cache_key, model_size, detail)
+        else:
+            result, shared = await singleflight.do_async(
+                cache_key, _asummarize_uncached, url, source_id, cache_key, model_size, detail
+            )
+            if shared:
+                print(f"[SingleFlight] 共用進行中的結果: {source_id}")
+                result = dict(result, coalesced=True)
+    return dict(result, timings=trace.timings())
+
+
+async def _asummarize_uncached(url: str, source_id: str, cache_key: str, model_size: str = None,
+                               detail: str = "full") -> dict:
+    summarizer_service.rate_limiter.check()
+    audio_path, transcript, metadata = await afetch_transcript(url, source_id, model_size)
+    try:
+        print(f"[Step 3] 開始生成摘要...")
+        summary = await summarizer_service.agenerate_summary(transcript, metadata, detail=detail)
+        print(f"[Step 3] 摘要完成")
+    finally:
+        if audio_path:
+            spotify_service.cleanup(audio_path)
+
+    return await asyncio.to_thread(finish_result, source_id, cache_key, metadata, summary)
+
+
+async def astream_events(url: str, model_size: str = None, detail: str = "full"):
+    """/api/summarize/stream 的非同步版本，事件與 app.py 相同"""
+    with tracing.start_trace() as trace:
+        source_id, cache_key, cached = await asyncio.to_thread(lookup_cached_summary, url, detail)
+        if cached:
+            yield sse_event('done', dict(cached, timings=trace.timings()))
+            return
+
+        flight, leader = singleflight.begin(cache_key) if cache_key else (None, True)
+        if not leader:
+            print(f"[SingleFlight] 串流請求共用進行中的結果: {source_id}")
+            yield sse_event('stage', {"stage": "summarize"})
+            try:
+                yield sse_event('done', dict(await flight.wait_async(), coalesced=True, timings=trace.timings()))
+            except Exception as e:
+                yield sse_event('error', error_payload(e))
+            return
+
+        audio_path = None
+        result = None
+        error = None
+        try:
+            summarizer_service.rate_limiter.check()
+            yield sse_event('stage', {"stage": "download"})
+            audio_path, transcript, metadata = await afetch_transcript(url, source_id, model_size)
+            for chunk in transcript_events(transcript, metadata):
+                yield chunk
+
+            print(f"[Step 3] 開始串流生成摘要...")
+            yield sse_event('stage', {"stage": "summarize"})
+            summary = {}
+            async for event, payload in summarizer_service.astream_summary(transcript, metadata, detail=detail):
+                if event == 'section':
+                    yield sse_event('section', payload)
+                else:
+                    summary = payload
+            print(f"[Step 3] 摘要完成")
+
+            result = await asyncio.to_thread(finish_result, source_id, cache_key, metadata, summary)
+            yield sse_event('done', dict(result, timings=trace.timings()))
+
+        except Exception as e:
+            import traceback
+            print(f"[ERROR] {traceback.format_exc()}")
+            error = e
+            yield sse_event('error', error_payload(e))
+        finally:
+            if audio_path:
+                spotify_service.cleanup(audio_path)
+            finish_flight(cache_key, flight, result, error)
+
+
+async def summarize_podcast(scope, receive, send):
+    """POST /api/summarize（格式同 app.py）"""
+    data = await read_json(receive)
+    if not data or 'url' not in data:
+        return await send_json(send, 400, {"error": "請提供 Spotify Podcast 連結"})
+    if data.get('detail', 'full') not in DETAILS:
+        return await send_json(send, 400, {"error": f"detail 必須為 {' / '.join(DETAILS)}"})
+
+    try:
+        result = await arun_summary_pipeline(
+            data['url'], model_size=data.get('model_size'), detail=data.get('detail', 'full')
+        )
+    except TranscriberBusyError as e:
+        return await send_json(send, 503, {"error": str(e)}, {"Retry-After": "60"})
+    except ModelBusyError as e:
+        return await send_json(send, 503, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        import traceback
+        print(f"[ERROR] {traceback.format_exc()}")
+        return await send_json(send, 500, {"error": str(e)})
+    await send_json(send, 200, result)
+
+
+async def summarize_podcast_stream(scope, receive, send):
+    """POST /api/summarize/stream（Server-Sent Events，事件同 app.py）"""
+    data = await read_json(receive)
+    if not data or 'url' not in data:
+        return await send_json(send, 400, {"error": "請提供 YouTube 或 Spotify 連結"})
+    if data.get('detail', 'full') not in DETAILS:
+        return await send_json(send, 400, {"error": f"detail 必須為 {' / '.join(DETAILS)}"})
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": _headers("text/event-stream; charset=utf-8", {
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }),
+    })
+    events = astream_events(data['url'], data.get('model_size'), data.get('detail', 'full'))
+    try:
+        async for chunk in events:
+            await send({"type": "http.response.body", "body": chunk.encode('utf-8'), "more_body": True})
+    finally:
+        # 用戶端中斷時關閉產生器，讓等待同一來源的請求收到錯誤而不是一直等待
+        await events.aclose()
+    await send({"type": "http.response.body", "body": b""})
+
+
+ROUTES = {
+    '/api/summarize': summarize_podcast,
+    '/api/summarize/stream': summarize_podcast_stream,
+}
+
+
+async def read_json(receive) -> dict:
+    """讀取請求內容並解析 JSON（格式錯誤時為 None）"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def send_json(send, status: int, data: dict, headers: dict = None):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send({"type": "http.response.start", "status": status,
+                "headers": _headers("application/json", headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _headers(content_type: str, extra: dict = None) -> list:
+    # 與 Flask-CORS 預設相同，允許所有來源（預檢請求 OPTIONS 由 Flask app 回應）
+    headers = {"Content-Type": content_type, "Access-Control-Allow-Origin": "*", **(extra or {})}
+    return [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers.items()]
+
+
+async def lifespan(receive, send):
+    """啟動時設定執行緒池大小；關閉時釋放非同步連線"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            workers = int(os.getenv('ASYNC_THREAD_WORKERS', 32))
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi-io')
+            )
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await spotify_service.aclose()
+            if summarizer_service.async_client is not None:
+                await summarizer_service.async_client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in ROUTES:
+        return await ROUTES[scope["path"]](scope, receive, send)
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,6 @@
+# Benchmarks module
+import os
+
+# stub LLM 不模擬 Anthropic 的每分鐘額度，且延遲經過縮放；基準測試預設不啟用速率限制（可自行設定環境變數覆寫）
+for _name in ('ANTHROPIC_RPM', 'ANTHROPIC_ITPM', 'ANTHROPIC_OTPM'):
+    os.environ.setdefault(_name, '0')
@@ -0,0 +1,137 @@
+"""
+壓測：目前的部署（gunicorn 同步 worker，1 worker × 8 threads，同 render.yaml）vs ASGI 非同步模式（uvicorn asgi:app）
+
+兩種伺服器都以 benchmarks.serve_stub 啟動（fixture + stub LLM，不連網），
+以 N 個同時連線的用戶端送出不同影片的 /api/summarize 請求，比較吞吐量、延遲與錯誤數。
+stub LLM 延遲依 --time-scale 縮放（0.2 時單次摘要約 2-3 秒），等待模型的時間即為伺服器需要「撐住」的 I/O 時間。
+
+需要 gunicorn、uvicorn、httpx。用法（在 backend 目錄）:
+    python -m benchmarks.bench_asgi --clients 8 64 256 --requests 256 --output asgi.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+SERVERS = {
+    'wsgi': lambda port: [sys.executable, '-m', 'gunicorn', 'benchmarks.serve_stub:wsgi_app',
+                          '--bind', f'127.0.0.1:{port}', '--workers', '1', '--threads', '8', '--timeout', '600'],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'benchmarks.serve_stub:asgi_app',
+                          '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+                          '--backlog', '4096'],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, time_scale: float, loops: int) -> tuple:
+    """啟動伺服器並等待 /api/health 回應"""
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, BENCH_TIME_SCALE=str(time_scale), BENCH_LOOPS=str(loops), PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(SERVERS[kind](port), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} 伺服器啟動失敗")
+
+
+async def load(base_url: str, clients: int, urls: list, timeout: float) -> dict:
+    """clients 個用戶端同時送出請求（每個用戶端依序處理佇列中的網址）"""
+    import httpx
+
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    latencies, errors = [], []
+
+    async def client_loop(client):
+        while not queue.empty():
+            url = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/api/summarize", json={"url": url})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors.append(response.status_code)
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 3) if latencies else 0.0
+
+    return {
+        "clients": clients,
+        "requests": len(urls),
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_types": sorted({str(e) for e in errors}),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0,
+        "latency_seconds": {"p50": percentile(50), "p95": percentile(95), "max": percentile(100)},
+    }
+
+
+def run(args) -> dict:
+    report = {"config": {key: value for key, value in vars(args).items() if key != 'output'}, "runs": []}
+    print(f"{'伺服器':<6} {'連線':>5} {'請求':>5} {'成功':>5} {'錯誤':>5} {'吞吐(req/s)':>11} {'p50(s)':>8} {'p95(s)':>8}")
+    for kind in args.servers:
+        process, base_url = start_server(kind, args.time_scale, args.loops)
+        try:
+            for index, clients in enumerate(args.clients):
+                # 每輪使用不同的影片 ID，避免命中快取
+                urls = [f"https://www.youtube.com/watch?v={kind[0]}{index:02d}{i:08d}" for i in range(args.requests)]
+                result = asyncio.run(load(base_url, clients, urls, args.timeout))
+                result["server"] = kind
+                report["runs"].append(result)
+                print(f"{kind:<6} {clients:>5} {result['requests']:>5} {result['ok']:>5} {result['errors']:>5} "
+                      f"{result['throughput_rps']:>11.2f} {result['latency_seconds']['p50']:>8.2f} "
+                      f"{result['latency_seconds']['p95']:>8.2f}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=['wsgi', 'asgi'])
+    parser.add_argument('--clients', type=int, nargs='+', default=[8, 64, 256])
+    parser.add_argument('--requests', type=int, default=256, help='每輪的請求數')
+    parser.add_argument('--time-scale', type=float, default=0.2)
+    parser.add_argument('--loops', type=int, default=12, help='字幕 fixture 重複次數（12 次約 1 小時）')
+    parser.add_argument('--timeout', type=float, default=300, help='單一請求逾時（秒）')
+    parser.add_argument('--output', help='結果 JSON 輸出路徑')
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已寫入 {args.output}")
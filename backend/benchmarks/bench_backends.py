@@ -0,0 +1,67 @@
+"""
+轉錄引擎效能測試：即時率（RTF）與峰值記憶體
+
+每個引擎在獨立子行程中執行（峰值 RSS 不互相影響）。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_backends --audio sample.mp3 --backends whisper faster-whisper --model base
+"""
+import sys
+import time
+import resource
+import argparse
+import multiprocessing
+
+from services.audio import probe_duration
+from services.transcription_backends import get_backend
+
+
+def _measure(backend_name: str, model_size: str, audio_path: str) -> dict:
+    backend = get_backend(backend_name)
+    if not backend.available:
+        return {"error": f"{backend_name} 未安裝"}
+
+    start = time.perf_counter()
+    model = backend.load(model_size)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = backend.transcribe(model, audio_path, language="zh")
+    transcribe_seconds = time.perf_counter() - start
+
+    # ru_maxrss：Linux 單位為 KB，macOS 為 bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    return {
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "segments": len(segments),
+        "peak_rss_mb": peak_mb,
+    }
+
+
+def run(audio_path, backends, model_size):
+    duration = probe_duration(audio_path)
+    print(f"音訊長度 {duration:.0f} 秒，模型 {model_size}")
+    print(f"{'引擎':<16} {'載入(s)':>8} {'轉錄(s)':>8} {'RTF':>6} {'峰值RSS(MB)':>12} {'段落數':>7}")
+
+    ctx = multiprocessing.get_context('spawn')
+    for name in backends:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(_measure, (name, model_size, audio_path))
+        if "error" in result:
+            print(f"{name:<16} {result['error']}")
+            continue
+        print(f"{name:<16} {result['load_seconds']:>8.1f} {result['transcribe_seconds']:>8.1f} "
+              f"{result['transcribe_seconds'] / duration:>6.2f} {result['peak_rss_mb']:>12.0f} "
+              f"{result['segments']:>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', required=True, help='本機音訊檔案')
+    parser.add_argument('--backends', nargs='+', default=['whisper', 'faster-whisper'])
+    parser.add_argument('--model', default='base')
+    args = parser.parse_args()
+    run(args.audio, args.backends, args.model)
@@ -0,0 +1,147 @@
+"""
+字幕解析效能測試
+
+產生多小時的 YouTube 自動字幕（滾動格式）寫入暫存檔，比較舊版解析（整份讀入後 split）
+與 services.captions（逐行讀取）的解析時間、峰值記憶體（tracemalloc）、輸出字數與段落數。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_captions --hours 1 3 6
+"""
+import os
+import re
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from services.captions import parse_captions
+
+WORDS = "我們 今天 要 聊 的 是 創業 這件 事 其實 很多人 都 誤會 了 市場 產品 團隊 資金".split()
+
+
+def make_rolling_vtt(hours: float) -> str:
+    """產生 YouTube 自動字幕格式：每個 cue 重複上一行，並穿插 10ms 的重複 cue"""
+    out = ["WEBVTT", "Kind: captions", "Language: zh-TW", ""]
+    t = 0.0
+    prev_line = ""
+    i = 0
+    while t < hours * 3600:
+        words = [WORDS[(i + k) % len(WORDS)] for k in range(6)]
+        i += 7
+        tagged = words[0] + "".join(
+            f"<{_ts(t + 0.3 * (k + 1))}><c> {w}</c>" for k, w in enumerate(words[1:])
+        )
+        line = " ".join(words)
+
+        out.append(f"{_ts(t)} --> {_ts(t + 2.0)} align:start position:0%")
+        out.append(prev_line or " ")
+        out.append(tagged)
+        out.append("")
+        out.append(f"{_ts(t + 2.0)} --> {_ts(t + 2.01)} align:start position:0%")
+        out.append(line)
+        out.append(" ")
+        out.append("")
+
+        prev_line = line
+        t += 2.01
+    return "\n".join(out)
+
+
+def _ts(seconds: float) -> str:
+    h = int(seconds // 3600)
+    m = int(seconds % 3600 // 60)
+    s = seconds % 60
+    return f"{h:02d}:{m:02d}:{s:06.3f}"
+
+
+def legacy_parse_vtt(content: str) -> dict:
+    """舊版 SpotifyService._parse_vtt_file 的解析邏輯（作為比較基準）"""
+    segments = []
+    full_text = []
+    current_start = current_end = 0
+    current_text = []
+
+    def to_seconds(time_str):
+        parts = time_str.replace(',', '.').split(':')
+        if len(parts) == 3:
+            return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
+        return int(parts[0]) * 60 + float(parts[1])
+
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
+            continue
+        if '-->' in line:
+            if current_text:
+                text = re.sub(r'<[^>]+>', '', ' '.join(current_text).strip())
+                if text and text not in full_text[-3:] if full_text else True:
+                    segments.append({'start': current_start, 'end': current_end, 'text': text})
+                    full_text.append(text)
+            parts = line.split('-->')
+            current_start = to_seconds(parts[0].strip())
+            current_end = to_seconds(parts[1].strip().split()[0])
+            current_text = []
+        elif line.isdigit():
+            continue
+        else:
+            current_text.append(line)
+
+    if current_text:
+        text = re.sub(r'<[^>]+>', '', ' '.join(current_text).strip())
+        if text:
+            segments.append({'start': current_start, 'end': current_end, 'text': text})
+            full_text.append(text)
+
+    return {'text': ' '.join(full_text), 'segments': segments}
+
+
+def measure(parse, path: str, repeat: int) -> tuple:
+    """
+    Returns:
+        tuple: (最佳耗時 ms, 峰值記憶體 MB, 解析結果)；記憶體含讀檔，另外量一次避免 tracemalloc 拖慢計時
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    del result
+
+    tracemalloc.start()
+    result = parse(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024, result
+
+
+def parse_legacy_file(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return legacy_parse_vtt(f.read())
+
+
+def parse_streaming_file(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return parse_captions(f, 'vtt', rolling=True)
+
+
+def run(hours_list, repeat: int):
+    print(f"{'時長':>6} {'解析器':<10} {'耗時(ms)':>10} {'峰值(MB)':>10} {'段落數':>8} {'輸出字數':>10}")
+    for hours in hours_list:
+        with tempfile.NamedTemporaryFile('w', suffix='.vtt', encoding='utf-8', delete=False) as f:
+            f.write(make_rolling_vtt(hours))
+        try:
+            for name, parse in (('legacy', parse_legacy_file), ('streaming', parse_streaming_file)):
+                elapsed, peak, result = measure(parse, f.name, repeat)
+                print(f"{hours:>5}h {name:<10} {elapsed:>10.1f} {peak:>10.1f} "
+                      f"{len(result['segments']):>8} {len(result['text']):>10}")
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, nargs='+', default=[1, 3, 6])
+    parser.add_argument('--repeat', type=int, default=3, help='計時重複次數（取最佳值）')
+    args = parser.parse_args()
+    run(args.hours, args.repeat)
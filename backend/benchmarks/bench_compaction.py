@@ -0,0 +1,110 @@
+"""
+文字稿壓縮測試：逐段時間軸 + 字元數截斷（舊）vs 合併段落 + token 預算（新）
+
+使用本機 stub LLM，以中文 / 英文自動字幕（每段 2 秒、只有幾個字）與 Whisper（每段 6 秒、一整句）樣本，
+比較呼叫次數、送入模型的 token 數、模擬耗時（已依 --time-scale 還原）與文字稿涵蓋率。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_compaction --hours 0.5 1 2 --time-scale 0.02
+"""
+import time
+import argparse
+
+from services.summarizer import SummarizerService
+from benchmarks.stub_llm import StubAnthropic
+from benchmarks.bench_map_reduce import make_transcript, SENTENCES
+
+ENGLISH = ("so the thing about building a company is that most people completely misunderstand "
+           "what market size actually means and why the first paying customers matter more ").split()
+
+
+def make_captions(hours: float, seconds_per_cue: float = 2.0, english: bool = False) -> dict:
+    """模擬自動字幕：每段只有 2 秒、約 8 個中文字或 5 個英文字"""
+    if english:
+        pieces = [" ".join(ENGLISH[i:i + 5]) for i in range(0, len(ENGLISH), 5)]
+    else:
+        text = "".join(SENTENCES)
+        pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+
+    segments = []
+    t = 0.0
+    i = 0
+    while t < hours * 3600:
+        segments.append({"start": t, "end": t + seconds_per_cue, "text": pieces[i % len(pieces)]})
+        t += seconds_per_cue
+        i += 1
+    return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+
+class LegacySummarizer(SummarizerService):
+    """舊版格式：每段都加時間軸，超過 100000 字元時分 5 區段各取開頭"""
+
+    def __init__(self, client=None):
+        super().__init__(client=client)
+        self.paragraph_seconds = 0
+
+    def _format_segments(self, segments: list) -> str:
+        max_chars = 100000
+        all_lines = [self._format_line(seg) for seg in segments]
+        if len("\n".join(all_lines)) <= max_chars:
+            return "\n".join(all_lines)
+
+        formatted = []
+        section_size = len(segments) // 5
+        for section in range(5):
+            end = len(segments) if section == 4 else section_size * (section + 1)
+            section_chars = 0
+            formatted.append("\n【區段】")
+            for line in all_lines[section_size * section:end]:
+                if section_chars + len(line) > max_chars // 5:
+                    formatted.append("...")
+                    break
+                formatted.append(line)
+                section_chars += len(line)
+        return "\n".join(formatted)
+
+
+def coverage(service, transcript) -> float:
+    """單次摘要時，送入模型的段落涵蓋原始文字稿的比例（map-reduce 為完整涵蓋）"""
+    segments = service._compact(transcript["segments"])
+    if service._select_mode(segments) == "map_reduce":
+        return 1.0
+    sent = set(service._format_segments(segments).split("\n"))
+    kept = sum(1 for seg in segments if service._format_line(seg) in sent)
+    return kept / len(segments)
+
+
+def run(hours_list, time_scale):
+    print(f"{'樣本':<12} {'時長':>5} {'版本':<7} {'模式':<11} {'呼叫數':>6} {'輸入tokens':>10} "
+          f"{'模擬耗時(s)':>11} {'涵蓋率':>7}")
+    samples = (
+        ("中文字幕 2s", lambda hours: make_captions(hours)),
+        ("英文字幕 2s", lambda hours: make_captions(hours, english=True)),
+        ("Whisper 6s", lambda hours: make_transcript(hours, 6.0)),
+    )
+    for label, make in samples:
+        for hours in hours_list:
+            transcript = make(hours)
+            metadata = {"title": "測試節目", "duration": f"{hours} 小時"}
+
+            for version, cls in (("before", LegacySummarizer), ("after", SummarizerService)):
+                stub = StubAnthropic(time_scale=time_scale)
+                service = cls(client=stub)
+                service.prompt_cache = False
+
+                start = time.perf_counter()
+                service.generate_summary(transcript, metadata)
+                elapsed = (time.perf_counter() - start) / time_scale
+
+                mode = service._select_mode(service._compact(transcript["segments"]))
+                input_tokens = sum(c["input_tokens"] for c in stub.calls)
+                print(f"{label:<12} {hours:>4}h {version:<7} {mode:<11} {len(stub.calls):>6} {input_tokens:>10} "
+                      f"{elapsed:>11.1f} {coverage(service, transcript):>7.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, nargs='+', default=[0.5, 1, 2])
+    parser.add_argument('--time-scale', type=float, default=0.02)
+    args = parser.parse_args()
+    run(args.hours, args.time_scale)
@@ -0,0 +1,161 @@
+"""
+下載效能測試（本機 HTTP 伺服器）
+
+伺服器模擬每條新連線的握手延遲與單一連線的頻寬上限，比較：
+- 小型 API 請求：每次 requests.get（新連線）vs 共用 Session（連線池）
+- 大型音訊：舊版 8KB 單線下載 vs 1MB 緩衝單線下載 vs Range 平行下載
+並測試連線中斷後的續傳。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_download --size-mb 64 --conn-mbps 20 --handshake-ms 80
+"""
+import os
+import re
+import time
+import tempfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from services.http_client import create_session, Downloader
+
+_RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+def make_handler(payload: bytes, conn_bytes_per_sec: float, handshake_seconds: float, drop_once_at: int):
+    state = {"dropped": False}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            time.sleep(handshake_seconds)  # 模擬 TCP + TLS 握手
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self._respond(head=True)
+
+        def do_GET(self):
+            self._respond(head=False)
+
+        def _respond(self, head: bool):
+            if self.path.startswith('/api'):
+                body = b'{"results": []}'
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+                return
+
+            start, end = 0, len(payload) - 1
+            match = _RANGE_RE.match(self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else end
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+            else:
+                self.send_response(200)
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+            if head:
+                return
+
+            block = 64 * 1024
+            position = start
+            while position <= end:
+                data = payload[position:min(position + block, end + 1)]
+                with lock:
+                    should_drop = drop_once_at and not state["dropped"] and position >= drop_once_at
+                    if should_drop:
+                        state["dropped"] = True
+                if should_drop:
+                    self.close_connection = True
+                    return
+                self.wfile.write(data)
+                position += len(data)
+                time.sleep(len(data) / conn_bytes_per_sec)
+
+    return Handler
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def legacy_download(url: str, path: str):
+    """舊版 SpotifyService._download_audio_file 的下載方式"""
+    response = requests.get(url, stream=True, timeout=300)
+    response.raise_for_status()
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            f.write(chunk)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(size_mb, conn_mbps, handshake_ms, lookups):
+    payload = os.urandom(int(size_mb * 1024 * 1024))
+    size = len(payload)
+    out = os.path.join(tempfile.gettempdir(), 'bench_download.bin')
+
+    server, base = start_server(make_handler(payload, conn_mbps * 1024 * 1024, handshake_ms / 1000, 0))
+    try:
+        print(f"小型請求 × {lookups}")
+        t = timed(lambda: [requests.get(f"{base}/api/search").json() for _ in range(lookups)])
+        print(f"  requests.get（每次新連線） {t:>7.2f} s")
+        session = create_session()
+        t = timed(lambda: [session.get(f"{base}/api/search").json() for _ in range(lookups)])
+        print(f"  共用 Session（連線池）     {t:>7.2f} s")
+
+        print(f"\n下載 {size_mb} MB（單一連線上限 {conn_mbps} MB/s）")
+        t = timed(legacy_download, f"{base}/audio.mp3", out)
+        print(f"  舊版 8KB 單線              {t:>7.2f} s  {size_mb / t:>6.1f} MB/s")
+
+        sequential = Downloader(create_session(), parallel_threshold=size + 1)
+        t = timed(sequential.download, f"{base}/audio.mp3", out)
+        print(f"  1MB 緩衝單線               {t:>7.2f} s  {size_mb / t:>6.1f} MB/s")
+
+        for parts in (2, 4, 8):
+            parallel = Downloader(create_session(), parallel_threshold=1, parallel_parts=parts)
+            t = timed(parallel.download, f"{base}/audio.mp3", out)
+            ok = open(out, 'rb').read() == payload
+            print(f"  Range 平行 × {parts}             {t:>7.2f} s  {size_mb / t:>6.1f} MB/s  內容正確={ok}")
+    finally:
+        server.shutdown()
+
+    # 續傳：伺服器在一半時中斷一次
+    server, base = start_server(make_handler(payload, conn_mbps * 1024 * 1024, handshake_ms / 1000, size // 2))
+    try:
+        resumable = Downloader(create_session(), parallel_threshold=size + 1)
+        t = timed(resumable.download, f"{base}/audio.mp3", out)
+        ok = open(out, 'rb').read() == payload
+        print(f"\n中途斷線續傳                 {t:>7.2f} s  內容正確={ok}")
+    finally:
+        server.shutdown()
+        os.remove(out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=64)
+    parser.add_argument('--conn-mbps', type=float, default=20, help='單一連線頻寬上限（MB/s）')
+    parser.add_argument('--handshake-ms', type=float, default=80, help='每條新連線的握手延遲')
+    parser.add_argument('--lookups', type=int, default=20)
+    args = parser.parse_args()
+    run(args.size_mb, args.conn_mbps, args.handshake_ms, args.lookups)
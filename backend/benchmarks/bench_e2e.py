@@ -0,0 +1,411 @@
+"""
+端對端效能測試：以錄製的 fixture 離線重播完整的 app.py 流程
+
+- yt-dlp：重播 fixtures/youtube_info.json（不連 YouTube）
+- 字幕：fixtures/captions.zh-TW.vtt（--loops 次首尾相接，模擬較長的節目）
+- Claude：本機 stub LLM，回傳 fixtures/anthropic_response.json
+- 音訊（可選）：--audio 指定音訊檔，走直連音訊 → Whisper 轉錄（需安裝 Whisper）
+
+透過 Flask test client 以 N 個同時連線的用戶端呼叫 /api/summarize 與 /api/summarize/stream，
+量測各階段耗時（回應中的 timings）、記憶體、送入模型的 prompt 大小與吞吐量，結果存成 JSON 供比較。
+延遲為實際經過時間（stub LLM 延遲已依 --time-scale 縮放，--time-scale 0 只量測程式本身的開銷）。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_e2e --clients 1 4 8 --requests 16 --loops 12 --output e2e.json
+    python -m benchmarks.bench_e2e --compare before.json after.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import atexit
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+_TS_RE = re.compile(r'(\d{2}):(\d{2}):(\d{2}\.\d{3})')
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def loop_vtt(content: str, loops: int, period: float) -> str:
+    """將 VTT 的 cue 重複 loops 次，每次時間軸往後平移 period 秒"""
+    header, _, cues = content.partition("\n\n")
+    parts = [header]
+    for i in range(loops):
+        offset = i * period
+        parts.append(_TS_RE.sub(lambda m: _shift(m, offset), cues).strip("\n"))
+    return "\n\n".join(parts) + "\n"
+
+
+def _shift(match, offset: float) -> str:
+    seconds = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3)) + offset
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}"
+
+
+class FixtureResponse:
+    """requests.Response 中字幕下載會用到的部分"""
+
+    def __init__(self, url: str, content: bytes = None):
+        self.url = url
+        self.status_code = 200 if content is not None else 404
+        self.content = content or b""
+        self.raw = SimpleRaw(len(self.content))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} fixture not found: {self.url}")
+
+    def iter_lines(self):
+        return iter(self.content.splitlines())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class SimpleRaw:
+    def __init__(self, size: int):
+        self.size = size
+
+    def tell(self) -> int:
+        return self.size
+
+
+class FixtureSession:
+    """以 fixture:// 網址對應 fixtures 目錄中的檔案"""
+
+    def __init__(self, files: dict):
+        self.files = files
+
+    def get(self, url: str, **kwargs):
+        name = url[len("fixture://"):] if url.startswith("fixture://") else None
+        return FixtureResponse(url, self.files.get(name))
+
+
+class AsyncFixtureSession:
+    """FixtureSession 的非同步版本（取代 ASGI 模式的 httpx 連線池）"""
+
+    def __init__(self, session: FixtureSession):
+        self.session = session
+
+    async def get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    async def aclose(self):
+        pass
+
+
+def make_replay_service(loops: int, audio_path: str = None):
+    """SpotifyService 子類別：yt-dlp 資訊與字幕改由 fixture 重播，音訊直連改為複製 --audio 檔案"""
+    from services.spotify import SpotifyService
+    from services.tracing import span
+
+    info_fixture = json.loads(load_fixture('youtube_info.json'))
+    period = info_fixture['duration']
+    captions = loop_vtt(load_fixture('captions.zh-TW.vtt').decode('utf-8'), loops, period)
+
+    class ReplaySpotifyService(SpotifyService):
+        def _get_async_session(self):
+            return AsyncFixtureSession(self.session)
+
+        def _extract_youtube_info(self, url: str) -> dict:
+            info = json.loads(json.dumps(info_fixture))
+            info.update(id=self._extract_youtube_video_id(url), webpage_url=url, duration=period * loops)
+            return info
+
+        def _download_audio_file(self, audio_url: str) -> str:
+            output_file = os.path.join(self.temp_dir, f"bench_{threading.get_ident()}_{time.time_ns()}"
+                                                      f"{os.path.splitext(audio_path)[1]}")
+            with span('download') as stage:
+                shutil.copyfile(audio_path, output_file)
+                stage['bytes_downloaded'] = os.path.getsize(output_file)
+            return output_file
+
+    service = ReplaySpotifyService()
+    service.session = FixtureSession({'captions.zh-TW.vtt': captions.encode('utf-8')})
+    return service, captions
+
+
+def setup_app(args):
+    """以暫存目錄初始化 app（快取、索引、文字稿都不寫到正式位置），接上 fixture 與 stub LLM"""
+    workdir = tempfile.mkdtemp(prefix='bench_e2e_')
+    atexit.register(shutil.rmtree, workdir, True)
+    os.environ.update(
+        SUMMARY_CACHE_PATH=os.path.join(workdir, 'summary_cache.db'),
+        RESOLUTION_INDEX_PATH=os.path.join(workdir, 'resolution_index.db'),
+        TRANSCRIPT_STORE_DIR=os.path.join(workdir, 'transcripts'),
+    )
+    import app as app_module
+    from benchmarks.stub_llm import StubAnthropic, AsyncStubAnthropic
+
+    service, captions = make_replay_service(args.loops, args.audio)
+    app_module.spotify_service = service
+    response = json.loads(load_fixture('anthropic_response.json'))
+    stub = StubAnthropic(time_scale=args.time_scale, response=response)
+    app_module.summarizer_service.client = stub
+    app_module.summarizer_service.async_client = AsyncStubAnthropic(time_scale=args.time_scale, response=response)
+    return app_module, stub, captions
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))], 4)
+
+
+def bench_stages(app_module, captions: str, repeat: int = 5) -> dict:
+    """不經 HTTP 的單一階段：字幕解析、段落合併與格式化、prompt 大小"""
+    from services.captions import parse_captions
+    from services.tokens import estimate_tokens
+
+    summarizer = app_module.summarizer_service
+    lines = captions.splitlines()
+
+    def best(func):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    parse_seconds, transcript = best(lambda: parse_captions(iter(lines), 'vtt', rolling=True))
+    segments = transcript['segments']
+    compact_seconds, compacted = best(lambda: summarizer._compact(segments))
+    format_seconds, text = best(lambda: summarizer._format_segments(compacted))
+    prompt = summarizer._build_prompt(text, {"title": "bench", "duration": ""})
+
+    return {
+        "caption_bytes": len(captions.encode('utf-8')),
+        "segments": len(segments),
+        "compacted_segments": len(compacted),
+        "mode": summarizer._select_mode(compacted),
+        "parse_captions_seconds": round(parse_seconds, 5),
+        "compact_seconds": round(compact_seconds, 5),
+        "format_segments_seconds": round(format_seconds, 5),
+        "prompt_chars": len(prompt),
+        "prompt_tokens": estimate_tokens(prompt),
+    }
+
+
+def _request(client, endpoint: str, url: str) -> dict:
+    """送出一個請求，回傳延遲、第一個 section 事件的時間與回應中的 timings"""
+    start = time.perf_counter()
+    if endpoint == 'sync':
+        response = client.post('/api/summarize', json={"url": url})
+        body = response.get_json() or {}
+        return {"ok": response.status_code == 200, "seconds": time.perf_counter() - start,
+                "timings": body.get("timings"), "cached": bool(body.get("cached")),
+                "coalesced": bool(body.get("coalesced"))}
+
+    response = client.post('/api/summarize/stream', json={"url": url}, buffered=False)
+    first_section = None
+    payload = b""
+    for chunk in response.response:
+        if first_section is None and b"event: section" in chunk:
+            first_section = time.perf_counter() - start
+        payload += chunk
+    seconds = time.perf_counter() - start
+    response.close()
+
+    done = None
+    for block in payload.decode('utf-8').split("\n\n"):
+        if block.startswith("event: done"):
+            done = json.loads(block.split("data: ", 1)[1])
+    return {"ok": done is not None, "seconds": seconds, "first_section_seconds": first_section,
+            "timings": (done or {}).get("timings"), "cached": bool((done or {}).get("cached")),
+            "coalesced": bool((done or {}).get("coalesced"))}
+
+
+def run_load(app_module, stub, scenario: str, endpoint: str, clients: int, urls: list) -> dict:
+    """clients 個用戶端同時送出 urls 中的請求"""
+    calls_before = len(stub.calls)
+
+    def worker(url):
+        return _request(app_module.app.test_client(), endpoint, url)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(worker, urls))
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["seconds"] for r in ok]
+    stage_totals = {}
+    for r in ok:
+        for stage, seconds in ((r["timings"] or {}).get("stages") or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    calls = stub.calls[calls_before:]
+    first_sections = [r["first_section_seconds"] for r in ok if r.get("first_section_seconds") is not None]
+    return {
+        "scenario": scenario,
+        "endpoint": endpoint,
+        "clients": clients,
+        "requests": len(urls),
+        "errors": len(results) - len(ok),
+        "cached": sum(1 for r in ok if r["cached"]),
+        "coalesced": sum(1 for r in ok if r["coalesced"]),
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "first_section_p50_seconds": percentile(first_sections, 50) if first_sections else None,
+        "stage_seconds_avg": {stage: round(total / len(ok), 4) for stage, total in sorted(stage_totals.items())},
+        "llm_calls": len(calls),
+        "prompt_tokens_avg": round(sum(c["input_tokens"] + c["cache_read_input_tokens"]
+                                       + c["cache_creation_input_tokens"] for c in calls) / len(calls))
+        if calls else 0,
+    }
+
+
+def measure_memory(app_module, endpoint: str, url: str) -> dict:
+    """單一冷請求的 Python 記憶體配置峰值（tracemalloc 會拖慢執行，只用於記憶體量測）"""
+    tracemalloc.start()
+    try:
+        _request(app_module.app.test_client(), endpoint, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"endpoint": endpoint, "peak_mb": round(peak / 1024 / 1024, 2)}
+
+
+def max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 為 bytes，Linux 為 KB
+    return round(rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024, 1)
+
+
+def video_urls(prefix: str, count: int) -> list:
+    return [f"https://www.youtube.com/watch?v={prefix}{i:0{11 - len(prefix)}d}" for i in range(count)]
+
+
+def run(args) -> dict:
+    app_module, stub, captions = setup_app(args)
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        "stages": bench_stages(app_module, captions),
+        "memory": [],
+        "runs": [],
+    }
+    stages = report["stages"]
+    print(f"字幕 {stages['caption_bytes'] / 1024:.0f} KB，{stages['segments']} 段 → 合併後 "
+          f"{stages['compacted_segments']} 段（{stages['mode']}），prompt 約 {stages['prompt_tokens']} tokens")
+    print(f"解析 {stages['parse_captions_seconds'] * 1000:.1f} ms，合併 {stages['compact_seconds'] * 1000:.1f} ms，"
+          f"格式化 {stages['format_segments_seconds'] * 1000:.1f} ms\n")
+
+    for endpoint in args.endpoints:
+        report["memory"].append(measure_memory(app_module, endpoint, video_urls(f"m{endpoint[:2]}", 1)[0]))
+
+    run_id = 0
+    for endpoint in args.endpoints:
+        for clients in args.clients:
+            run_id += 1
+            urls = video_urls(f"c{run_id:02d}", args.requests)
+            # 冷請求（每個網址都不同）→ 同一批網址再跑一次（快取命中）→ 全部同一網址（合併請求）
+            report["runs"].append(run_load(app_module, stub, "cold", endpoint, clients, urls))
+            report["runs"].append(run_load(app_module, stub, "warm", endpoint, clients, urls))
+            same = video_urls(f"s{run_id:02d}", 1) * args.requests
+            report["runs"].append(run_load(app_module, stub, "same_url", endpoint, clients, same))
+
+    if args.audio:
+        if app_module.transcriber_service.available:
+            urls = [f"https://fixture.local/episode-{i}{os.path.splitext(args.audio)[1]}" for i in range(args.requests)]
+            report["runs"].append(run_load(app_module, stub, "audio", "sync", min(args.clients), urls))
+        else:
+            print("Whisper 未安裝，略過音訊情境")
+
+    report["max_rss_mb"] = max_rss_mb()
+    print_report(report)
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'情境':<9} {'端點':<6} {'連線':>4} {'請求':>4} {'錯誤':>4} {'吞吐(req/s)':>11} {'p50(s)':>8} "
+          f"{'p95(s)':>8} {'首段(s)':>8} {'LLM呼叫':>7} {'prompt':>7}")
+    for r in report["runs"]:
+        first = r["first_section_p50_seconds"]
+        print(f"{r['scenario']:<9} {r['endpoint']:<6} {r['clients']:>4} {r['requests']:>4} {r['errors']:>4} "
+              f"{r['throughput_rps']:>11.2f} {r['latency_seconds']['p50']:>8.3f} {r['latency_seconds']['p95']:>8.3f} "
+              f"{'-' if first is None else f'{first:.3f}':>8} {r['llm_calls']:>7} {r['prompt_tokens_avg']:>7}")
+    print("\n各階段平均耗時（冷請求）:")
+    for r in report["runs"]:
+        if r["scenario"] in ("cold", "audio"):
+            stages = ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in r["stage_seconds_avg"].items())
+            print(f"  {r['endpoint']:<6} x{r['clients']:<3} {stages}")
+    print("\n記憶體: " + ", ".join(f"{m['endpoint']} 峰值 {m['peak_mb']} MB" for m in report["memory"])
+          + f"，行程 max RSS {report['max_rss_mb']} MB")
+
+
+def compare(before_path: str, after_path: str):
+    """比較兩次結果：各情境吞吐量與 p95，以及單一階段耗時"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old:+.0%}" if old else "-"
+
+    print(f"{'情境':<9} {'端點':<6} {'連線':>4} {'吞吐 before':>11} {'after':>8} {'變化':>6} "
+          f"{'p95 before':>10} {'after':>8} {'變化':>6}")
+    old_runs = {(r["scenario"], r["endpoint"], r["clients"]): r for r in before["runs"]}
+    for r in after["runs"]:
+        old = old_runs.get((r["scenario"], r["endpoint"], r["clients"]))
+        if not old:
+            continue
+        print(f"{r['scenario']:<9} {r['endpoint']:<6} {r['clients']:>4} {old['throughput_rps']:>11.2f} "
+              f"{r['throughput_rps']:>8.2f} {change(old['throughput_rps'], r['throughput_rps']):>6} "
+              f"{old['latency_seconds']['p95']:>10.3f} {r['latency_seconds']['p95']:>8.3f} "
+              f"{change(old['latency_seconds']['p95'], r['latency_seconds']['p95']):>6}")
+
+    print()
+    for key in ("parse_captions_seconds", "compact_seconds", "format_segments_seconds", "prompt_tokens"):
+        old, new = before["stages"].get(key), after["stages"].get(key)
+        if old is not None and new is not None:
+            print(f"{key:<24} {old:>10} → {new:<10} {change(old, new)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=16, help='每種情境的請求數')
+    parser.add_argument('--loops', type=int, default=12, help='字幕 fixture 重複次數（12 次約 1 小時）')
+    parser.add_argument('--endpoints', nargs='+', choices=['sync', 'stream'], default=['sync', 'stream'])
+    parser.add_argument('--time-scale', type=float, default=0.01)
+    parser.add_argument('--audio', help='音訊 fixture（需要 Whisper）')
+    parser.add_argument('--output', help='結果 JSON 輸出路徑')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='比較兩個結果 JSON')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        result = run(args)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"\n結果已寫入 {args.output}")
@@ -0,0 +1,68 @@
+"""
+長文字稿摘要效能測試：單次呼叫（取樣截斷）vs 分段摘要（map-reduce）
+
+使用本機 stub LLM，比較實際耗時（已依 --time-scale 還原為模擬秒數）、
+呼叫次數、送入模型的 token 數，以及文字稿涵蓋率。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_map_reduce --hours 0.5 1 3 --time-scale 0.02
+"""
+import time
+import argparse
+
+from services.summarizer import SummarizerService
+from services.tokens import estimate_tokens
+from benchmarks.stub_llm import StubAnthropic
+
+SENTENCES = [
+    "我們今天要聊的是創業這件事，其實很多人都誤會了市場規模的意義。",
+    "產品做出來之後，最重要的是找到第一批真正願意付費的客戶。",
+    "募資不是目的，而是讓團隊能專注在對的事情上的手段。",
+    "我覺得這個產業接下來五年會有很大的變化，尤其是 AI 的導入。",
+]
+
+
+def make_transcript(hours: float, seconds_per_segment: float = 4.0) -> dict:
+    segments = []
+    t = 0.0
+    i = 0
+    while t < hours * 3600:
+        segments.append({"start": t, "end": t + seconds_per_segment,
+                         "text": f"{SENTENCES[i % len(SENTENCES)]}（{i}）"})
+        t += seconds_per_segment
+        i += 1
+    return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+
+def run(hours_list, time_scale, concurrency):
+    print(f"{'時長':>6} {'模式':<11} {'模擬耗時(s)':>11} {'呼叫數':>6} {'輸入tokens':>10} {'涵蓋率':>7}")
+    for hours in hours_list:
+        transcript = make_transcript(hours)
+        metadata = {"title": "測試節目", "duration": f"{hours} 小時"}
+
+        for mode in ("single", "map_reduce"):
+            stub = StubAnthropic(time_scale=time_scale)
+            service = SummarizerService(client=stub)
+            service.max_concurrency = concurrency
+            total_tokens = estimate_tokens("\n".join(service._format_line(s) for s in transcript["segments"]))
+
+            start = time.perf_counter()
+            service.generate_summary(transcript, metadata, mode=mode)
+            elapsed = (time.perf_counter() - start) / time_scale
+
+            input_tokens = sum(c["input_tokens"] for c in stub.calls)
+            if mode == "single":
+                covered = estimate_tokens(service._format_segments(transcript["segments"]))
+            else:
+                covered = total_tokens
+            print(f"{hours:>5}h {mode:<11} {elapsed:>11.1f} {len(stub.calls):>6} "
+                  f"{input_tokens:>10} {min(1.0, covered / total_tokens):>7.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, nargs='+', default=[0.5, 1, 3])
+    parser.add_argument('--time-scale', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    run(args.hours, args.time_scale, args.concurrency)
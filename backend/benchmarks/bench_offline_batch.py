@@ -0,0 +1,67 @@
+"""
+離線批次摘要測試：逐一即時呼叫 vs Message Batches API
+
+使用本機 stub LLM（含模擬的 messages.batches），確認兩種方式產生相同數量的摘要，
+並比較呼叫 / 批次數、token 數與估算費用（取自各 tier 的用量統計，Message Batches 為一般價格的 50%）。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_offline_batch --items 10 --long 2 --time-scale 0.002
+"""
+import time
+import argparse
+
+from services.summarizer import SummarizerService
+from services.offline_batch import OfflineBatchSummarizer
+from benchmarks.stub_llm import StubAnthropic
+from benchmarks.bench_map_reduce import make_transcript
+
+def cost(service: SummarizerService) -> float:
+    """各 tier 累計的估算費用（美元）"""
+    return sum(tier["cost_usd"] for tier in service.router.stats()["tiers"].values())
+
+
+def run(items, long_items, time_scale):
+    episodes = [
+        (f"bench:{i}", make_transcript(3 if i < long_items else 0.5), {"title": f"測試節目 {i}", "duration": ""})
+        for i in range(items)
+    ]
+
+    # 即時：每項一次（長文字稿為 map-reduce 多次）呼叫
+    stub = StubAnthropic(time_scale=time_scale)
+    service = SummarizerService(client=stub)
+    start = time.perf_counter()
+    for _, transcript, metadata in episodes:
+        service.generate_summary(transcript, metadata)
+    sync_elapsed = time.perf_counter() - start
+    sync_input = sum(c["input_tokens"] for c in stub.calls)
+    sync_output = sum(c["output_tokens"] for c in stub.calls)
+    sync_cost = cost(service)
+    sync_calls = len(stub.calls)
+
+    # 離線：分段筆記一個批次 + 最終摘要一個批次
+    stub = StubAnthropic(time_scale=time_scale)
+    summaries = {}
+    service = SummarizerService(client=stub)
+    offline = OfflineBatchSummarizer(service, poll_interval=0.05)
+    start = time.perf_counter()
+    outcome = offline.run(episodes, lambda source_id, metadata, summary: summaries.__setitem__(source_id, summary))
+    batch_elapsed = time.perf_counter() - start
+    usage = outcome["usage"]
+    batch_cost = cost(service)
+
+    print(f"{'方式':<8} {'請求數':>6} {'批次數':>6} {'輸入tokens':>10} {'輸出tokens':>10} {'估算費用':>9} {'耗時(s)':>8}")
+    print(f"{'即時':<8} {sync_calls:>6} {'-':>6} {sync_input:>10} {sync_output:>10} "
+          f"${sync_cost:>8.3f} {sync_elapsed:>8.2f}")
+    print(f"{'離線批次':<8} {len(stub.calls):>6} {usage['batches']:>6} {usage['input_tokens']:>10} "
+          f"{usage['output_tokens']:>10} ${batch_cost:>8.3f} {batch_elapsed:>8.2f}")
+    done = sum(1 for status in outcome["results"].values() if status == "done" or status.startswith("degraded"))
+    print(f"完成 {done}/{items} 項，費用約為即時呼叫的 {batch_cost / sync_cost:.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--long', type=int, default=2, help='其中幾項為 3 小時長文字稿（走 map-reduce）')
+    parser.add_argument('--time-scale', type=float, default=0.002)
+    args = parser.parse_args()
+    run(args.items, args.long, args.time_scale)
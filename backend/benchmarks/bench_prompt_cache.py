@@ -0,0 +1,45 @@
+"""
+Prompt caching 測試：固定指示（system prompt）標記 cache_control vs 不標記
+
+使用本機 stub LLM（模擬 prompt cache），連續摘要多個短文字稿，
+比較未快取輸入 token、快取讀取 token 與平均延遲（已依 --time-scale 還原為模擬秒數）。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_prompt_cache --items 10 --minutes 5 --time-scale 0.05
+"""
+import argparse
+
+from services.summarizer import SummarizerService, SUMMARY_INSTRUCTIONS
+from services.tokens import estimate_tokens
+from benchmarks.stub_llm import StubAnthropic
+from benchmarks.bench_map_reduce import make_transcript
+
+
+def run(items, minutes, time_scale):
+    transcript = make_transcript(minutes / 60)
+    print(f"固定指示約 {estimate_tokens(SUMMARY_INSTRUCTIONS)} tokens，每集文字稿約 "
+          f"{estimate_tokens(chr(10).join(seg['text'] for seg in transcript['segments']))} tokens\n")
+    print(f"{'模式':<10} {'未快取輸入':>10} {'快取讀取':>9} {'快取寫入':>9} {'平均延遲(s)':>11}")
+
+    for prompt_cache in (False, True):
+        service = SummarizerService(client=StubAnthropic(time_scale=time_scale))
+        service.prompt_cache = prompt_cache
+        for i in range(items):
+            service.generate_summary(transcript, {"title": f"測試節目 {i}", "duration": f"{minutes} 分鐘"})
+
+        metrics = service.get_metrics()
+        usage = metrics["usage"]
+        latency = metrics["latency_seconds"]["summary"]
+        total = latency["cache_hit"]["sum"] + latency["cache_miss"]["sum"]
+        label = "cache" if prompt_cache else "no-cache"
+        print(f"{label:<10} {usage['input_tokens']:>10} {usage['cache_read_input_tokens']:>9} "
+              f"{usage['cache_creation_input_tokens']:>9} {total / items / time_scale:>11.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--minutes', type=float, default=5)
+    parser.add_argument('--time-scale', type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.items, args.minutes, args.time_scale)
@@ -0,0 +1,51 @@
+"""
+平行轉錄效能測試：比較不同子行程數的實際耗時
+
+需要 openai-whisper 與 ffmpeg。每種行程數先以第一段暖機（載入模型），
+之後計時完整轉錄，並輸出即時率（耗時 / 音訊長度）。
+
+用法（在 backend 目錄）:
+    python -m benchmarks.bench_transcribe --audio sample.mp3 --workers 1 2 4 8 --model tiny
+"""
+import time
+import argparse
+
+from services.audio import probe_duration
+from services.transcriber import TranscriberService
+
+
+def run(audio_path, workers_list, model_size, chunk_seconds):
+    duration = probe_duration(audio_path)
+    print(f"音訊長度 {duration:.0f} 秒，模型 {model_size}，切段 {chunk_seconds:.0f} 秒")
+    print(f"{'行程數':>6} {'耗時(s)':>9} {'即時率':>7} {'加速':>6} {'段落數':>7}")
+
+    baseline = None
+    for workers in workers_list:
+        service = TranscriberService(model_size=model_size)
+        service.chunk_seconds = chunk_seconds
+
+        # 暖機：載入模型（單行程）或啟動行程池
+        if workers > 1:
+            with service._lease_pool(model_size, workers) as pool:
+                list(pool.map(time.sleep, [1.0] * workers))
+        else:
+            service.preload()
+
+        start = time.perf_counter()
+        result = service.transcribe(audio_path, workers=workers)
+        elapsed = time.perf_counter() - start
+        service.shutdown()
+
+        baseline = baseline or elapsed
+        print(f"{workers:>6} {elapsed:>9.1f} {elapsed / duration:>7.2f} "
+              f"{baseline / elapsed:>5.1f}x {len(result['segments']):>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', required=True, help='本機音訊檔案')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--chunk-seconds', type=float, default=120)
+    args = parser.parse_args()
+    run(args.audio, args.workers, args.model, args.chunk_seconds)
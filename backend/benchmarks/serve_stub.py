@@ -0,0 +1,25 @@
+"""
+以 fixture 與 stub LLM 啟動的伺服器（不連網、不需 API Key），供 bench_asgi 壓測
+
+    gunicorn benchmarks.serve_stub:wsgi_app --workers 1 --threads 8
+    uvicorn benchmarks.serve_stub:asgi_app
+
+環境變數: BENCH_TIME_SCALE（stub LLM 延遲縮放，預設 0.2）、BENCH_LOOPS（字幕 fixture 重複次數，預設 12）
+"""
+import os
+import argparse
+
+from benchmarks.bench_e2e import setup_app
+
+_args = argparse.Namespace(
+    time_scale=float(os.getenv('BENCH_TIME_SCALE', 0.2)),
+    loops=int(os.getenv('BENCH_LOOPS', 12)),
+    audio=None,
+)
+_app_module, _stub, _captions = setup_app(_args)
+
+# asgi 模組匯入時綁定 app 中的服務，需在替換為 fixture / stub 之後才匯入
+import asgi
+
+wsgi_app = _app_module.app
+asgi_app = asgi.app
@@ -0,0 +1,251 @@
+"""
+本機 Anthropic stub（不需 API Key、不連網）
+模擬 messages.create 的延遲：固定延遲 + 依輸入 / 輸出 token 數計算
+system 區塊標記 cache_control 時模擬 prompt caching：相同前綴第二次起改為快取讀取（處理速度快 10 倍）
+messages.batches 模擬 Message Batches API：建立後在背景處理，處理完成前 retrieve 回傳 in_progress
+messages.stream 模擬串流：延遲同 create，之後將回應切成小段以 content_block_delta 事件送出
+messages.with_raw_response.create 回傳帶標頭的原始回應（stub 不回傳 anthropic-ratelimit-* 標頭）
+AsyncStubAnthropic 為 AsyncAnthropic 版本（以 asyncio.sleep 模擬延遲）
+"""
+import json
+import asyncio
+import time
+import uuid
+import threading
+from types import SimpleNamespace
+
+from services.tokens import estimate_tokens
+
+CANNED_SUMMARY = {
+    "one_liner": "測試摘要：這集談創業與市場",
+    "article": [
+        {"subtitle": "段落一", "content": "這是測試用的段落內容。" * 20},
+        {"subtitle": "段落二", "content": "這是另一段測試內容。" * 20},
+    ],
+    "insights": ["【看點】測試觀點 → 測試延伸"],
+    "data_highlights": ["100 萬 → 測試數據"],
+    "quotes": [{"time": "12:30", "text": "測試金句"}],
+    "timestamps": [{"time": "00:00", "topic": "開場"}],
+    # 分段筆記欄位
+    "summary": "本段測試筆記。" * 30,
+    "key_points": ["測試觀點"],
+    "data": [],
+}
+
+
+class StubAnthropic:
+    def __init__(self, base_latency: float = 1.0, input_tokens_per_sec: float = 20000,
+                 output_tokens_per_sec: float = 60, time_scale: float = 1.0, response: dict = None):
+        """
+        Args:
+            base_latency: 每次呼叫的固定延遲（秒）
+            input_tokens_per_sec: 輸入處理速度
+            output_tokens_per_sec: 輸出生成速度
+            time_scale: 延遲縮放比例（例如 0.05 讓測試跑快 20 倍）
+            response: 回傳的 JSON 內容
+        """
+        self.base_latency = base_latency
+        self.input_tokens_per_sec = input_tokens_per_sec
+        self.output_tokens_per_sec = output_tokens_per_sec
+        self.time_scale = time_scale
+        self.response_text = json.dumps(response or CANNED_SUMMARY, ensure_ascii=False)
+        self.calls = []
+        self._lock = threading.Lock()
+        self.batches = {}
+        self.cached_prefixes = set()
+        self.messages = SimpleNamespace(
+            create=self._create,
+            stream=self._stream,
+            with_raw_response=SimpleNamespace(create=lambda **params: _RawResponse(self._create(**params))),
+            batches=SimpleNamespace(
+                create=self._batch_create,
+                retrieve=self._batch_retrieve,
+                results=self._batch_results,
+            ),
+        )
+
+    def _create(self, **params):
+        latency, message = self._respond(**params)
+        time.sleep(latency * self.time_scale)
+        return message
+
+    def _respond(self, model: str, max_tokens: int, messages: list, system=None, tools=None, **kwargs) -> tuple:
+        """計算模擬延遲並產生回應（不等待）"""
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else "".join(b.get("text", "") for b in m["content"])
+            for m in messages
+        )
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = min(max_tokens, estimate_tokens(self.response_text))
+
+        # system 前綴：有 cache_control 時第一次寫入快取，之後讀取
+        cache_read = cache_write = 0
+        blocks = [{"type": "text", "text": system}] if isinstance(system, str) else (system or [])
+        with self._lock:
+            for block in blocks:
+                tokens = estimate_tokens(block["text"])
+                if not block.get("cache_control"):
+                    input_tokens += tokens
+                elif block["text"] in self.cached_prefixes:
+                    cache_read += tokens
+                else:
+                    self.cached_prefixes.add(block["text"])
+                    cache_write += tokens
+
+        latency = (self.base_latency
+                   + (input_tokens + cache_write + cache_read / 10) / self.input_tokens_per_sec
+                   + output_tokens / self.output_tokens_per_sec)
+
+        with self._lock:
+            self.calls.append({"model": model, "input_tokens": input_tokens, "output_tokens": output_tokens,
+                               "cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_write})
+
+        if tools:
+            # tool use：只回傳 schema 內的欄位
+            properties = tools[0]["input_schema"]["properties"]
+            data = json.loads(self.response_text)
+            content = [SimpleNamespace(type="tool_use", name=tools[0]["name"],
+                                       input={key: value for key, value in data.items() if key in properties})]
+        else:
+            content = [SimpleNamespace(type="text", text=self.response_text)]
+
+        return latency, SimpleNamespace(
+            content=content,
+            usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                                  cache_read_input_tokens=cache_read, cache_creation_input_tokens=cache_write),
+            stop_reason="end_turn",
+        )
+
+    def _stream(self, **params):
+        return _StubStream(self._create(**params))
+
+    def _batch_create(self, requests: list):
+        """建立批次；背景依序處理（批次延遲 = 所有請求延遲總和，模擬非即時處理）"""
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.batches[batch_id] = {"status": "in_progress", "results": [], "requests": requests}
+
+        def process():
+            results = []
+            for request in requests:
+                params = request["params"]
+                if params.get("max_tokens", 0) <= 0:
+                    result = SimpleNamespace(type="errored", error={"type": "invalid_request_error"})
+                else:
+                    message = self._create(**params)
+                    result = SimpleNamespace(type="succeeded", message=message)
+                results.append(SimpleNamespace(custom_id=request["custom_id"], result=result))
+            with self._lock:
+                self.batches[batch_id].update(status="ended", results=results)
+
+        threading.Thread(target=process, daemon=True).start()
+        return self._batch_retrieve(batch_id)
+
+    def _batch_retrieve(self, batch_id: str):
+        with self._lock:
+            batch = self.batches[batch_id]
+            succeeded = sum(1 for entry in batch["results"] if entry.result.type == "succeeded")
+            return SimpleNamespace(
+                id=batch_id,
+                processing_status=batch["status"],
+                request_counts=SimpleNamespace(
+                    processing=len(batch["requests"]) - len(batch["results"]),
+                    succeeded=succeeded,
+                    errored=len(batch["results"]) - succeeded,
+                    canceled=0,
+                    expired=0,
+                ),
+            )
+
+    def _batch_results(self, batch_id: str):
+        with self._lock:
+            batch = self.batches[batch_id]
+            if batch["status"] != "ended":
+                raise RuntimeError(f"批次 {batch_id} 尚未處理完成")
+            return iter(list(batch["results"]))
+
+
+class _RawResponse:
+    """messages.with_raw_response.create 的回傳值"""
+
+    def __init__(self, message, headers: dict = None):
+        self.message = message
+        self.headers = headers or {}
+
+    def parse(self):
+        return self.message
+
+
+class _StubStream:
+    """messages.stream 回傳的 context manager"""
+
+    CHUNK_CHARS = 20
+
+    def __init__(self, message):
+        self.message = message
+        self.response = SimpleNamespace(headers={})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        block = self.message.content[0]
+        if block.type == "tool_use":
+            text, delta_type, field = json.dumps(block.input, ensure_ascii=False), "input_json_delta", "partial_json"
+        else:
+            text, delta_type, field = block.text, "text_delta", "text"
+        for i in range(0, len(text), self.CHUNK_CHARS):
+            delta = SimpleNamespace(type=delta_type, **{field: text[i:i + self.CHUNK_CHARS]})
+            yield SimpleNamespace(type="content_block_delta", index=0, delta=delta)
+
+    def get_final_message(self):
+        return self.message
+
+
+class AsyncStubAnthropic(StubAnthropic):
+    """AsyncAnthropic 版本：messages.create 為 coroutine，messages.stream 為 async context manager"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = SimpleNamespace(create=self._acreate, stream=self._astream,
+                                        with_raw_response=SimpleNamespace(create=self._araw_create))
+
+    async def _acreate(self, **params):
+        latency, message = self._respond(**params)
+        await asyncio.sleep(latency * self.time_scale)
+        return message
+
+    async def _araw_create(self, **params):
+        return _RawResponse(await self._acreate(**params))
+
+    def _astream(self, **params):
+        return _AsyncStubStream(self._acreate(**params))
+
+    async def close(self):
+        pass
+
+
+class _AsyncStubStream:
+    """AsyncAnthropic messages.stream 回傳的 async context manager"""
+
+    def __init__(self, pending):
+        self._pending = pending
+        self.message = None
+        self.response = SimpleNamespace(headers={})
+
+    async def __aenter__(self):
+        self.message = await self._pending
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for event in _StubStream(self.message):
+            yield event
+
+    async def get_final_message(self):
+        return self.message
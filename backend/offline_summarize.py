@@ -0,0 +1,39 @@
+"""
+離線批次重新摘要（Message Batches API），適合排程在夜間執行
+
+用法（在 backend/ 目錄下）：
+    python offline_summarize.py                 # 所有已儲存的文字稿
+    python offline_summarize.py youtube:xxxx    # 指定來源 ID
+    python offline_summarize.py --missing       # 只處理目前版本尚未有快取摘要的文字稿
+"""
+import sys
+import json
+
+from app import transcript_store, summary_cache, summarizer_service, resummarize_offline
+from services.cache import SummaryCache
+
+
+def main(argv: list) -> int:
+    only_missing = '--missing' in argv
+    source_ids = [arg for arg in argv if not arg.startswith('--')] or sorted({
+        item['source_id'] for item in transcript_store.list_transcripts() if item['source_id']
+    })
+
+    if only_missing:
+        source_ids = [
+            source_id for source_id in source_ids
+            if summary_cache.get(SummaryCache.make_key(source_id, summarizer_service.version)) is None
+        ]
+
+    if not source_ids:
+        print("沒有需要處理的文字稿")
+        return 0
+
+    print(f"離線批次摘要：{len(source_ids)} 項")
+    outcome = resummarize_offline(source_ids)
+    print(json.dumps(outcome, ensure_ascii=False, indent=2))
+    return 0 if all(status == "done" for status in outcome["results"].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,188 @@
+"""
+音訊處理工具（透過 ffmpeg / ffprobe）
+"""
+import re
+import queue
+import subprocess
+import threading
+
+SAMPLE_RATE = 16000
+
+_SILENCE_START_RE = re.compile(r'silence_start: (-?[\d.]+)')
+_SILENCE_END_RE = re.compile(r'silence_end: ([\d.]+)')
+
+
+def probe_duration(audio_path: str) -> float:
+    """取得音訊長度（秒）"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip() or 0)
+
+
+def detect_silences(audio_path: str, noise_db: int = -30, min_silence: float = 0.5) -> list:
+    """
+    偵測靜音區段
+
+    Returns:
+        list: [(開始秒數, 結束秒數)]
+    """
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', audio_path,
+         '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}', '-f', 'null', '-'],
+        capture_output=True, text=True
+    )
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(duration: float, silences: list, target_seconds: float, tolerance: float = 0.25) -> list:
+    """
+    規劃切段位置：在每個目標切點附近（± tolerance × target_seconds）找最近的靜音中點，
+    找不到靜音時直接在目標位置切開
+
+    Returns:
+        list: [(開始秒數, 結束秒數)]
+    """
+    midpoints = [(start + end) / 2 for start, end in silences]
+    window = target_seconds * tolerance
+
+    chunks = []
+    position = 0.0
+    while duration - position > target_seconds + window:
+        target = position + target_seconds
+        candidates = [m for m in midpoints if abs(m - target) <= window and m > position]
+        cut = min(candidates, key=lambda m: abs(m - target)) if candidates else target
+        chunks.append((position, cut))
+        position = cut
+    chunks.append((position, duration))
+    return chunks
+
+
+def extract_chunk(audio_path: str, start: float, end: float, output_path: str) -> str:
+    """擷取指定區段並轉為 16kHz 單聲道 WAV（Whisper 的輸入格式）"""
+    subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+         '-ss', f'{start:.3f}', '-t', f'{end - start:.3f}', '-i', audio_path,
+         '-ac', '1', '-ar', str(SAMPLE_RATE), output_path],
+        check=True
+    )
+    return output_path
+
+
+def iter_pcm_windows(byte_chunks, window_seconds: float, search_seconds: float = 5.0):
+    """
+    將邊下載邊產生的編碼音訊（mp3 / m4a ...）即時解碼為 16kHz 單聲道 float32 視窗（需 numpy）
+    下載、解碼在背景執行緒進行，呼叫端處理前一個視窗時下載不會停下；
+    最多預先解碼 2 個視窗，呼叫端跟不上時經由 ffmpeg 的管線回壓讓下載暫停，避免整集音訊堆在記憶體
+    每個視窗在尾端 search_seconds 內最安靜的位置切開，避免把字切斷
+
+    Yields:
+        tuple: (視窗起點秒數, numpy.ndarray)
+    """
+    import numpy as np
+
+    process = subprocess.Popen(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    windows = queue.Queue(maxsize=2)
+    closed = threading.Event()
+    errors = []
+    window_bytes = int(window_seconds * SAMPLE_RATE) * 2
+
+    def feed():
+        try:
+            for chunk in byte_chunks:
+                process.stdin.write(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def put(item) -> bool:
+        # 呼叫端提前結束時不再有人取出，不能無限期阻塞在已滿的佇列上
+        while not closed.is_set():
+            try:
+                windows.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain():
+        buffer = bytearray()
+        while True:
+            data = process.stdout.read(65536)
+            if not data:
+                break
+            buffer += data
+            if len(buffer) >= window_bytes:
+                if not put(bytes(buffer[:window_bytes])):
+                    return
+                del buffer[:window_bytes]
+        if len(buffer) >= 2 and not put(bytes(buffer[:len(buffer) // 2 * 2])):
+            return
+        put(None)
+
+    threading.Thread(target=feed, daemon=True, name='audio-feed').start()
+    threading.Thread(target=drain, daemon=True, name='audio-decode').start()
+
+    try:
+        carry = np.zeros(0, dtype=np.float32)
+        offset = 0.0
+        while True:
+            data = windows.get()
+            if data is None:
+                break
+            samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+            audio = np.concatenate([carry, samples])
+            cut = _quietest_cut(audio, search_seconds)
+            yield offset, audio[:cut]
+            offset += cut / SAMPLE_RATE
+            carry = audio[cut:]
+
+        if carry.size:
+            yield offset, carry
+
+        process.wait()
+        if errors:
+            raise errors[0]
+        if process.returncode:
+            raise RuntimeError(f"ffmpeg 解碼失敗（代碼 {process.returncode}）")
+    finally:
+        closed.set()
+        if process.poll() is None:
+            process.kill()
+
+
+def _quietest_cut(audio, search_seconds: float, frame_seconds: float = 0.1) -> int:
+    """在音訊尾端 search_seconds 內找能量最低的 frame，回傳切點位置"""
+    import numpy as np
+
+    frame = int(frame_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    if len(audio) < search * 2:
+        return len(audio)
+
+    tail = audio[len(audio) - search:]
+    frames = tail[:len(tail) // frame * frame].reshape(-1, frame)
+    quietest = int(np.argmin((frames ** 2).mean(axis=1)))
+    return len(audio) - search + quietest * frame + frame // 2
@@ -0,0 +1,70 @@
+"""
+批次摘要（播放清單 / 頻道 / RSS / 連結清單）
+- 各階段（取得文字稿、生成摘要）各自限制同時數量，不同項目的階段可以重疊
+- 記錄每個項目的狀態與整體吞吐量
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StageLimits:
+    """各階段的同時執行上限"""
+
+    def __init__(self, **limits):
+        self._semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+
+    @contextmanager
+    def stage(self, name: str):
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+
+class BatchProgress:
+    """批次中每個項目的狀態：pending / running / cached / done / failed / duplicate"""
+
+    def __init__(self, items: list):
+        """
+        Args:
+            items: [{"url", "title"}]
+        """
+        self.items = [
+            {"url": item["url"], "title": item.get("title", ""), "status": "pending",
+             "stage": None, "error": None, "seconds": None}
+            for item in items
+        ]
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, index: int, **fields):
+        with self._lock:
+            self.items[index].update(fields)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        """目前進度、各狀態數量與吞吐量"""
+        with self._lock:
+            items = [dict(item) for item in self.items]
+
+        counts = {}
+        for item in items:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        # 吞吐量只計算實際處理的項目（快取命中與重複項目不算）
+        processed = counts.get("done", 0) + counts.get("failed", 0)
+        return {
+            "total": len(items),
+            "counts": counts,
+            "elapsed_seconds": round(elapsed, 1),
+            "items_per_minute": round(processed * 60 / elapsed, 2) if elapsed > 0 else 0,
+            "finished": self.finished_at is not None,
+            "items": items,
+        }
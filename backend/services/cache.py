@@ -0,0 +1,142 @@
+"""
+摘要結果快取（SQLite）
+以影片 / 節目 ID + Prompt 與模型版本為鍵，重複請求直接回傳，不需重新下載或呼叫 Claude
+"""
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+
+
+class SummaryCache:
+    def __init__(self, db_path: str = None, ttl_seconds: int = None, max_entries: int = None):
+        """
+        初始化摘要快取
+
+        Args:
+            db_path: SQLite 檔案路徑（預設為暫存目錄）
+            ttl_seconds: 快取有效期限（秒），0 表示永不過期
+            max_entries: 最多保留筆數，超過時淘汰最久未使用的項目
+        """
+        self.db_path = db_path or os.getenv(
+            'SUMMARY_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'summary_cache.sqlite3')
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.getenv('SUMMARY_CACHE_TTL', 7 * 24 * 3600)
+        )
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv('SUMMARY_CACHE_MAX_ENTRIES', 1000)
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                cache_key TEXT PRIMARY KEY,
+                source_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_summaries_source ON summaries (source_id)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(source_id: str, version: str) -> str:
+        """組合快取鍵：來源 ID + Prompt / 模型版本"""
+        return f"{source_id}|{version}"
+
+    def get(self, cache_key: str) -> dict:
+        """讀取快取，過期或不存在時回傳 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, created_at FROM summaries WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone()
+
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute('DELETE FROM summaries WHERE cache_key = ?', (cache_key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                'UPDATE summaries SET accessed_at = ? WHERE cache_key = ?',
+                (now, cache_key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, cache_key: str, source_id: str, payload: dict):
+        """寫入快取，並依 TTL 與筆數上限淘汰舊資料"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO summaries (cache_key, source_id, payload, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (cache_key, source_id, json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """淘汰過期項目與超出上限的最久未使用項目"""
+        if self.ttl_seconds:
+            self._conn.execute(
+                'DELETE FROM summaries WHERE created_at < ?',
+                (now - self.ttl_seconds,)
+            )
+        if self.max_entries:
+            self._conn.execute("""
+                DELETE FROM summaries WHERE cache_key IN (
+                    SELECT cache_key FROM summaries
+                    ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def invalidate(self, source_id: str = None) -> int:
+        """
+        清除快取
+
+        Args:
+            source_id: 指定來源 ID；未指定時清除全部
+
+        Returns:
+            int: 刪除筆數
+        """
+        with self._lock:
+            if source_id:
+                cursor = self._conn.execute('DELETE FROM summaries WHERE source_id = ?', (source_id,))
+            else:
+                cursor = self._conn.execute('DELETE FROM summaries')
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """快取統計（命中 / 未命中次數與目前筆數）"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,204 @@
+"""
+字幕解析（VTT / SRT / json3）
+逐行串流解析；YouTube 自動字幕另外合併滾動重複內容（人工字幕不做合併）
+"""
+import io
+import re
+import itertools
+import json
+import html
+
+# 時間行: 00:00:01.000 --> 00:00:03.500 align:start position:0%（SRT 使用逗號）
+_TIMING_RE = re.compile(
+    r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})'
+)
+# 行內標記: <00:00:01.500>、<c>、</c>、<i> 等
+_TAG_RE = re.compile(r'<[^>]*>')
+
+# 滾動字幕合併：與前一個 cue 的間隔在此秒數內才視為相連；短於此秒數的 cue 視為重複快照
+_TOUCH_SECONDS = 0.05
+_SNAPSHOT_SECONDS = 0.05
+# 小數位數 → 除數（"5" = 0.5 秒、"50" = 0.5 秒、"500" = 0.5 秒）
+_MILLIS_SCALE = {1: 10, 2: 100, 3: 1000}
+
+
+def parse_captions(source, fmt: str = 'vtt', rolling: bool = False) -> dict:
+    """
+    解析字幕
+
+    Args:
+        source: 字幕內容（str / bytes / 逐行可迭代物件，例如檔案或 response.iter_lines()）
+        fmt: 字幕格式 vtt / srt / json3
+        rolling: 是否為 YouTube 自動字幕（滾動格式，需合併重複內容）；人工字幕逐 cue 保留
+
+    Returns:
+        dict: {"text": 完整文字, "segments": [{"start", "end", "text"}]}
+    """
+    if fmt in ('vtt', 'srt'):
+        cues = iter_timed_text_cues(_iter_lines(source))
+    elif fmt == 'json3':
+        cues = iter_json3_cues(source)
+    else:
+        raise ValueError(f"不支援的字幕格式: {fmt}")
+
+    merger = RollingCaptionMerger() if rolling else CaptionCollector()
+    for start, end, lines in cues:
+        merger.add(start, end, lines)
+    return merger.result()
+
+
+def iter_timed_text_cues(lines):
+    """
+    逐行解析 VTT / SRT，產生 (開始秒數, 結束秒數, [文字行])
+
+    標頭、NOTE / STYLE 區塊與序號行都不在時間行之後，因此自然被略過
+    """
+    start = end = None
+    text_lines = []
+
+    for raw in lines:
+        line = raw.rstrip('\r\n')
+
+        # 空行代表 cue 結束（YouTube 會在 cue 內放只有空白的行，不視為結束）
+        if not line:
+            if start is not None:
+                yield start, end, text_lines
+                start, text_lines = None, []
+            continue
+
+        if '-->' in line:
+            match = _TIMING_RE.search(line)
+            if match:
+                if start is not None:
+                    yield start, end, text_lines
+                g = match.groups()
+                start = _to_seconds(g[0], g[1], g[2], g[3])
+                end = _to_seconds(g[4], g[5], g[6], g[7])
+                text_lines = []
+                continue
+
+        if start is not None:
+            text = _clean(line)
+            if text:
+                text_lines.append(text)
+
+    if start is not None:
+        yield start, end, text_lines
+
+
+def iter_json3_cues(source):
+    """解析 YouTube json3 字幕，產生 (開始秒數, 結束秒數, [文字行])"""
+    if isinstance(source, (bytes, str)):
+        data = json.loads(source)
+    elif isinstance(source, dict):
+        data = source
+    else:
+        data = json.load(source)
+
+    for event in data.get('events', []):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        text = ''.join(seg.get('utf8', '') for seg in segs)
+        lines = [_clean(line) for line in text.split('\n')]
+        lines = [line for line in lines if line]
+        if not lines:
+            continue
+        start = event.get('tStartMs', 0) / 1000
+        end = start + event.get('dDurationMs', 0) / 1000
+        yield start, end, lines
+
+
+class CaptionCollector:
+    """一般字幕：每個有文字的 cue 為一段，重複的台詞照實保留"""
+
+    def __init__(self):
+        self.segments = []
+
+    def add(self, start: float, end: float, lines: list):
+        if lines:
+            self.segments.append({'start': start, 'end': end, 'text': ' '.join(lines)})
+
+    def result(self) -> dict:
+        return {
+            'text': ' '.join(seg['text'] for seg in self.segments),
+            'segments': self.segments
+        }
+
+
+class RollingCaptionMerger(CaptionCollector):
+    """
+    合併滾動字幕
+
+    YouTube 自動字幕每個 cue 的第一行重複上一個 cue 的最後一行，並穿插 10ms 的重複快照 cue。
+    只和時間上相連（重疊或緊接）的前一個 cue 比對：
+    - 後面還有新行的重複行（上一句被往上捲）直接略過
+    - 整個 cue 都是前一個 cue 的內容且極短（快照）時，只延長上一段的結束時間
+    - 本行以前一個 cue 的最後一行開頭（逐字增長）時只保留新增部分
+    其餘情況（包括真的連說兩次的同一句話）都照實保留。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._prev_lines = []
+        self._prev_end = None
+
+    def add(self, start: float, end: float, lines: list):
+        if not lines:
+            return
+        touching = self._prev_end is not None and start <= self._prev_end + _TOUCH_SECONDS
+        prev_lines = self._prev_lines if touching else []
+        self._prev_lines, self._prev_end = lines, end
+
+        if prev_lines and end - start <= _SNAPSHOT_SECONDS and all(line in prev_lines for line in lines):
+            if self.segments and end > self.segments[-1]['end']:
+                self.segments[-1]['end'] = end
+            return
+
+        new_parts = []
+        last = len(lines) - 1
+        for i, line in enumerate(lines):
+            if prev_lines and i < last and line == prev_lines[-1]:
+                continue
+            if prev_lines and i == 0 and line != prev_lines[-1] and line.startswith(prev_lines[-1]):
+                line = line[len(prev_lines[-1]):].strip()
+            if line:
+                new_parts.append(line)
+
+        if new_parts:
+            self.segments.append({'start': start, 'end': end, 'text': ' '.join(new_parts)})
+
+
+def _iter_lines(source):
+    """
+    將各種輸入轉為逐行文字
+    str 行（檔案、splitlines 結果）直接回傳原本的迭代器，只處理第一行的 BOM，避免每行多一層 generator
+    """
+    if isinstance(source, bytes):
+        source = io.TextIOWrapper(io.BytesIO(source), encoding='utf-8-sig')
+    elif isinstance(source, str):
+        source = io.StringIO(source)
+
+    lines = iter(source)
+    first = next(lines, None)
+    if first is None:
+        return iter(())
+    if isinstance(first, bytes):
+        # response.iter_lines() 等 bytes 行
+        lines = (line.decode('utf-8', errors='replace') for line in lines)
+        first = first.decode('utf-8', errors='replace')
+    return itertools.chain((first.lstrip('\ufeff'),), lines)
+
+
+def _clean(line: str) -> str:
+    """移除行內標記與多餘空白"""
+    if '<' in line:
+        line = _TAG_RE.sub('', line)
+    if '&' in line:
+        line = html.unescape(line)
+    return ' '.join(line.split())
+
+
+def _to_seconds(hours, minutes, seconds, millis) -> float:
+    total = int(minutes) * 60 + int(seconds) + int(millis) / _MILLIS_SCALE[len(millis)]
+    return total + int(hours) * 3600 if hours else total
@@ -0,0 +1,88 @@
+"""
+文字稿壓縮：送入模型前將零碎的字幕 / 轉錄段落合併成段落，並依 token 預算裁切
+- 自動字幕每段只有 2-3 秒，逐段加上 [mm:ss] 時間軸會浪費大量 token
+- 合併為約 30 秒的段落，只在段落開頭保留時間軸
+"""
+import re
+
+from .tokens import estimate_tokens
+
+_CJK_EDGE_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def compact_segments(segments: list, paragraph_seconds: float = 30.0) -> list:
+    """
+    將相鄰段落合併成約 paragraph_seconds 秒的段落（格式與原段落相同）
+
+    Returns:
+        list: [{"start", "end", "text"}]
+    """
+    paragraphs = []
+    current = None
+
+    for seg in segments:
+        text = (seg.get('text') or '').strip()
+        if not text:
+            continue
+        if current is None or seg['start'] - current['start'] >= paragraph_seconds:
+            current = {"start": seg['start'], "end": seg['end'], "text": text}
+            paragraphs.append(current)
+            continue
+        current['text'] = _join(current['text'], text)
+        current['end'] = max(current['end'], seg['end'])
+
+    return paragraphs
+
+
+def fit_to_budget(lines: list, max_tokens: int, gap_marker: str = "...") -> list:
+    """
+    超過 token 預算時，在全片範圍內平均挑選段落（不只保留開頭），被略過處以 gap_marker 標示
+
+    Args:
+        lines: 已格式化的段落文字（依時間順序）
+        max_tokens: token 預算
+
+    Returns:
+        list: 挑選後的段落文字
+    """
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    if sum(costs) <= max_tokens:
+        return list(lines)
+
+    marker_cost = estimate_tokens(gap_marker) + 1
+
+    def pick(count):
+        """平均間隔挑選 count 段，回傳 (索引, 總 token 數含略過標記)"""
+        indices = [i * len(lines) // count for i in range(count)]
+        total = sum(costs[i] for i in indices)
+        gaps = sum(1 for prev, cur in zip([-1] + indices, indices + [len(lines)]) if cur - prev > 1)
+        return indices, total + gaps * marker_cost
+
+    # 二分搜尋預算內能保留的最多段數
+    low, high = 0, len(lines)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if pick(mid)[1] <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    if low == 0:
+        return []
+
+    selected = []
+    previous = -1
+    for index in pick(low)[0]:
+        if index - previous > 1:
+            selected.append(gap_marker)
+        selected.append(lines[index])
+        previous = index
+    if previous < len(lines) - 1:
+        selected.append(gap_marker)
+    return selected
+
+
+def _join(left: str, right: str) -> str:
+    """中日韓文字之間不加空白，其他情況以空白連接"""
+    if _CJK_EDGE_RE.match(left[-1]) and _CJK_EDGE_RE.match(right[0]):
+        return left + right
+    return f"{left} {right}"
@@ -0,0 +1,204 @@
+"""
+共用 HTTP 連線池與音訊下載
+- 所有外部請求共用同一個 requests.Session（重複使用 TLS 連線）；ASGI 模式另有 httpx 非同步連線池
+- 大型檔案支援 HTTP Range 斷點續傳與多段平行下載
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# 連線中斷時可續傳的錯誤
+_RESUMABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+def create_session(pool_size: int = None) -> requests.Session:
+    """建立具連線池與自動重試（僅 GET / HEAD）的 Session"""
+    pool_size = pool_size or int(os.getenv('HTTP_POOL_SIZE', 16))
+    retry = Retry(
+        total=2,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.verify = False  # 與原本的 verify=False 行為一致（開發用）
+    return session
+
+
+def create_async_client(pool_size: int = None):
+    """
+    建立非同步 HTTP 連線池（ASGI 模式使用，需要 httpx）
+    同時進行中的請求多，連線數上限另由 ASYNC_HTTP_POOL_SIZE 設定
+    """
+    import httpx
+
+    pool_size = pool_size or int(os.getenv('ASYNC_HTTP_POOL_SIZE', 100))
+    transport = httpx.AsyncHTTPTransport(
+        retries=2,  # 僅重試連線失敗
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        verify=False,  # 與同步 Session 一致（開發用）
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        headers={'User-Agent': USER_AGENT},
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        follow_redirects=True,
+    )
+
+
+class Downloader:
+    def __init__(self, session: requests.Session, chunk_size: int = None,
+                 parallel_threshold: int = None, parallel_parts: int = None, max_attempts: int = 5):
+        """
+        Args:
+            session: 共用的 requests.Session
+            chunk_size: 每次讀寫的大小（bytes）
+            parallel_threshold: 超過此大小且伺服器支援 Range 時改用平行下載
+            parallel_parts: 平行下載的分段數
+            max_attempts: 每段連線中斷時的最多嘗試次數
+        """
+        self.session = session
+        self.chunk_size = chunk_size or int(os.getenv('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+        self.parallel_threshold = parallel_threshold or int(os.getenv('DOWNLOAD_PARALLEL_THRESHOLD', 32 * 1024 * 1024))
+        self.parallel_parts = parallel_parts or int(os.getenv('DOWNLOAD_PARALLEL_PARTS', 4))
+        self.max_attempts = max_attempts
+
+    def download(self, url: str, output_path: str) -> int:
+        """
+        下載檔案
+
+        Returns:
+            int: 下載的位元組數
+        """
+        size, url, accepts_ranges = self._probe(url)
+
+        if size and accepts_ranges and size >= self.parallel_threshold and self.parallel_parts > 1:
+            print(f"[Download] 平行下載 {size / 1024 / 1024:.1f} MB（{self.parallel_parts} 段）")
+            self._download_parallel(url, output_path, size)
+            return size
+
+        return self._download_resumable(url, output_path, size if accepts_ranges else None)
+
+    def iter_bytes(self, url: str):
+        """串流下載，逐塊產生內容；中斷時以 Range 從目前位置續傳"""
+        position = 0
+        for attempt in range(self.max_attempts):
+            headers = {'User-Agent': USER_AGENT}
+            if position:
+                headers['Range'] = f'bytes={position}-'
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    response.raise_for_status()
+                    if position and response.status_code != 206:
+                        raise RuntimeError("伺服器不支援續傳，無法從中斷處繼續")
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        position += len(chunk)
+                        yield chunk
+                return
+            except _RESUMABLE_ERRORS as e:
+                print(f"[Download] 連線中斷（第 {attempt + 1} 次），從 {position} bytes 續傳: {e}")
+        raise RuntimeError(f"下載失敗，已重試 {self.max_attempts} 次")
+
+    def _probe(self, url: str) -> tuple:
+        """
+        查詢檔案大小與是否支援 Range
+
+        Returns:
+            tuple: (大小或 None, 轉址後的最終網址, 是否支援 Range)
+        """
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=10,
+                                         headers={'User-Agent': USER_AGENT})
+            if response.ok:
+                size = int(response.headers.get('Content-Length') or 0) or None
+                accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                return size, response.url, accepts_ranges
+        except requests.RequestException as e:
+            print(f"[Download] HEAD 失敗，改用一般下載: {e}")
+        return None, url, False
+
+    def _download_resumable(self, url: str, output_path: str, size: int = None) -> int:
+        """單一連線下載；中斷時以 Range 從已寫入的位置續傳"""
+        written = 0
+        with open(output_path, 'wb', buffering=self.chunk_size) as f:
+            for attempt in range(self.max_attempts):
+                headers = {'User-Agent': USER_AGENT}
+                if written:
+                    headers['Range'] = f'bytes={written}-'
+                try:
+                    with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                        response.raise_for_status()
+                        if written and response.status_code != 206:
+                            # 伺服器不支援續傳，從頭開始
+                            f.seek(0)
+                            f.truncate()
+                            written = 0
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            written += len(chunk)
+                    if size is None or written >= size:
+                        return written
+                except _RESUMABLE_ERRORS as e:
+                    print(f"[Download] 連線中斷（第 {attempt + 1} 次），從 {written} bytes 續傳: {e}")
+                    f.flush()
+        raise RuntimeError(f"下載失敗，已重試 {self.max_attempts} 次")
+
+    def _download_parallel(self, url: str, output_path: str, size: int):
+        """多段 Range 平行下載，各段寫入預先配置好大小的檔案"""
+        with open(output_path, 'wb') as f:
+            f.truncate(size)
+
+        part_size = -(-size // self.parallel_parts)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+        errors = []
+        lock = threading.Lock()
+
+        def fetch(part):
+            try:
+                self._download_range(url, output_path, *part)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='download') as executor:
+            list(executor.map(fetch, ranges))
+
+        if errors:
+            raise errors[0]
+
+    def _download_range(self, url: str, output_path: str, start: int, end: int):
+        """下載單一區段（含續傳）"""
+        position = start
+        with open(output_path, 'r+b', buffering=self.chunk_size) as f:
+            f.seek(position)
+            for attempt in range(self.max_attempts):
+                headers = {'User-Agent': USER_AGENT, 'Range': f'bytes={position}-{end}'}
+                try:
+                    with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise RuntimeError("伺服器未回傳部分內容，無法平行下載")
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            position += len(chunk)
+                    if position > end:
+                        return
+                except _RESUMABLE_ERRORS as e:
+                    print(f"[Download] 區段 {start}-{end} 中斷（第 {attempt + 1} 次），從 {position} 續傳: {e}")
+                    f.flush()
+        raise RuntimeError(f"區段 {start}-{end} 下載失敗，已重試 {self.max_attempts} 次")
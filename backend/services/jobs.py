@@ -0,0 +1,103 @@
+"""
+非同步工作佇列（行程內執行緒池）
+提交後立即回傳工作 ID，由有限數量的背景執行緒執行摘要流程
+"""
+import os
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """等待中的工作已達上限"""
+
+
+class JobQueue:
+    def __init__(self, max_workers: int = None, max_pending: int = None, ttl_seconds: int = None):
+        """
+        初始化工作佇列
+
+        Args:
+            max_workers: 同時執行的工作數
+            max_pending: 等待 + 執行中的工作上限，超過時拒絕新工作
+            ttl_seconds: 已完成工作的保留時間（秒）
+        """
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', 2))
+        self.max_pending = max_pending or int(os.getenv('JOB_MAX_PENDING', 50))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('JOB_TTL', 3600))
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs) -> str:
+        """
+        提交工作
+
+        Args:
+            func: 工作函式，會以關鍵字參數 report(stage, progress) 回報進度
+
+        Returns:
+            str: 工作 ID
+        """
+        self._prune()
+
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if active >= self.max_pending:
+                raise QueueFullError("目前處理中的工作過多，請稍後再試")
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "stage": "queued",
+                "progress": 0,
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        """取得工作狀態（複本），不存在時回傳 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, func, args, kwargs):
+        """在背景執行緒中執行工作"""
+        self._update(job_id, status="running", started_at=time.time())
+
+        def report(stage: str, progress: int):
+            self._update(job_id, stage=stage, progress=progress)
+
+        try:
+            result = func(*args, report=report, **kwargs)
+            self._update(job_id, status="done", stage="done", progress=100,
+                         result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"[Jobs] 工作 {job_id} 失敗: {traceback.format_exc()}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _prune(self):
+        """移除超過保留時間的已完成工作"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
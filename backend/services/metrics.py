@@ -0,0 +1,76 @@
+"""
+簡易效能指標（行程內）
+"""
+import threading
+
+
+class Histogram:
+    """延遲分佈統計（秒），桶為累計計數"""
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, buckets: tuple = None):
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 4),
+                "avg": round(self.sum / self.count, 4) if self.count else 0.0,
+                "buckets": {str(bound): n for bound, n in zip(self.buckets, self.counts)},
+            }
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_histogram(name: str, samples: list, help_text: str = "") -> list:
+    """
+    將 Histogram.snapshot() 轉為 Prometheus 文字格式
+
+    Args:
+        samples: [(labels dict, snapshot dict)]
+
+    Returns:
+        list: 文字行
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, snap in samples:
+        for bound, count in snap["buckets"].items():
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {snap['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {snap['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {snap['count']}")
+    return lines
+
+
+def prometheus_values(name: str, samples: list, metric_type: str = "gauge", help_text: str = "") -> list:
+    """
+    單一數值指標轉為 Prometheus 文字格式
+
+    Args:
+        samples: [(labels dict, 數值)]，非數值（None、字串等）會略過
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return lines
@@ -0,0 +1,138 @@
+"""
+摘要模型路由：依文字稿 token 數與詳細程度（detail）選擇模型與輸出上限
+- detail=full：完整 V3 精華文章；文字稿不超過 SUMMARY_SMALL_TOKENS 時改用 small tier（較快、較便宜的模型）
+- detail=quick：只產生一句話總結與時間軸，使用 quick tier（小模型、較小的輸出上限）
+- 各 tier 分別記錄摘要耗時、token 用量與估算費用，供調整門檻與模型選擇
+"""
+import os
+import threading
+
+from .metrics import Histogram
+
+DETAILS = ("full", "quick")
+QUICK_FIELDS = ("one_liner", "timestamps")
+
+# 每百萬 tokens 單價（美元）：(輸入, 輸出)；快取寫入為輸入的 1.25 倍、快取讀取為 0.1 倍
+# 未列出的模型可用 SUMMARY_<TIER>_PRICE="輸入,輸出" 指定，否則不估算費用
+MODEL_PRICES = {
+    "claude-opus-4-20250514": (15.0, 75.0),
+    "claude-sonnet-4-20250514": (3.0, 15.0),
+    "claude-3-7-sonnet-20250219": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+}
+# Message Batches 的費用折扣
+BATCH_PRICE_FACTOR = 0.5
+
+
+class ModelTier:
+    """一個路由目標：模型、輸出上限與要產生的欄位（None 表示完整 V3）"""
+
+    def __init__(self, name: str, model: str, max_tokens: int, fields: tuple = None):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.fields = fields
+        price = os.getenv(f'SUMMARY_{name.upper()}_PRICE')
+        self.price = tuple(float(value) for value in price.split(',')) if price else MODEL_PRICES.get(model)
+
+    def cost(self, input_tokens: int, output_tokens: int, cache_read: int = 0, cache_write: int = 0) -> float:
+        """依用量估算費用（美元）；未知單價時為 None"""
+        if self.price is None:
+            return None
+        input_price, output_price = self.price
+        return (input_tokens * input_price + cache_write * input_price * 1.25 + cache_read * input_price * 0.1
+                + output_tokens * output_price) / 1_000_000
+
+
+class ModelRouter:
+    def __init__(self, default_model: str, default_max_tokens: int):
+        """
+        Args:
+            default_model / default_max_tokens: standard tier 的預設值（SUMMARY_STANDARD_* 未設定時使用）
+        """
+        small_model = 'claude-3-5-haiku-20241022'
+        self.tiers = {
+            "standard": ModelTier(
+                "standard",
+                os.getenv('SUMMARY_STANDARD_MODEL', default_model),
+                int(os.getenv('SUMMARY_STANDARD_MAX_TOKENS', default_max_tokens)),
+            ),
+            "small": ModelTier(
+                "small",
+                os.getenv('SUMMARY_SMALL_MODEL', small_model),
+                int(os.getenv('SUMMARY_SMALL_MAX_TOKENS', 3000)),
+            ),
+            "quick": ModelTier(
+                "quick",
+                os.getenv('SUMMARY_QUICK_MODEL', small_model),
+                int(os.getenv('SUMMARY_QUICK_MAX_TOKENS', 1000)),
+                QUICK_FIELDS,
+            ),
+        }
+        # 文字稿（壓縮後）不超過此 token 數時使用 small tier，0 表示不使用
+        self.small_tokens = int(os.getenv('SUMMARY_SMALL_TOKENS', 3000))
+
+        self._lock = threading.Lock()
+        self.latency = {name: Histogram() for name in self.tiers}
+        self.usage = {name: {"summaries": 0, "calls": 0, "batch_calls": 0, "input_tokens": 0, "output_tokens": 0,
+                             "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0, "cost_usd": 0.0}
+                      for name in self.tiers}
+
+    def route(self, transcript_tokens: int, detail: str = "full") -> ModelTier:
+        """依詳細程度與文字稿 token 數選擇 tier"""
+        if detail == "quick":
+            return self.tiers["quick"]
+        if self.small_tokens and transcript_tokens <= self.small_tokens:
+            return self.tiers["small"]
+        return self.tiers["standard"]
+
+    def models(self, detail: str = "full") -> list:
+        """該詳細程度可能使用的模型（用於快取版本）"""
+        if detail == "quick":
+            return [self.tiers["quick"].model]
+        models = [self.tiers["standard"].model]
+        if self.small_tokens and self.tiers["small"].model not in models:
+            models.append(self.tiers["small"].model)
+        return models
+
+    def record_call(self, tier: ModelTier, usage, batch: bool = False):
+        """累計單次模型呼叫（含分段摘要與重新生成）的 token 用量與費用；batch 為 Message Batches 請求"""
+        counts = {key: getattr(usage, key, 0) or 0 for key in
+                  ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")}
+        cost = tier.cost(counts["input_tokens"], counts["output_tokens"],
+                         counts["cache_read_input_tokens"], counts["cache_creation_input_tokens"])
+        if cost is not None and batch:
+            cost *= BATCH_PRICE_FACTOR
+        with self._lock:
+            totals = self.usage[tier.name]
+            totals["batch_calls" if batch else "calls"] += 1
+            for key, value in counts.items():
+                totals[key] += value
+            if cost is not None:
+                totals["cost_usd"] += cost
+
+    def observe(self, tier: ModelTier, seconds: float):
+        """記錄一次完整摘要的耗時"""
+        self.latency[tier.name].observe(seconds)
+        with self._lock:
+            self.usage[tier.name]["summaries"] += 1
+
+    def stats(self) -> dict:
+        """各 tier 的設定、摘要耗時分佈、用量與平均每次摘要費用"""
+        with self._lock:
+            usage = {name: dict(values) for name, values in self.usage.items()}
+        tiers = {}
+        for name, tier in self.tiers.items():
+            totals = usage[name]
+            tiers[name] = {
+                "model": tier.model,
+                "max_tokens": tier.max_tokens,
+                "price_per_mtok": list(tier.price) if tier.price else None,
+                "latency_seconds": self.latency[name].snapshot(),
+                **totals,
+                "cost_usd": round(totals["cost_usd"], 6),
+                "cost_per_summary_usd": (round(totals["cost_usd"] / totals["summaries"], 6)
+                                         if totals["summaries"] else None),
+            }
+        return {"small_tokens": self.small_tokens, "tiers": tiers}
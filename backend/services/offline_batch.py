@@ -0,0 +1,254 @@
+"""
+離線批次摘要（Anthropic Message Batches API）
+- 非即時的大量摘要（例如整季節目重新摘要）改用 Message Batches：費用約為一般呼叫的一半，
+  且不佔用即時請求的速率額度
+- 長文字稿同樣採 map-reduce：先以一個批次送出所有分段筆記，再以一個批次送出最終摘要
+- 不合格欄位的重新生成同樣以後續批次送出（不走即時呼叫），仍不合格的項目標記為 degraded
+- 各請求的用量記入摘要服務與各 tier 的統計（以批次折扣估算費用）
+"""
+import os
+import time
+import random
+
+import anthropic
+
+from .rate_limit import RETRY_STATUS
+from .summary_schema import validate_summary
+
+
+class OfflineBatchSummarizer:
+    def __init__(self, summarizer, poll_interval: float = None, max_requests: int = None):
+        """
+        Args:
+            summarizer: SummarizerService（共用 Prompt、路由與解析邏輯）
+            poll_interval: 查詢批次狀態的間隔（秒）
+            max_requests: 每個批次最多的請求數，超過時拆成多個批次
+        """
+        self.summarizer = summarizer
+        self.poll_interval = poll_interval if poll_interval is not None else float(
+            os.getenv('OFFLINE_BATCH_POLL_SECONDS', 60)
+        )
+        self.max_requests = max_requests or int(os.getenv('OFFLINE_BATCH_MAX_REQUESTS', 10000))
+
+    def run(self, items: list, on_result, report=None) -> dict:
+        """
+        批次生成摘要
+
+        Args:
+            items: [(來源 ID, 文字稿, 元資料)]
+            on_result: 每完成一項時呼叫 on_result(來源 ID, 元資料, 摘要)
+            report: 進度回報函式 report(stage, progress)，可選
+
+        Returns:
+            dict: {"results": {來源 ID: "done" / "degraded: 欄位..." / "failed: ..."}, "usage": {...}}
+        """
+        report = report or (lambda stage, progress: None)
+        summarizer = self.summarizer
+        results = {}
+        usage = {"input_tokens": 0, "output_tokens": 0, "batches": 0}
+
+        # Map：長文字稿的所有分段筆記放進同一個批次
+        final_prompts = {}
+        tiers = {}
+        chunk_requests = {}
+        chunk_info = {}
+        for index, (source_id, transcript, metadata) in enumerate(items):
+            segments, mode, tier = summarizer._route(transcript["segments"], "auto", "full")
+            tiers[index] = tier
+            if mode != "map_reduce":
+                final_prompts[index] = summarizer._build_prompt(
+                    summarizer._format_segments(segments), metadata, fields=tier.fields
+                )
+                continue
+
+            chunks = summarizer._chunk_segments(segments, summarizer.chunk_tokens)
+            chunk_info[index] = []
+            for chunk_index, chunk in enumerate(chunks):
+                prompt, time_range = summarizer._build_chunk_prompt(chunk, chunk_index, len(chunks), metadata)
+                custom_id = f"chunk-{index}-{chunk_index}"
+                chunk_requests[custom_id] = (
+                    summarizer._request_params(prompt, summarizer.CHUNK_MAX_TOKENS, kind="chunk", tier=tier),
+                    "chunk", tier,
+                )
+                chunk_info[index].append((custom_id, time_range))
+
+        if chunk_requests:
+            print(f"[OfflineBatch] 送出 {len(chunk_requests)} 個分段筆記請求")
+            report('map', 10)
+            responses, errors = self._run_batches(chunk_requests, usage)
+
+            for index, chunks in chunk_info.items():
+                failed = [custom_id for custom_id, _ in chunks if custom_id not in responses]
+                if failed:
+                    results[items[index][0]] = f"failed: {errors.get(failed[0], 'unknown')}"
+                    continue
+                notes = [
+                    summarizer._format_chunk_note(responses[custom_id], chunk_index, time_range)
+                    for chunk_index, (custom_id, time_range) in enumerate(chunks)
+                ]
+                final_prompts[index] = summarizer._build_reduce_prompt("\n\n".join(notes), items[index][2])
+
+        # Reduce / 單次摘要
+        summary_requests = {
+            f"summary-{index}": (summarizer._request_params(prompt, tiers[index].max_tokens, tier=tiers[index]),
+                                 "summary", tiers[index])
+            for index, prompt in final_prompts.items()
+        }
+        summaries = {}
+        pending = {}
+        if summary_requests:
+            print(f"[OfflineBatch] 送出 {len(summary_requests)} 個摘要請求")
+            report('summarize', 50)
+            responses, errors = self._run_batches(summary_requests, usage)
+
+            for index, prompt in final_prompts.items():
+                custom_id = f"summary-{index}"
+                if custom_id not in responses:
+                    results[items[index][0]] = f"failed: {errors.get(custom_id, 'unknown')}"
+                    continue
+                steps = summarizer._repair_steps(responses[custom_id], prompt, tiers[index])
+                self._advance(index, steps, None, pending, summaries)
+
+        # 不合格欄位：以後續批次重新生成（每輪一個批次，最多 SUMMARY_REPAIR_ATTEMPTS 輪）
+        attempt = 0
+        while pending:
+            attempt += 1
+            print(f"[OfflineBatch] 送出 {len(pending)} 個欄位重新生成請求（第 {attempt} 輪）")
+            report('repair', 80)
+            repair_requests = {
+                f"repair-{index}-{attempt}": (
+                    summarizer._repair_request(final_prompts[index], sections, fields, tiers[index]),
+                    "summary", tiers[index],
+                )
+                for index, (_, (sections, fields)) in pending.items()
+            }
+            responses, errors = self._run_batches(repair_requests, usage)
+
+            current, pending = pending, {}
+            for index, (steps, _) in current.items():
+                custom_id = f"repair-{index}-{attempt}"
+                if custom_id in responses:
+                    repaired = summarizer._repair_output(responses[custom_id])
+                else:
+                    repaired = RuntimeError(errors.get(custom_id, 'unknown'))
+                self._advance(index, steps, repaired, pending, summaries)
+
+        for index, summary in summaries.items():
+            source_id, _, metadata = items[index]
+            invalid = validate_summary(summary, tiers[index].fields)
+            try:
+                on_result(source_id, metadata, summary)
+            except Exception as e:
+                print(f"[OfflineBatch] {source_id} 寫入失敗: {e}")
+                results[source_id] = f"failed: {e}"
+                continue
+            results[source_id] = f"degraded: {', '.join(invalid)}" if invalid else "done"
+
+        return {"results": results, "usage": usage}
+
+    def _advance(self, index: int, steps, value, pending: dict, summaries: dict):
+        """
+        推進單項的驗證 / 重新生成流程（Summarizer._repair_steps）
+        需要重新生成時放入 pending，完成時放入 summaries
+        """
+        try:
+            pending[index] = (steps, steps.send(value))
+        except StopIteration as done:
+            summaries[index] = done.value
+
+    def _run_batches(self, requests: dict, usage: dict) -> tuple:
+        """
+        送出請求（依上限拆成多個批次）並等待全部完成
+
+        Args:
+            requests: {custom_id: (請求參數, 呼叫類型 summary / chunk, ModelTier)}
+
+        Returns:
+            tuple: ({custom_id: 回應文字或 tool 輸入}, {custom_id: 錯誤原因})
+        """
+        client = self.summarizer._get_client()
+        custom_ids = list(requests)
+
+        # 建立批次不是冪等操作（逾時後重送可能重複建立、重複計費），失敗時不重試
+        batch_ids = []
+        for start in range(0, len(custom_ids), self.max_requests):
+            try:
+                batch = client.messages.batches.create(requests=[
+                    {"custom_id": custom_id, "params": requests[custom_id][0]}
+                    for custom_id in custom_ids[start:start + self.max_requests]
+                ])
+            except Exception:
+                if batch_ids:
+                    print(f"[OfflineBatch] 建立批次失敗；已建立的批次 {', '.join(batch_ids)} 仍會處理，可稍後取回結果")
+                raise
+            print(f"[OfflineBatch] 已建立批次 {batch.id}")
+            batch_ids.append(batch.id)
+        usage["batches"] += len(batch_ids)
+
+        responses = {}
+        errors = {}
+        for position, batch_id in enumerate(batch_ids):
+            try:
+                self._wait(client, batch_id)
+                entries = self._retrying(lambda: list(client.messages.batches.results(batch_id)))
+            except Exception:
+                print(f"[OfflineBatch] 無法取得結果；批次 {', '.join(batch_ids[position:])} 可稍後取回")
+                raise
+            for entry in entries:
+                result = entry.result
+                if result.type == "succeeded":
+                    _, kind, tier = requests[entry.custom_id]
+                    responses[entry.custom_id] = self.summarizer._message_output(result.message)
+                    usage["input_tokens"] += result.message.usage.input_tokens
+                    usage["output_tokens"] += result.message.usage.output_tokens
+                    self.summarizer.record_batch_usage(kind, result.message.usage, tier)
+                else:
+                    errors[entry.custom_id] = result.type
+        return responses, errors
+
+    def _wait(self, client, batch_id: str):
+        """輪詢直到批次處理結束；暫時性錯誤不放棄（批次已付費送出），退避後繼續輪詢"""
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                batch = client.messages.batches.retrieve(batch_id)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                attempt += 1
+                print(f"[OfflineBatch] 查詢批次 {batch_id} 失敗（{e}），{delay:.0f} 秒後重試")
+                time.sleep(delay)
+                continue
+            attempt = 0
+            if batch.processing_status == "ended":
+                counts = batch.request_counts
+                print(f"[OfflineBatch] 批次 {batch_id} 完成（成功 {counts.succeeded}，失敗 {counts.errored}，"
+                      f"耗時 {time.perf_counter() - start:.0f} 秒）")
+                return batch
+            time.sleep(self.poll_interval)
+
+    def _retrying(self, request):
+        """取結果遇到可重試錯誤時退避重試，重試次數用完時拋出原本的錯誤"""
+        max_retries = self.summarizer.rate_limiter.max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                return request()
+            except Exception as e:
+                if attempt >= max_retries:
+                    raise
+                time.sleep(self._retry_delay(e, attempt))
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """
+        可重試的錯誤（429、5xx、連線錯誤）回傳等待秒數，否則拋出原本的錯誤
+        與 RateLimiter.retry_delay 相同的退避方式，但不暫停即時呼叫、不計入即時呼叫的統計
+        """
+        if getattr(error, 'status_code', None) not in RETRY_STATUS \
+                and not isinstance(error, anthropic.APIConnectionError):
+            raise error
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers['retry-after'])
+        except (KeyError, TypeError, ValueError):
+            return min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
@@ -0,0 +1,65 @@
+"""
+增量 JSON 解析
+模型逐字輸出 JSON 物件時，每當一個最上層欄位完整出現就立即取出
+"""
+import json
+
+
+class IncrementalJsonObject:
+    def __init__(self):
+        self.buffer = ''
+        self.sections = {}
+        self._decoder = json.JSONDecoder()
+        self._pos = None  # 下一個待解析欄位的位置（None 表示尚未看到開頭的 "{"）
+        self.closed = False
+
+    def feed(self, text: str) -> list:
+        """
+        加入新的輸出片段
+
+        Returns:
+            list: 本次新完成的 [(欄位名稱, 值)]
+        """
+        self.buffer += text
+        completed = []
+
+        if self._pos is None:
+            start = self.buffer.find('{')
+            if start == -1:
+                return completed
+            self._pos = start + 1
+
+        while not self.closed:
+            pos = self._skip(self._pos)
+            if pos >= len(self.buffer):
+                break
+            if self.buffer[pos] == '}':
+                self.closed = True
+                break
+
+            try:
+                key, pos = self._decoder.raw_decode(self.buffer, pos)
+                pos = self._skip(pos)
+                if pos >= len(self.buffer) or self.buffer[pos] != ':':
+                    break
+                value, pos = self._decoder.raw_decode(self.buffer, self._skip(pos + 1))
+            except json.JSONDecodeError:
+                break  # 欄位尚未完整，等待更多輸出
+
+            # 數字等純量值可能還沒輸出完，需看到後面的分隔符才算完成
+            end = self._skip(pos)
+            if end >= len(self.buffer):
+                break
+
+            self.sections[key] = value
+            completed.append((key, value))
+            self._pos = end
+
+        return completed
+
+    def _skip(self, pos: int) -> int:
+        """略過空白與逗號"""
+        buffer = self.buffer
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        return pos
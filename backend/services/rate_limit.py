@@ -0,0 +1,338 @@
+"""
+Claude 呼叫的速率限制與退避（同一行程內所有呼叫共用）
+- 每分鐘請求數（RPM）、輸入 token（ITPM）、輸出 token（OTPM）各一個 token bucket
+- 呼叫前預扣：輸入以估算值、輸出以 max_tokens 預扣，回應後依實際用量校正（與 Anthropic 計算方式相同）
+- 回應的 anthropic-ratelimit-* 標頭用來校正上限與剩餘額度
+- 429 / 529（overloaded）依 retry-after 標頭或指數退避重試；429 時所有呼叫一起暫停
+- 兩條優先順序：interactive（使用者等待中）優先，batch（批次、重新摘要）須保留部分額度給 interactive
+- 新請求的 interactive 預估等待超過上限時拋出 ModelBusyError，API 回 503 + Retry-After，而不是排隊到逾時
+"""
+import os
+import math
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import anthropic
+
+from .metrics import Histogram
+
+LANES = ("interactive", "batch")
+BUCKETS = ("requests", "input_tokens", "output_tokens")
+RETRY_STATUS = {429: "rate_limited", 500: "server_error", 502: "server_error", 503: "server_error",
+                504: "server_error", 529: "overloaded"}
+
+_lane = contextvars.ContextVar('rate_limit_lane', default="interactive")
+
+
+class ModelBusyError(Exception):
+    """Claude 呼叫排隊過久或持續被限流"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@contextmanager
+def lane(name: str):
+    """區塊內的 Claude 呼叫使用指定優先順序（interactive / batch）"""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class _Bucket:
+    """每分鐘額度，連續補充；預扣後可暫時為負值（代表已借用的額度）"""
+
+    def __init__(self, per_minute: int):
+        self.limit = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.limit:
+            self.level = min(self.limit, self.level + (now - self.updated) * self.limit / 60)
+        self.updated = now
+
+    def shortfall(self, amount: float, reserve: float = 0.0) -> float:
+        """取得 amount 前還需等待的秒數（保留 reserve 比例的額度不動用）"""
+        if not self.limit:
+            return 0.0
+        # 單次用量超過每分鐘上限時視為用滿整個 bucket，避免永遠等不到
+        needed = min(amount, self.limit) + reserve * self.limit
+        return max(0.0, (needed - self.level) * 60 / self.limit)
+
+    def take(self, amount: float):
+        if self.limit:
+            self.level -= min(amount, self.limit)
+
+    def give(self, amount: float):
+        if self.limit:
+            self.level = min(self.limit, self.level + amount)
+
+
+class RateLimiter:
+    def __init__(self, rpm: int = None, itpm: int = None, otpm: int = None, max_wait: float = None,
+                 max_call_wait: float = None, batch_reserve: float = None, max_retries: int = None):
+        """
+        Args:
+            rpm / itpm / otpm: 每分鐘請求數、輸入 token、輸出 token 上限（0 表示不限制），
+                回應標頭帶有實際上限時以標頭為準
+            max_wait: 新的互動請求可接受的預估等待秒數，超過時 check() 拋出 ModelBusyError
+            max_call_wait: 已開始的流程中，單次 interactive 呼叫可接受的預估等待秒數
+                （較寬鬆，長文字稿分段摘要的後續呼叫排在同一請求的前幾段之後）
+            batch_reserve: batch 呼叫不可動用的額度比例（保留給 interactive）
+            max_retries: 429 / 529 / 連線錯誤的重試次數
+        """
+        limits = {
+            "requests": rpm if rpm is not None else int(os.getenv('ANTHROPIC_RPM', 50)),
+            "input_tokens": itpm if itpm is not None else int(os.getenv('ANTHROPIC_ITPM', 30000)),
+            "output_tokens": otpm if otpm is not None else int(os.getenv('ANTHROPIC_OTPM', 8000)),
+        }
+        self.buckets = {name: _Bucket(limit) for name, limit in limits.items()}
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('LLM_MAX_WAIT_SECONDS', 30))
+        self.max_call_wait = (max_call_wait if max_call_wait is not None
+                              else float(os.getenv('LLM_MAX_CALL_WAIT_SECONDS', 120)))
+        self.batch_reserve = (batch_reserve if batch_reserve is not None
+                              else float(os.getenv('LLM_BATCH_RESERVE', 0.2)))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', 4))
+
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        # 各優先順序等待中的呼叫數與其預扣量總和（用於預估排隊時間）
+        self._waiting = {name: 0 for name in LANES}
+        self._queued = {name: dict.fromkeys(BUCKETS, 0.0) for name in LANES}
+        self.counters = {"acquired": 0, "rejected": 0, "retries": 0,
+                         "rate_limited": 0, "overloaded": 0, "server_error": 0, "connection_error": 0}
+        self.wait_seconds = {name: Histogram() for name in LANES}
+
+    # --- 取得額度 ---
+
+    def acquire(self, input_tokens: int, max_tokens: int) -> dict:
+        """等待額度並預扣，回傳 ticket（呼叫後交給 settle / release）"""
+        ticket = self._enqueue(input_tokens, max_tokens)
+        try:
+            while True:
+                delay = self._try_take(ticket)
+                if not delay:
+                    return ticket
+                time.sleep(delay)
+        finally:
+            self._dequeue(ticket)
+
+    async def acquire_async(self, input_tokens: int, max_tokens: int) -> dict:
+        """acquire 的非同步版本（等待時不佔用執行緒）"""
+        ticket = self._enqueue(input_tokens, max_tokens)
+        try:
+            while True:
+                delay = self._try_take(ticket)
+                if not delay:
+                    return ticket
+                await asyncio.sleep(delay)
+        finally:
+            self._dequeue(ticket)
+
+    def check(self, lane_name: str = None):
+        """目前送出 interactive 呼叫的預估等待超過上限時拋出 ModelBusyError（流程開始前先檢查）"""
+        lane_name = lane_name or _lane.get()
+        if lane_name != "interactive":
+            return
+        with self._lock:
+            wait = self._estimate_wait(lane_name, dict(dict.fromkeys(BUCKETS, 0), requests=1), time.monotonic())
+            if wait > self.max_wait:
+                self.counters["rejected"] += 1
+                raise self._busy(wait)
+
+    def _enqueue(self, input_tokens: int, max_tokens: int) -> dict:
+        lane_name = _lane.get()
+        amounts = {"requests": 1, "input_tokens": input_tokens, "output_tokens": max_tokens}
+        with self._lock:
+            now = time.monotonic()
+            wait = self._estimate_wait(lane_name, amounts, now)
+            if lane_name == "interactive" and wait > self.max_call_wait:
+                self.counters["rejected"] += 1
+                raise self._busy(wait)
+            self._waiting[lane_name] += 1
+            for name in BUCKETS:
+                self._queued[lane_name][name] += amounts[name]
+        return {"lane": lane_name, "amounts": amounts, "queued_at": now, "sent_at": None}
+
+    def _dequeue(self, ticket: dict):
+        lane_name = ticket["lane"]
+        with self._lock:
+            self._waiting[lane_name] -= 1
+            for name in BUCKETS:
+                self._queued[lane_name][name] -= ticket["amounts"][name]
+        self.wait_seconds[lane_name].observe(time.monotonic() - ticket["queued_at"])
+
+    def _try_take(self, ticket: dict) -> float:
+        """可立即取得時預扣並回傳 0，否則回傳建議的等待秒數"""
+        lane_name, amounts = ticket["lane"], ticket["amounts"]
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            if self._paused_until > now:
+                return min(self._paused_until - now, 1.0)
+            if lane_name == "batch" and self._waiting["interactive"]:
+                return 0.1
+
+            reserve = self.batch_reserve if lane_name == "batch" else 0.0
+            shortfall = max(bucket.shortfall(amounts[name], reserve) for name, bucket in self.buckets.items())
+            if shortfall > 0:
+                # 最多睡 1 秒再檢查，期間有退還的額度或標頭校正時可提早取得
+                return min(max(shortfall, 0.05), 1.0)
+
+            for name, bucket in self.buckets.items():
+                bucket.take(amounts[name])
+            self.counters["acquired"] += 1
+            ticket["sent_at"] = time.perf_counter()
+            return 0
+
+    def _estimate_wait(self, lane_name: str, amounts: dict, now: float) -> float:
+        """預估排在同優先順序（batch 另含 interactive）等待者之後，取得 amounts 需要的秒數"""
+        ahead = ("interactive",) if lane_name == "interactive" else LANES
+        reserve = self.batch_reserve if lane_name == "batch" else 0.0
+        wait = max(0.0, self._paused_until - now)
+        for name, bucket in self.buckets.items():
+            bucket.refill(now)
+            demand = amounts[name] + sum(self._queued[other][name] for other in ahead)
+            if bucket.limit:
+                wait = max(wait, (demand + reserve * bucket.limit - bucket.level) * 60 / bucket.limit)
+        return wait
+
+    def _busy(self, wait: float) -> ModelBusyError:
+        return ModelBusyError(f"Claude 呼叫排隊中（預估需等待 {wait:.0f} 秒），請稍後再試", wait)
+
+    # --- 呼叫結果 ---
+
+    def settle(self, ticket: dict, usage, headers=None):
+        """依實際用量校正預扣量（快取讀取不計入輸入額度），並以回應標頭校正剩餘額度"""
+        input_tokens = ((getattr(usage, 'input_tokens', 0) or 0)
+                        + (getattr(usage, 'cache_creation_input_tokens', 0) or 0))
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        with self._lock:
+            self.buckets["input_tokens"].give(ticket["amounts"]["input_tokens"] - input_tokens)
+            self.buckets["output_tokens"].give(ticket["amounts"]["output_tokens"] - output_tokens)
+        self.observe_headers(headers)
+
+    def release(self, ticket: dict):
+        """呼叫失敗：退還預扣的 token（請求數不退還）"""
+        with self._lock:
+            self.buckets["input_tokens"].give(ticket["amounts"]["input_tokens"])
+            self.buckets["output_tokens"].give(ticket["amounts"]["output_tokens"])
+
+    def observe_headers(self, headers):
+        """
+        以 anthropic-ratelimit-{requests,input-tokens,output-tokens}-{limit,remaining} 校正上限與剩餘額度
+        （已設為 0 不限制的項目不受影響）
+        """
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for name, bucket in self.buckets.items():
+                if not bucket.limit:
+                    continue
+                prefix = f"anthropic-ratelimit-{name.replace('_', '-')}"
+                limit = _header_number(headers, f"{prefix}-limit")
+                remaining = _header_number(headers, f"{prefix}-remaining")
+                bucket.refill(now)
+                if limit:
+                    bucket.limit = int(limit)
+                if remaining is not None:
+                    bucket.level = min(bucket.level, remaining)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        可重試的錯誤回傳等待秒數；不可重試時拋出原本的錯誤，重試次數用完時拋出 ModelBusyError
+
+        優先使用 retry-after 標頭，否則為含 jitter 的指數退避；429 時所有呼叫一起暫停
+        """
+        status = getattr(error, 'status_code', None)
+        if status in RETRY_STATUS:
+            kind = RETRY_STATUS[status]
+        elif isinstance(error, anthropic.APIConnectionError):
+            kind = "connection_error"
+        else:
+            raise error
+
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        delay = _header_number(headers, 'retry-after')
+        if delay is None:
+            delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+
+        with self._lock:
+            self.counters[kind] += 1
+            if kind == "rate_limited":
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if attempt >= self.max_retries:
+                raise ModelBusyError(f"Claude 目前忙碌（{status or kind}），請稍後再試", delay) from error
+            self.counters["retries"] += 1
+        self.observe_headers(headers)
+        print(f"[RateLimit] {kind}，{delay:.1f} 秒後重試（第 {attempt + 1} 次）")
+        return delay
+
+    def send(self, request, input_tokens: int, max_tokens: int) -> tuple:
+        """
+        取得額度後送出請求，可重試的錯誤退避後重送
+
+        Args:
+            request: 無參數函式，送出請求並回傳回應（串流時為已開始的串流）
+
+        Returns:
+            tuple: (ticket, 回應)
+        """
+        for attempt in range(self.max_retries + 1):
+            ticket = self.acquire(input_tokens, max_tokens)
+            try:
+                return ticket, request()
+            except Exception as e:
+                self.release(ticket)
+                time.sleep(self.retry_delay(e, attempt))
+
+    async def asend(self, request, input_tokens: int, max_tokens: int) -> tuple:
+        """send 的非同步版本（request 回傳 awaitable）"""
+        for attempt in range(self.max_retries + 1):
+            ticket = await self.acquire_async(input_tokens, max_tokens)
+            try:
+                return ticket, await request()
+            except Exception as e:
+                self.release(ticket)
+                await asyncio.sleep(self.retry_delay(e, attempt))
+
+    def stats(self) -> dict:
+        """各項上限與剩餘額度、等待中的呼叫數、重試 / 拒絕次數與等待時間分佈"""
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in self.buckets.items():
+                bucket.refill(now)
+                buckets[name] = {"limit": bucket.limit, "available": round(bucket.level, 1)}
+            waiting = dict(self._waiting)
+            counters = dict(self.counters)
+            paused = max(0.0, self._paused_until - now)
+            interactive_wait = self._estimate_wait("interactive", dict(dict.fromkeys(BUCKETS, 0), requests=1), now)
+        return {
+            "buckets": buckets,
+            "waiting": waiting,
+            "paused_seconds": round(paused, 1),
+            "estimated_wait_seconds": round(interactive_wait, 1),
+            **counters,
+            "wait_seconds": {name: histogram.snapshot() for name, histogram in self.wait_seconds.items()},
+        }
+
+
+def _header_number(headers, name: str):
+    if not headers:
+        return None
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,208 @@
+"""
+Spotify 節目 → 音訊來源解析索引（SQLite）
+- 已解析的節目直接取得音訊網址，不需再查 oEmbed / ListenNotes / iTunes
+- 找不到來源的節目做負向快取，避免重複搜尋
+- 預先匯入整個節目 RSS，訂閱的 Podcast 可依標題立即對應
+  （以「節目 + 標題」為鍵，不同節目的同名集數不會互相覆蓋；超過 RESOLUTION_FEED_TTL 未重新匯入的項目會過期）
+"""
+import os
+import re
+import time
+import sqlite3
+import tempfile
+import threading
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: str) -> str:
+    """標題正規化（小寫、移除空白與標點），用於比對"""
+    return _NON_WORD_RE.sub('', (title or '').lower())
+
+
+class ResolutionIndex:
+    def __init__(self, db_path: str = None, ttl_seconds: int = None, negative_ttl_seconds: int = None,
+                 feed_ttl_seconds: int = None):
+        """
+        Args:
+            db_path: SQLite 檔案路徑（預設為暫存目錄）
+            ttl_seconds: 解析結果有效期限（音訊網址可能會變動）
+            negative_ttl_seconds: 找不到來源的結果保留時間
+            feed_ttl_seconds: 匯入的 RSS 項目有效期限（依最後匯入時間計算）
+        """
+        self.db_path = db_path or os.getenv(
+            'RESOLUTION_INDEX_PATH',
+            os.path.join(tempfile.gettempdir(), 'resolution_index.sqlite3')
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.getenv('RESOLUTION_TTL', 7 * 24 * 3600)
+        )
+        self.negative_ttl_seconds = negative_ttl_seconds if negative_ttl_seconds is not None else int(
+            os.getenv('RESOLUTION_NEGATIVE_TTL', 6 * 3600)
+        )
+        self.feed_ttl_seconds = feed_ttl_seconds if feed_ttl_seconds is not None else int(
+            os.getenv('RESOLUTION_FEED_TTL', 30 * 24 * 3600)
+        )
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS episodes (
+                episode_id TEXT PRIMARY KEY,
+                found INTEGER NOT NULL,
+                audio_url TEXT,
+                title TEXT,
+                podcast_name TEXT,
+                duration INTEGER,
+                resolved_at REAL NOT NULL
+            )
+        """)
+        # 舊版 feed_entries 只以標題為鍵（不同節目的同名集數會互相覆蓋），直接重建，RSS 需重新匯入
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(feed_entries)')]
+        if columns and 'feed_key' not in columns:
+            self._conn.execute('DROP TABLE feed_entries')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_entries (
+                feed_key TEXT NOT NULL,
+                title_key TEXT NOT NULL,
+                audio_url TEXT NOT NULL,
+                title TEXT,
+                podcast_name TEXT,
+                duration INTEGER,
+                feed_url TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (feed_key, title_key)
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS feed_entries_title ON feed_entries (title_key)')
+        self._conn.commit()
+
+    def get(self, episode_id: str) -> dict:
+        """
+        查詢解析結果
+
+        Returns:
+            dict: {"found": bool, "audio_url", "title", "podcast_name", "duration"}，
+                  無紀錄或已過期時為 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT found, audio_url, title, podcast_name, duration, resolved_at '
+                'FROM episodes WHERE episode_id = ?',
+                (episode_id,)
+            ).fetchone()
+
+            if row:
+                ttl = self.ttl_seconds if row[0] else self.negative_ttl_seconds
+                if ttl and time.time() - row[5] > ttl:
+                    row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+            if row[0]:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+
+        return {
+            "found": bool(row[0]),
+            "audio_url": row[1],
+            "title": row[2],
+            "podcast_name": row[3],
+            "duration": row[4] or 0,
+        }
+
+    def put(self, episode_id: str, audio_url: str, title: str, podcast_name: str, duration: int):
+        """記錄解析成功的結果"""
+        self._put(episode_id, 1, audio_url, title, podcast_name, duration)
+
+    def put_miss(self, episode_id: str):
+        """記錄找不到來源（負向快取）"""
+        self._put(episode_id, 0, None, None, None, None)
+
+    def _put(self, episode_id, found, audio_url, title, podcast_name, duration):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO episodes '
+                '(episode_id, found, audio_url, title, podcast_name, duration, resolved_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (episode_id, found, audio_url, title, podcast_name, duration, time.time())
+            )
+            self._conn.commit()
+
+    def find_by_title(self, title: str) -> list:
+        """
+        從已匯入的 RSS 項目中依標題尋找（未過期的項目）
+
+        Returns:
+            list: [{"audio_url", "title", "podcast_name", "duration", "feed_url"}]，
+                  可能來自不同節目，由呼叫端依節目名稱挑選
+        """
+        key = normalize_title(title)
+        if not key:
+            return []
+        oldest = time.time() - self.feed_ttl_seconds if self.feed_ttl_seconds else 0
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT audio_url, title, podcast_name, duration, feed_url FROM feed_entries '
+                'WHERE title_key = ? AND updated_at >= ?',
+                (key, oldest)
+            ).fetchall()
+        return [
+            {"audio_url": row[0], "title": row[1], "podcast_name": row[2], "duration": row[3] or 0,
+             "feed_url": row[4]}
+            for row in rows
+        ]
+
+    def add_feed_entries(self, feed_url: str, entries: list) -> int:
+        """
+        匯入 RSS 項目（以 RSS 網址 + 標題為鍵；同時清除已過期的項目）
+
+        Args:
+            entries: [{"title", "audio_url", "podcast_name", "duration"}]
+
+        Returns:
+            int: 匯入筆數
+        """
+        now = time.time()
+        rows = [
+            (feed_url or e.get('podcast_name', ''), normalize_title(e['title']), e['audio_url'], e['title'],
+             e.get('podcast_name', ''), e.get('duration', 0), feed_url, now)
+            for e in entries if e.get('audio_url') and normalize_title(e.get('title'))
+        ]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO feed_entries '
+                '(feed_key, title_key, audio_url, title, podcast_name, duration, feed_url, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            if self.feed_ttl_seconds:
+                self._conn.execute('DELETE FROM feed_entries WHERE updated_at < ?', (now - self.feed_ttl_seconds,))
+            self._conn.commit()
+        return len(rows)
+
+    def stats(self) -> dict:
+        """索引統計"""
+        with self._lock:
+            found, missing = self._conn.execute(
+                'SELECT COALESCE(SUM(found), 0), COALESCE(SUM(1 - found), 0) FROM episodes'
+            ).fetchone()
+            feed_entries = self._conn.execute('SELECT COUNT(*) FROM feed_entries').fetchone()[0]
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "episodes": found,
+            "negative_entries": missing,
+            "feed_entries": feed_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "feed_ttl_seconds": self.feed_ttl_seconds,
+        }
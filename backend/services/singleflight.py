@@ -0,0 +1,142 @@
+"""
+相同請求合併（single-flight）
+同一個來源同時有多個請求時，只有第一個（leader）實際執行流程，
+其他請求等待並共用其結果（或錯誤），負載隨「不同內容數」而非「請求數」成長
+"""
+import asyncio
+import threading
+
+
+class Flight:
+    """一個進行中的流程"""
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """等待 leader 完成，回傳結果或拋出相同錯誤"""
+        self._done.wait()
+        return self._outcome()
+
+    async def wait_async(self):
+        """wait 的非同步版本（不佔用執行緒，leader 可以是同步或非同步流程）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(wake)
+                wake = None
+        if wake is None:
+            await future
+        return self._outcome()
+
+    def _set_done(self, result, error):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.shared_errors = 0
+
+    def begin(self, key: str) -> tuple:
+        """
+        加入或開始一個流程
+
+        Returns:
+            tuple: (Flight, 是否為 leader)；leader 必須呼叫 finish
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, key: str, flight: Flight, result=None, error: BaseException = None):
+        """leader 完成：移除進行中紀錄並喚醒等待者"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None and flight.waiters:
+                self.shared_errors += flight.waiters
+        flight._set_done(result, error)
+
+    def do(self, key: str, func, *args, **kwargs) -> tuple:
+        """
+        執行 func；同一 key 已在進行中時改為等待其結果
+
+        Returns:
+            tuple: (結果, 是否為共用的結果)
+        """
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait(), True
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result, False
+
+    async def do_async(self, key: str, func, *args, **kwargs) -> tuple:
+        """do 的非同步版本（func 為 async 函式）"""
+        flight, leader = self.begin(key)
+        if not leader:
+            return await flight.wait_async(), True
+
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # leader 被取消（用戶端中斷）時，等待者收到一般錯誤而非被一併取消
+            self.finish(key, flight, error=RuntimeError("摘要流程已中斷，請重新送出"))
+            raise
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result, False
+
+    def stats(self) -> dict:
+        """合併統計"""
+        with self._lock:
+            in_flight = len(self._flights)
+            waiting = sum(flight.waiters for flight in self._flights.values())
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 3) if total else 0,
+            "shared_errors": self.shared_errors,
+            "in_flight": in_flight,
+            "waiting": waiting,
+        }
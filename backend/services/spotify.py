@@ -2,22 +2,65 @@
 Podcast 下載服務（透過 ListenNotes API 或直接 RSS）
 """
 import os
+import asyncio
 import tempfile
 import re
+import time
 import uuid
-import requests
+import threading
+import difflib
+import hashlib
 import urllib3
 import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .captions import parse_captions
+from .http_client import create_session, create_async_client, Downloader, USER_AGENT
+from .metrics import Histogram
+from .tracing import span, record
+from .resolution_index import ResolutionIndex, normalize_title
 
 # 暫時關閉 SSL 警告（開發用）
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+ITUNES_NS = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.wav', '.ogg', '.opus')
+
+
+def title_similarity(a: str, b: str) -> float:
+    """兩個標題正規化後的相似度（0-1）"""
+    a, b = normalize_title(a), normalize_title(b)
+    if not a or not b:
+        return 0.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
 
 class SpotifyService:
-    def __init__(self):
+    # 字幕語言優先順序（優先中文，其次英文）
+    SUBTITLE_LANGS = ['zh-TW', 'zh-Hant', 'zh', 'en', 'en-US']
+    # 字幕格式優先順序（json3 沒有滾動重複，解析最省）
+    SUBTITLE_FORMATS = ['json3', 'vtt', 'srt']
+
+    def __init__(self, resolution_index: ResolutionIndex = None):
         self.temp_dir = tempfile.gettempdir()
         self.listennotes_api_key = os.getenv('LISTENNOTES_API_KEY', '')
         self.listennotes_base_url = 'https://listen-api.listennotes.com/api/v2'
+        # 所有外部請求共用連線池
+        self.session = create_session()
+        self.downloader = Downloader(self.session)
+        # ASGI 模式使用的非同步連線池（第一次使用時建立）
+        self._async_session = None
+        # Spotify episode ID → 音訊網址的持久索引
+        self.resolution_index = resolution_index or ResolutionIndex()
+        # 多來源同時查詢（ListenNotes / iTunes），標題相似度低於門檻的結果不採用
+        self.match_threshold = float(os.getenv('SPOTIFY_MATCH_THRESHOLD', 0.6))
+        self._resolver_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='resolve')
+        self.resolve_latency = {'listennotes': Histogram(), 'itunes': Histogram()}
+        # Spotify Web API 存取權杖（client credentials），到期前重複使用
+        self._spotify_token = None
+        self._spotify_token_expires = 0.0
+        self._spotify_token_lock = threading.Lock()
 
     def download_podcast(self, url: str) -> tuple:
         """
@@ -33,130 +76,558 @@ class SpotifyService:
             return self._download_spotify_podcast(url)
         elif 'youtube.com' in url or 'youtu.be' in url:
             return self._download_youtube_podcast(url)
+        elif self._is_audio_url(url):
+            # RSS 項目的音訊直連
+            metadata = {'title': os.path.basename(urlparse(url).path), 'url': url, 'duration': ''}
+            return self._download_audio_file(url), metadata
         else:
             raise ValueError("不支援的連結格式，請使用 Spotify 或 YouTube 連結")
 
+    async def adownload_podcast(self, url: str) -> tuple:
+        """
+        download_podcast 的非同步版本（ASGI 模式）
+        查詢類請求（oEmbed、ListenNotes、iTunes、字幕）走非同步 HTTP；yt-dlp 與音訊檔下載在執行緒中執行
+        """
+        if 'spotify.com' in url:
+            audio_url, metadata = await self.aresolve_spotify_audio(url)
+            return await asyncio.to_thread(self._download_audio_file, audio_url), metadata
+        elif 'youtube.com' in url or 'youtu.be' in url:
+            return await self._adownload_youtube_podcast(url)
+        return await asyncio.to_thread(self.download_podcast, url)
+
+    def _get_async_session(self):
+        if self._async_session is None:
+            self._async_session = create_async_client()
+        return self._async_session
+
+    async def aclose(self):
+        """關閉非同步連線池"""
+        if self._async_session is not None:
+            await self._async_session.aclose()
+            self._async_session = None
+
+    def expand_collection(self, url: str, limit: int = None) -> list:
+        """
+        展開播放清單 / 頻道 / Spotify 節目 / RSS 為單集連結清單
+
+        Returns:
+            list: [{"url", "title"}]
+        """
+        if 'youtube.com' in url or 'youtu.be' in url:
+            entries = self._expand_youtube(url, limit)
+        elif 'spotify.com/show/' in url:
+            entries = [
+                {'url': f"https://open.spotify.com/episode/{episode_id}", 'title': name}
+                for episode_id, name in self._iter_show_episodes(self._extract_spotify_show_id(url))
+            ]
+            if not entries:
+                raise ValueError("無法展開 Spotify 節目，請設定 Spotify API 憑證或改用節目 RSS")
+        else:
+            response = self.session.get(url, timeout=30, headers={'User-Agent': USER_AGENT})
+            response.raise_for_status()
+            feed_entries = self._parse_feed(response.content)
+            # 順便匯入解析索引，之後同一節目的 Spotify 連結可直接解析
+            self.resolution_index.add_feed_entries(url, feed_entries)
+            entries = [{'url': entry['audio_url'], 'title': entry['title']} for entry in feed_entries]
+
+        return entries[:limit] if limit else entries
+
+    def _expand_youtube(self, url: str, limit: int = None) -> list:
+        """以一次 flat extraction 取得播放清單 / 頻道的影片清單（不逐一查詢影片資訊）"""
+        import yt_dlp
+
+        # 頻道首頁只會列出分頁，改為直接列出影片
+        if re.search(r'youtube\.com/(@[^/?]+|channel/[^/?]+|c/[^/?]+)/?$', url):
+            url = url.rstrip('/') + '/videos'
+
+        ydl_opts = {'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}
+        if limit:
+            ydl_opts['playlistend'] = limit
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            return [{'url': url, 'title': info.get('title', '')}]
+
+        entries = []
+        for entry in info.get('entries') or []:
+            if not entry or not entry.get('id'):
+                continue
+            entries.append({
+                'url': f"https://www.youtube.com/watch?v={entry['id']}",
+                'title': entry.get('title', ''),
+            })
+        return entries
+
+    def _is_audio_url(self, url: str) -> bool:
+        """是否為音訊檔案直連（RSS enclosure）"""
+        return urlparse(url).path.lower().endswith(AUDIO_EXTENSIONS)
+
     def _download_spotify_podcast(self, url: str) -> tuple:
         """透過 ListenNotes 或搜尋方式下載 Spotify Podcast"""
-        episode_id = self._extract_spotify_episode_id(url)
-        if not episode_id:
-            raise ValueError("無效的 Spotify Podcast 連結")
+        audio_url, metadata = self.resolve_spotify_audio(url)
+        return self._download_audio_file(audio_url), metadata
 
-        # 方法 1: 使用 ListenNotes API（如果有 API Key）
-        if self.listennotes_api_key:
+    def resolve_spotify_audio(self, url: str) -> tuple:
+        """
+        找出 Spotify 節目對應的公開音訊網址（不下載）
+        先查解析索引，未命中時才查 oEmbed 標題與 ListenNotes / iTunes，結果寫回索引
+
+        Returns:
+            tuple: (音訊網址, 元資料)
+        """
+        with span('resolve'):
+            episode_id = self._extract_spotify_episode_id(url)
+            if not episode_id:
+                raise ValueError("無效的 Spotify Podcast 連結")
+
+            entry = self._lookup_index(episode_id)
+            if entry:
+                return entry['audio_url'], self._entry_metadata(entry, url)
+
+            title = self._get_spotify_title(episode_id)
+
+            # 方法 1: 已預先匯入的節目 RSS（依標題比對）
+            entry = self._lookup_feeds(episode_id, title)
+            if entry:
+                return entry['audio_url'], self._entry_metadata(entry, url)
+
+            # 方法 2: 同時查詢 ListenNotes（如果有 API Key）與 iTunes，採用最先找到相符結果的來源
             try:
-                return self._download_via_listennotes(episode_id, url)
+                entry = self._resolve_concurrently(title)
             except Exception as e:
-                print(f"ListenNotes API 失敗: {e}")
+                raise self._resolve_error(episode_id, e)
+            self._remember(episode_id, entry)
+            return entry['audio_url'], self._entry_metadata(entry, url)
+
+    async def aresolve_spotify_audio(self, url: str) -> tuple:
+        """resolve_spotify_audio 的非同步版本（oEmbed、ListenNotes、iTunes 以非同步 HTTP 查詢）"""
+        with span('resolve'):
+            episode_id = self._extract_spotify_episode_id(url)
+            if not episode_id:
+                raise ValueError("無效的 Spotify Podcast 連結")
+
+            # 解析索引（SQLite）與 Spotify Web API 是同步呼叫，移到執行緒避免阻塞事件迴圈
+            entry = await asyncio.to_thread(self._lookup_index, episode_id)
+            if entry:
+                return entry['audio_url'], self._entry_metadata(entry, url)
+
+            title = await self._aget_spotify_title(episode_id)
+            entry = await asyncio.to_thread(self._lookup_feeds, episode_id, title)
+            if entry:
+                return entry['audio_url'], self._entry_metadata(entry, url)
 
-        # 方法 2: 從 Spotify oEmbed 取得標題，再搜尋 RSS
-        try:
-            return self._download_via_search(episode_id, url)
-        except Exception as e:
-            raise Exception(
-                f"無法下載此 Podcast。\n"
-                f"建議：請到 ListenNotes.com 申請免費 API Key 以獲得更好的支援。\n"
-                f"錯誤：{str(e)}"
-            )
+            try:
+                entry = await self._aresolve_concurrently(title)
+            except Exception as e:
+                raise await asyncio.to_thread(self._resolve_error, episode_id, e)
+            await asyncio.to_thread(self._remember, episode_id, entry)
+            return entry['audio_url'], self._entry_metadata(entry, url)
+
+    def _lookup_index(self, episode_id: str) -> dict:
+        """查解析索引；近期確定找不到的節目直接拋出錯誤"""
+        cached = self.resolution_index.get(episode_id)
+        if cached is None:
+            return None
+        if not cached['found']:
+            raise Exception("找不到此節目的音訊來源（近期已搜尋過，請稍後再試）")
+        print("[Spotify] 解析索引命中")
+        return cached
+
+    def _lookup_feeds(self, episode_id: str, title: str) -> dict:
+        """
+        從已預先匯入的節目 RSS 依標題比對
+        同名集數可能來自不同節目：能取得 Spotify 節目名稱時，節目名稱相似度須達門檻；
+        取不到節目名稱時，只有單一節目有此標題才採用
+        """
+        candidates = self.resolution_index.find_by_title(title)
+        if not candidates:
+            return None
 
-    def _download_via_listennotes(self, episode_id: str, original_url: str) -> tuple:
-        """使用 ListenNotes API 搜尋並下載"""
-        headers = {'X-ListenAPI-Key': self.listennotes_api_key}
+        podcast_name = self._get_spotify_show_name(episode_id)
+        if podcast_name:
+            score, entry = self._best_match(podcast_name, [
+                (candidate['podcast_name'], candidate) for candidate in candidates
+            ])
+        elif len({candidate['feed_url'] for candidate in candidates}) == 1:
+            entry = candidates[0]
+        else:
+            print(f"[Spotify] 已匯入的 RSS 中有 {len(candidates)} 個節目有同名集數，無法確認節目，改用搜尋")
+            return None
+
+        if entry:
+            print("[Spotify] 從已匯入的 RSS 找到節目")
+            self._remember(episode_id, entry)
+        return entry
+
+    def _resolve_error(self, episode_id: str, error: Exception) -> Exception:
+        """所有來源都查詢失敗時回傳給使用者的錯誤"""
+        # 只有「所有來源都確定找不到」才做負向快取，網路錯誤不記錄
+        if isinstance(error, LookupError):
+            self.resolution_index.put_miss(episode_id)
+        return Exception(
+            f"無法下載此 Podcast。\n"
+            f"建議：請到 ListenNotes.com 申請免費 API Key 以獲得更好的支援。\n"
+            f"錯誤：{str(error)}"
+        )
+
+    def _resolve_concurrently(self, title: str) -> dict:
+        """
+        同時查詢所有來源，回傳第一個成功的結果，其餘來源不再等待
+
+        Raises:
+            LookupError: 所有來源都找不到相符的節目
+        """
+        if not title:
+            raise Exception("無法取得節目標題")
 
-        # 先從 Spotify 取得標題
-        title = self._get_spotify_title(episode_id)
+        sources = [('itunes', self._resolve_via_search)]
+        if self.listennotes_api_key:
+            sources.insert(0, ('listennotes', self._resolve_via_listennotes))
 
-        # 用標題搜尋 ListenNotes
-        search_url = f"{self.listennotes_base_url}/search"
-        params = {
-            'q': title,
-            'type': 'episode',
-            'len_min': 1,
+        futures = {
+            self._resolver_pool.submit(self._timed_resolve, name, resolver, title): name
+            for name, resolver in sources
         }
+        pending = set(futures)
+        errors = []
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        print(f"[Spotify] {futures[future]} 解析失敗: {e}")
+                        errors.append(e)
+                        continue
+                    print(f"[Spotify] 使用 {futures[future]} 的結果（相似度 {entry['score']:.2f}）")
+                    return entry
+        finally:
+            # 尚未開始的查詢直接取消；進行中的請求在背景結束，結果捨棄
+            for future in pending:
+                future.cancel()
+
+        raise self._combined_error(errors)
+
+    async def _aresolve_concurrently(self, title: str) -> dict:
+        """_resolve_concurrently 的非同步版本；採用第一個結果後直接取消其餘請求"""
+        if not title:
+            raise Exception("無法取得節目標題")
 
-        response = requests.get(search_url, headers=headers, params=params, timeout=30, verify=False)
+        sources = [('itunes', self._itunes_request, self._parse_itunes)]
+        if self.listennotes_api_key:
+            sources.insert(0, ('listennotes', self._listennotes_request, self._parse_listennotes))
+
+        tasks = {
+            asyncio.ensure_future(self._atimed_resolve(name, request, parse, title)): name
+            for name, request, parse in sources
+        }
+        pending = set(tasks)
+        errors = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        entry = task.result()
+                    except Exception as e:
+                        print(f"[Spotify] {tasks[task]} 解析失敗: {e}")
+                        errors.append(e)
+                        continue
+                    print(f"[Spotify] 使用 {tasks[task]} 的結果（相似度 {entry['score']:.2f}）")
+                    return entry
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise self._combined_error(errors)
+
+    def _combined_error(self, errors: list) -> Exception:
+        """合併各來源的錯誤；全部為 LookupError 時才視為確定找不到"""
+        message = "；".join(str(e) for e in errors)
+        if all(isinstance(e, LookupError) for e in errors):
+            return LookupError(message)
+        return Exception(message)
+
+    def _timed_resolve(self, name: str, resolver, title: str) -> dict:
+        """執行單一來源查詢並記錄延遲"""
+        start = time.perf_counter()
+        try:
+            return resolver(title)
+        finally:
+            self.resolve_latency[name].observe(time.perf_counter() - start)
+
+    async def _atimed_resolve(self, name: str, request, parse, title: str) -> dict:
+        """非同步查詢單一來源並記錄延遲"""
+        start = time.perf_counter()
+        try:
+            return parse(title, await self._aget_json(request(title)))
+        finally:
+            self.resolve_latency[name].observe(time.perf_counter() - start)
+
+    def _get_json(self, request: dict) -> dict:
+        response = self.session.get(**request, timeout=30)
         response.raise_for_status()
-        data = response.json()
+        return response.json()
 
-        if not data.get('results'):
-            raise Exception("在 ListenNotes 找不到此節目")
+    async def _aget_json(self, request: dict) -> dict:
+        response = await self._get_async_session().get(**request)
+        response.raise_for_status()
+        return response.json()
 
-        # 取第一個結果
-        episode = data['results'][0]
-        audio_url = episode.get('audio')
+    def _best_match(self, title: str, candidates: list) -> tuple:
+        """
+        依標題相似度挑選最佳候選
 
-        if not audio_url:
-            raise Exception("找不到音訊連結")
+        Args:
+            candidates: [(候選標題, 候選資料)]
 
-        # 下載音訊
-        audio_file = self._download_audio_file(audio_url)
+        Returns:
+            tuple: (相似度, 候選資料)；沒有達到門檻時為 (最高相似度, None)
+        """
+        best_score, best = 0.0, None
+        for candidate_title, candidate in candidates:
+            score = title_similarity(title, candidate_title)
+            if score > best_score:
+                best_score, best = score, candidate
+        if best_score < self.match_threshold:
+            return best_score, None
+        return best_score, best
+
+    def get_resolver_metrics(self) -> dict:
+        """各來源的解析延遲統計"""
+        return {
+            "match_threshold": self.match_threshold,
+            "latency_seconds": {name: histogram.snapshot() for name, histogram in self.resolve_latency.items()},
+        }
 
-        metadata = {
-            'title': episode.get('title_original', title),
+    def _remember(self, episode_id: str, entry: dict):
+        """解析結果寫入索引"""
+        self.resolution_index.put(
+            episode_id, entry['audio_url'], entry['title'], entry['podcast_name'], entry['duration']
+        )
+
+    def _entry_metadata(self, entry: dict, original_url: str) -> dict:
+        """解析結果 → 回應用的元資料"""
+        return {
+            'title': entry['title'],
             'url': original_url,
-            'duration': self._format_duration(episode.get('audio_length_sec', 0)),
-            'podcast_name': episode.get('podcast', {}).get('title_original', ''),
+            'duration': self._format_duration(entry['duration']),
+            'podcast_name': entry['podcast_name'],
         }
 
-        return audio_file, metadata
-
-    def _download_via_search(self, episode_id: str, original_url: str) -> tuple:
-        """透過公開搜尋取得 Podcast RSS 並下載"""
-        # 從 Spotify oEmbed 取得標題
-        title = self._get_spotify_title(episode_id)
+    def _resolve_via_listennotes(self, title: str) -> dict:
+        """
+        使用 ListenNotes API 搜尋音訊網址
 
-        if not title:
-            raise Exception("無法取得節目標題")
+        Returns:
+            dict: {"audio_url", "title", "podcast_name", "duration"}
+        """
+        return self._parse_listennotes(title, self._get_json(self._listennotes_request(title)))
+
+    def _listennotes_request(self, title: str) -> dict:
+        """用標題搜尋 ListenNotes 的請求參數"""
+        return {
+            'url': f"{self.listennotes_base_url}/search",
+            'headers': {'X-ListenAPI-Key': self.listennotes_api_key},
+            'params': {
+                'q': title,
+                'type': 'episode',
+                'len_min': 1,
+            },
+        }
 
-        # 嘗試用 iTunes Search API 找到 RSS（免費且不需 API Key）
-        itunes_url = "https://itunes.apple.com/search"
-        params = {
-            'term': title,
-            'media': 'podcast',
-            'entity': 'podcastEpisode',
-            'limit': 10,
+    def _parse_listennotes(self, title: str, data: dict) -> dict:
+        """從 ListenNotes 搜尋結果挑出相符的節目"""
+        # 依標題相似度挑選（不直接取第一個結果）
+        score, episode = self._best_match(title, [
+            (result.get('title_original', ''), result)
+            for result in data.get('results') or [] if result.get('audio')
+        ])
+        if episode is None:
+            raise LookupError(f"在 ListenNotes 找不到相符的節目（最高相似度 {score:.2f}）")
+
+        return {
+            'audio_url': episode['audio'],
+            'title': episode.get('title_original', title),
+            'podcast_name': episode.get('podcast', {}).get('title_original', ''),
+            'duration': episode.get('audio_length_sec', 0),
+            'score': score,
         }
 
-        response = requests.get(itunes_url, params=params, timeout=30, verify=False)
-        response.raise_for_status()
-        data = response.json()
+    def _resolve_via_search(self, title: str) -> dict:
+        """
+        透過公開搜尋取得 Podcast 音訊網址
 
-        results = data.get('results', [])
+        Returns:
+            dict: {"audio_url", "title", "podcast_name", "duration"}
+        """
+        return self._parse_itunes(title, self._get_json(self._itunes_request(title)))
+
+    def _itunes_request(self, title: str) -> dict:
+        """iTunes Search API 的請求參數（免費且不需 API Key）"""
+        return {
+            'url': "https://itunes.apple.com/search",
+            'params': {
+                'term': title,
+                'media': 'podcast',
+                'entity': 'podcastEpisode',
+                'limit': 10,
+            },
+        }
 
+    def _parse_itunes(self, title: str, data: dict) -> dict:
+        """從 iTunes 搜尋結果挑出相符的節目"""
         # 找到最匹配的結果
-        audio_url = None
-        episode_title = title
-        podcast_name = ''
-        duration = 0
+        score, result = self._best_match(title, [
+            (result.get('trackName', ''), result)
+            for result in data.get('results') or [] if result.get('episodeUrl')
+        ])
+        if result is None:
+            raise LookupError(f"找不到「{title}」的音訊來源（最高相似度 {score:.2f}）")
+
+        return {
+            'audio_url': result['episodeUrl'],
+            'title': result.get('trackName', title),
+            'podcast_name': result.get('collectionName', ''),
+            'duration': (result.get('trackTimeMillis') or 0) // 1000,
+            'score': score,
+        }
 
-        for result in results:
-            if result.get('episodeUrl'):
-                audio_url = result['episodeUrl']
-                episode_title = result.get('trackName', title)
-                podcast_name = result.get('collectionName', '')
-                duration = result.get('trackTimeMillis', 0) // 1000
-                break
+    def prefetch_feed(self, feed_url: str, show_url: str = None) -> dict:
+        """
+        預先匯入整個節目的 RSS，之後該節目的每一集都能直接從索引解析
+        若提供 Spotify 節目連結且設定了 Spotify API 憑證，會一併建立 episode ID 對應
 
-        if not audio_url:
-            raise Exception(f"找不到「{title}」的音訊來源")
+        Args:
+            feed_url: Podcast RSS 網址
+            show_url: Spotify 節目連結（open.spotify.com/show/...，可選）
 
-        # 下載音訊
-        audio_file = self._download_audio_file(audio_url)
+        Returns:
+            dict: {"feed_entries": 匯入筆數, "mapped_episodes": 已對應的 Spotify 集數}
+        """
+        response = self.session.get(feed_url, timeout=30, headers={'User-Agent': USER_AGENT})
+        response.raise_for_status()
+        entries = self._parse_feed(response.content)
+        imported = self.resolution_index.add_feed_entries(feed_url, entries)
+        print(f"[Spotify] 匯入 RSS {imported} 集: {feed_url}")
+
+        mapped = 0
+        show_id = self._extract_spotify_show_id(show_url) if show_url else None
+        if show_id:
+            by_title = {normalize_title(entry['title']): entry for entry in entries}
+            for episode_id, name in self._iter_show_episodes(show_id):
+                entry = by_title.get(normalize_title(name))
+                if entry:
+                    self._remember(episode_id, entry)
+                    mapped += 1
+
+        return {"feed_entries": imported, "mapped_episodes": mapped}
+
+    def _parse_feed(self, content: bytes) -> list:
+        """解析 Podcast RSS，取出每集標題、音訊網址與長度"""
+        root = ET.fromstring(content)
+        channel = root.find('channel')
+        if channel is None:
+            raise ValueError("無效的 RSS 內容")
+        podcast_name = (channel.findtext('title') or '').strip()
+
+        entries = []
+        for item in channel.iter('item'):
+            enclosure = item.find('enclosure')
+            if enclosure is None or not enclosure.get('url'):
+                continue
+            entries.append({
+                'title': (item.findtext('title') or '').strip(),
+                'audio_url': enclosure.get('url'),
+                'podcast_name': podcast_name,
+                'duration': self._parse_itunes_duration(item.findtext(f'{{{ITUNES_NS}}}duration')),
+            })
+        return entries
+
+    def _parse_itunes_duration(self, value: str) -> int:
+        """itunes:duration 可能是秒數或 HH:MM:SS"""
+        if not value:
+            return 0
+        try:
+            seconds = 0
+            for part in value.strip().split(':'):
+                seconds = seconds * 60 + int(float(part))
+            return seconds
+        except ValueError:
+            return 0
+
+    def _iter_show_episodes(self, show_id: str):
+        """
+        透過 Spotify Web API 列出節目所有集數（需 SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET）
 
-        metadata = {
-            'title': episode_title,
-            'url': original_url,
-            'duration': self._format_duration(duration),
-            'podcast_name': podcast_name,
-        }
+        Yields:
+            tuple: (episode ID, 標題)
+        """
+        headers = self._spotify_api_headers()
+        if headers is None:
+            print("[Spotify] 未設定 Spotify API 憑證，略過 episode ID 對應")
+            return
+
+        next_url = f"https://api.spotify.com/v1/shows/{show_id}/episodes"
+        params = {'limit': 50, 'market': os.getenv('SPOTIFY_MARKET', 'US')}
+        while next_url:
+            response = self.session.get(next_url, headers=headers, params=params, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            for episode in data.get('items') or []:
+                if episode and episode.get('id'):
+                    yield episode['id'], episode.get('name', '')
+            next_url = data.get('next')
+            params = None  # next 已包含查詢參數
+
+    def _spotify_api_headers(self) -> dict:
+        """
+        Spotify Web API 的授權標頭（client credentials）；未設定憑證時為 None
+        權杖快取至到期前 60 秒，避免每次查詢都重新申請
+        """
+        client_id = os.getenv('SPOTIFY_CLIENT_ID', '')
+        client_secret = os.getenv('SPOTIFY_CLIENT_SECRET', '')
+        if not client_id or not client_secret:
+            return None
 
-        return audio_file, metadata
+        with self._spotify_token_lock:
+            if self._spotify_token is None or time.time() >= self._spotify_token_expires:
+                response = self.session.post(
+                    'https://accounts.spotify.com/api/token',
+                    data={'grant_type': 'client_credentials'},
+                    auth=(client_id, client_secret),
+                    timeout=10
+                )
+                response.raise_for_status()
+                data = response.json()
+                self._spotify_token = data['access_token']
+                self._spotify_token_expires = time.time() + float(data.get('expires_in', 3600)) - 60
+            return {'Authorization': f"Bearer {self._spotify_token}"}
+
+    def _get_spotify_show_name(self, episode_id: str) -> str:
+        """透過 Spotify Web API 取得集數所屬的節目名稱（oEmbed 不提供）；未設定憑證或失敗時為空字串"""
+        try:
+            headers = self._spotify_api_headers()
+            if headers is None:
+                return ''
+            response = self.session.get(
+                f"https://api.spotify.com/v1/episodes/{episode_id}",
+                headers=headers,
+                params={'market': os.getenv('SPOTIFY_MARKET', 'US')},
+                timeout=10
+            )
+            response.raise_for_status()
+            return (response.json().get('show') or {}).get('name', '')
+        except Exception as e:
+            print(f"[Spotify] 無法取得節目名稱: {e}")
+            return ''
 
     def _get_spotify_title(self, episode_id: str) -> str:
         """從 Spotify oEmbed API 取得節目標題"""
         try:
-            embed_url = f"https://open.spotify.com/oembed?url=https://open.spotify.com/episode/{episode_id}"
-            response = requests.get(embed_url, timeout=10, verify=False)
+            response = self.session.get(self._oembed_url(episode_id), timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 return data.get('title', '')
@@ -164,30 +635,47 @@ class SpotifyService:
             pass
         return ''
 
+    async def _aget_spotify_title(self, episode_id: str) -> str:
+        """_get_spotify_title 的非同步版本"""
+        try:
+            response = await self._get_async_session().get(self._oembed_url(episode_id), timeout=10)
+            if response.status_code == 200:
+                return response.json().get('title', '')
+        except Exception:
+            pass
+        return ''
+
+    def _oembed_url(self, episode_id: str) -> str:
+        return f"https://open.spotify.com/oembed?url=https://open.spotify.com/episode/{episode_id}"
+
     def _download_youtube_podcast(self, url: str) -> tuple:
         """下載 YouTube Podcast（優先取得字幕）- 使用 yt-dlp 函式庫"""
-        import yt_dlp
+        # 取得影片資訊（字幕清單也包含在內，之後不再重複請求 YouTube）
+        print("[YouTube] 取得影片資訊...")
+        with span('metadata'):
+            info = self._extract_youtube_info(url)
 
-        unique_id = str(uuid.uuid4())[:8]
+        # V2: 優先嘗試取得字幕（速度快很多）
+        print("[YouTube] 嘗試取得字幕...")
+        return self._youtube_result(url, info, self._get_youtube_subtitles(info))
 
-        # 取得影片資訊
+    async def _adownload_youtube_podcast(self, url: str) -> tuple:
+        """_download_youtube_podcast 的非同步版本（yt-dlp 沒有非同步 API，在執行緒中執行）"""
         print("[YouTube] 取得影片資訊...")
-        ydl_opts = {'quiet': True, 'no_warnings': True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            title = info.get('title', '未知標題')
-            duration = info.get('duration', 0)
+        with span('metadata'):
+            info = await asyncio.to_thread(self._extract_youtube_info, url)
+
+        print("[YouTube] 嘗試取得字幕...")
+        return self._youtube_result(url, info, await self._aget_youtube_subtitles(info))
 
+    def _youtube_result(self, url: str, info: dict, subtitle_result: dict) -> tuple:
+        """組合 YouTube 的下載結果（音訊路徑, 元資料）"""
         metadata = {
-            'title': title,
+            'title': info.get('title', '未知標題'),
             'url': url,
-            'duration': self._format_duration(duration or 0),
+            'duration': self._format_duration(info.get('duration', 0) or 0),
         }
 
-        # V2: 優先嘗試取得字幕（速度快很多）
-        print("[YouTube] 嘗試取得字幕...")
-        subtitle_result = self._get_youtube_subtitles(url, unique_id)
-
         if subtitle_result:
             print("[YouTube] 成功取得字幕！跳過音訊下載")
             metadata['has_subtitles'] = True
@@ -197,127 +685,106 @@ class SpotifyService:
         # 沒有字幕，無法處理（雲端不支援 Whisper）
         raise Exception("此影片沒有可用字幕，無法處理。請選擇有字幕的 YouTube 影片。")
 
-    def _get_youtube_subtitles(self, url: str, unique_id: str) -> dict:
-        """嘗試取得 YouTube 字幕 - 使用 yt-dlp 函式庫"""
+    def _extract_youtube_info(self, url: str) -> dict:
+        """yt-dlp extract_info（不下載）"""
         import yt_dlp
 
-        subtitle_file = os.path.join(self.temp_dir, f"subtitle_{unique_id}")
-
-        # 嘗試取得字幕（優先中文，其次英文）
-        for lang in ['zh-TW', 'zh-Hant', 'zh', 'en', 'en-US']:
-            try:
-                ydl_opts = {
-                    'writesubtitles': True,
-                    'writeautomaticsub': True,
-                    'subtitleslangs': [lang],
-                    'subtitlesformat': 'vtt',
-                    'skip_download': True,
-                    'outtmpl': subtitle_file,
-                    'quiet': True,
-                    'no_warnings': True,
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-
-                # 檢查是否有字幕檔案
-                for ext in ['.vtt', f'.{lang}.vtt']:
-                    vtt_file = subtitle_file + ext
-                    if os.path.exists(vtt_file):
-                        transcript = self._parse_vtt_file(vtt_file)
-                        os.remove(vtt_file)  # 清理
-                        if transcript and len(transcript.get('segments', [])) > 0:
-                            return transcript
-            except Exception as e:
-                print(f"[YouTube] 取得 {lang} 字幕失敗: {e}")
-                continue
+        ydl_opts = {'quiet': True, 'no_warnings': True}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
 
-        return None
+    def _get_youtube_subtitles(self, info: dict) -> dict:
+        """從 extract_info 結果挑選最佳字幕軌，直接串流解析（不寫暫存檔）"""
+        track = self._select_subtitle_track(info)
+        if not track:
+            return None
 
-    def _parse_vtt_file(self, vtt_path: str) -> dict:
-        """解析 VTT 字幕檔案"""
+        lang, fmt, subtitle_url, rolling = track
         try:
-            with open(vtt_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            segments = []
-            full_text = []
-
-            # 解析 VTT 格式
-            lines = content.split('\n')
-            current_start = 0
-            current_end = 0
-            current_text = []
-
-            for line in lines:
-                line = line.strip()
-
-                # 跳過 WEBVTT 標頭和空行
-                if not line or line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
-                    continue
-
-                # 時間行格式: 00:00:00.000 --> 00:00:05.000
-                if '-->' in line:
-                    # 儲存前一段
-                    if current_text:
-                        text = ' '.join(current_text).strip()
-                        # 移除重複的自動字幕標記
-                        text = re.sub(r'<[^>]+>', '', text)
-                        if text and text not in full_text[-3:] if full_text else True:
-                            segments.append({
-                                'start': current_start,
-                                'end': current_end,
-                                'text': text
-                            })
-                            full_text.append(text)
-
-                    # 解析新時間
-                    time_parts = line.split('-->')
-                    current_start = self._vtt_time_to_seconds(time_parts[0].strip())
-                    current_end = self._vtt_time_to_seconds(time_parts[1].strip().split()[0])
-                    current_text = []
-
-                # 數字序號行（跳過）
-                elif line.isdigit():
-                    continue
-
-                # 文字內容
+            with span('subtitles') as stage:
+                response = self.session.get(subtitle_url, stream=True, timeout=30)
+                response.raise_for_status()
+                if fmt == 'json3':
+                    transcript = parse_captions(response.content, fmt, rolling)
                 else:
-                    current_text.append(line)
-
-            # 最後一段
-            if current_text:
-                text = ' '.join(current_text).strip()
-                text = re.sub(r'<[^>]+>', '', text)
-                if text:
-                    segments.append({
-                        'start': current_start,
-                        'end': current_end,
-                        'text': text
-                    })
-                    full_text.append(text)
-
-            return {
-                'text': ' '.join(full_text),
-                'segments': segments
-            }
+                    transcript = parse_captions(response.iter_lines(), fmt, rolling)
+                stage['bytes_downloaded'] = response.raw.tell() if response.raw else 0
+                stage['segments'] = len((transcript or {}).get('segments', []))
         except Exception as e:
-            print(f"[YouTube] 解析字幕失敗: {e}")
+            print(f"[YouTube] 取得 {lang} 字幕失敗: {e}")
+            return None
+        return self._accept_subtitles(lang, fmt, transcript)
+
+    async def _aget_youtube_subtitles(self, info: dict) -> dict:
+        """_get_youtube_subtitles 的非同步版本"""
+        track = self._select_subtitle_track(info)
+        if not track:
             return None
 
-    def _vtt_time_to_seconds(self, time_str: str) -> float:
-        """將 VTT 時間格式轉換為秒數"""
+        lang, fmt, subtitle_url, rolling = track
         try:
-            # 格式: 00:00:00.000 或 00:00.000
-            parts = time_str.replace(',', '.').split(':')
-            if len(parts) == 3:
-                hours, minutes, seconds = parts
-                return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
-            elif len(parts) == 2:
-                minutes, seconds = parts
-                return int(minutes) * 60 + float(seconds)
-        except:
-            pass
-        return 0
+            with span('subtitles') as stage:
+                response = await self._get_async_session().get(subtitle_url)
+                response.raise_for_status()
+                # 長字幕解析需數十毫秒以上，移到執行緒避免阻塞事件迴圈
+                transcript = await asyncio.to_thread(parse_captions, response.content, fmt, rolling)
+                stage['bytes_downloaded'] = len(response.content)
+                stage['segments'] = len((transcript or {}).get('segments', []))
+        except Exception as e:
+            print(f"[YouTube] 取得 {lang} 字幕失敗: {e}")
+            return None
+        return self._accept_subtitles(lang, fmt, transcript)
+
+    def _accept_subtitles(self, lang: str, fmt: str, transcript: dict) -> dict:
+        """有內容的字幕才採用"""
+        if transcript and len(transcript.get('segments', [])) > 0:
+            print(f"[YouTube] 使用 {lang} 字幕（{fmt}）")
+            return transcript
+        return None
+
+    def _select_subtitle_track(self, info: dict) -> tuple:
+        """
+        依語言優先順序挑選字幕軌（同語言時人工字幕優先於自動字幕）
+
+        Returns:
+            tuple: (語言代碼, 字幕格式, 字幕網址, 是否為自動字幕)，沒有可用字幕時為 None
+        """
+        for lang in self.SUBTITLE_LANGS:
+            for source in ('subtitles', 'automatic_captions'):
+                formats = (info.get(source) or {}).get(lang) or []
+                for ext in self.SUBTITLE_FORMATS:
+                    for fmt in formats:
+                        if fmt.get('ext') == ext and fmt.get('url'):
+                            return lang, ext, fmt['url'], source == 'automatic_captions'
+        return None
+
+    def get_source_id(self, url: str) -> str:
+        """
+        取得連結的標準來源 ID（不需連網）
+
+        Returns:
+            str: 例如 "youtube:dQw4w9WgXcQ"、"spotify:4rOoJ6Egrf8K2IrywzwOMk" 或 "audio:<網址雜湊>"，無法辨識時為 None
+        """
+        if 'spotify.com' in url:
+            episode_id = self._extract_spotify_episode_id(url)
+            return f"spotify:{episode_id}" if episode_id else None
+        if 'youtube.com' in url or 'youtu.be' in url:
+            video_id = self._extract_youtube_video_id(url)
+            return f"youtube:{video_id}" if video_id else None
+        if self._is_audio_url(url):
+            return f"audio:{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}"
+        return None
+
+    def _extract_youtube_video_id(self, url: str) -> str:
+        """從 URL 提取 YouTube 影片 ID"""
+        pattern = r'(?:youtu\.be/|[?&]v=|/(?:shorts|live|embed)/)([a-zA-Z0-9_-]{11})'
+        match = re.search(pattern, url)
+        return match.group(1) if match else None
+
+    def _extract_spotify_show_id(self, url: str) -> str:
+        """從 URL 提取 Spotify show ID"""
+        match = re.search(r'spotify\.com/show/([a-zA-Z0-9]+)', url)
+        return match.group(1) if match else None
 
     def _extract_spotify_episode_id(self, url: str) -> str:
         """從 URL 提取 Spotify episode ID"""
@@ -338,17 +805,28 @@ class SpotifyService:
 
         output_file = os.path.join(self.temp_dir, f"podcast_{unique_id}{ext}")
 
-        response = requests.get(audio_url, stream=True, timeout=300, verify=False, headers={
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
-        response.raise_for_status()
-
-        with open(output_file, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        try:
+            with span('download') as stage:
+                size = self.downloader.download(audio_url, output_file)
+                stage['bytes_downloaded'] = size
+        except Exception:
+            self.cleanup(output_file)
+            raise
+        print(f"[Download] 完成 {size / 1024 / 1024:.1f} MB")
 
         return output_file
 
+    def stream_audio(self, audio_url: str):
+        """串流下載音訊，逐塊產生內容（供邊下載邊轉錄使用）"""
+        size = 0
+        try:
+            for chunk in self.downloader.iter_bytes(audio_url):
+                size += len(chunk)
+                yield chunk
+        finally:
+            # 與轉錄同時進行，耗時算在 transcribe 階段，這裡只累計下載量
+            record('download', bytes_downloaded=size)
+
     def _format_duration(self, seconds: int) -> str:
         """格式化時長"""
         if not seconds or seconds <= 0:
@@ -2,54 +2,28 @@
 AI 摘要生成服務 (使用 Claude API) - V2 深度洞察版
 """
 import os
-import anthropic
+import time
 import json
+import asyncio
+import threading
+import anthropic
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, AsyncExitStack
 
+from .tokens import estimate_tokens
+from .compaction import compact_segments, fit_to_budget
+from .metrics import Histogram
+from .tracing import span, observe, bind
+from .partial_json import IncrementalJsonObject
+from .rate_limit import RateLimiter
+from .model_router import ModelRouter
+from .summary_schema import SUMMARY_FIELDS, summary_tool, validate_summary
 
-class SummarizerService:
-    def __init__(self):
-        self.client = None
-
-    def _get_client(self):
-        """取得 Anthropic 客戶端"""
-        if self.client is None:
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                raise ValueError("請設定 ANTHROPIC_API_KEY 環境變數")
-            self.client = anthropic.Anthropic(api_key=api_key)
-        return self.client
-
-    def generate_summary(self, transcript: dict, metadata: dict) -> dict:
-        """
-        生成 Podcast 深度摘要 (V2)
-
-        Args:
-            transcript: 語音轉文字結果 {"text": str, "segments": list}
-            metadata: Podcast 元資料
-
-        Returns:
-            dict: {
-                "one_liner": 一句話總結,
-                "points": [關鍵洞察],
-                "data_highlights": [數據亮點],
-                "quotes": [金句摘錄],
-                "chapters": [章節摘要],
-                "timestamps": [時間軸]
-            }
-        """
-        client = self._get_client()
-
-        # 準備帶時間軸的文字稿
-        segments_text = self._format_segments(transcript["segments"])
-
-        prompt = f"""你是一位資深的內容編輯，擅長將長篇對談整理成有脈絡、易讀的精華文章。
-
-## 節目資訊
-- 標題：{metadata.get('title', '未知')}
-- 時長：{metadata.get('duration', '未知')}
+# 固定的指示內容放在 system prompt（模組載入時建立一次），並標記 cache_control：
+# 每次呼叫只有使用者訊息（節目資訊 + 文字稿）不同，相同前綴可命中 Anthropic prompt cache
+SUMMARY_INSTRUCTIONS = """你是一位資深的內容編輯，擅長將長篇對談整理成有脈絡、易讀的精華文章。
 
-## 原始內容（含時間軸）
-{segments_text}
+使用者會提供節目資訊，以及對談的原始內容（含時間軸）或依時間順序整理的各段落筆記。
 
 ## 任務：將對談整理成精華文章
 
@@ -82,17 +56,17 @@ class SummarizerService:
 
 ## 回覆格式（JSON）
 ```json
-{{
+{
     "one_liner": "一句話總結",
     "article": [
-        {{
+        {
             "subtitle": "段落小標題",
             "content": "這是一段完整的文章內容，用流暢的文字描述觀點和論述，可以引用「對談中的原話」來增加可信度。這段應該有 150-250 字左右，讓讀者能理解完整的脈絡。"
-        }},
-        {{
+        },
+        {
             "subtitle": "第二個段落標題",
             "content": "繼續展開另一個重要觀點..."
-        }}
+        }
     ],
     "insights": [
         "【看點】觀點描述 → 這代表什麼？為什麼重要？可以如何應用？",
@@ -102,14 +76,14 @@ class SummarizerService:
         "數據 → 意義說明"
     ],
     "quotes": [
-        {{"time": "12:30", "text": "值得記住的原話"}},
-        {{"time": "45:00", "text": "另一句金句"}}
+        {"time": "12:30", "text": "值得記住的原話"},
+        {"time": "45:00", "text": "另一句金句"}
     ],
     "timestamps": [
-        {{"time": "00:00", "topic": "開場主題"}},
-        {{"time": "05:30", "topic": "討論重點"}}
+        {"time": "00:00", "topic": "開場主題"},
+        {"time": "05:30", "topic": "討論重點"}
     ]
-}}
+}
 ```
 
 注意：
@@ -120,96 +94,729 @@ class SummarizerService:
 - 保留對談的洞察深度，不要流於表面描述
 - 只回覆 JSON，不要其他文字"""
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[
+CHUNK_INSTRUCTIONS = """你是一位資深的內容編輯，正在分段整理一段長篇對談，之後會與其他部分的筆記彙整成完整的精華文章。
+
+使用者會提供節目資訊、本段在全片中的位置，以及本段原始內容（含時間軸）。
+
+## 任務
+請整理本段的詳細筆記，保留論述脈絡、具體數據與精彩原話（含時間點），不要遺漏重要觀點。
+
+## 回覆格式（JSON）
+```json
+{
+    "summary": "本段內容的詳細整理（300-500字）",
+    "key_points": ["重要觀點"],
+    "data": ["數據 → 意義"],
+    "quotes": [{"time": "12:30", "text": "原話"}],
+    "timestamps": [{"time": "05:30", "topic": "討論重點"}]
+}
+```
+
+注意：使用繁體中文，只回覆 JSON，不要其他文字"""
+
+# 低於模型最低快取長度的前綴不會被快取，但標記 cache_control 不影響結果
+SYSTEM_PROMPTS = {
+    "summary": [{"type": "text", "text": SUMMARY_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}],
+    "chunk": [{"type": "text", "text": CHUNK_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}],
+}
+
+SUMMARY_USER_TEMPLATE = """## 節目資訊
+- 標題：{title}
+- 時長：{duration}
+
+## {content_label}
+{content}"""
+
+CHUNK_USER_TEMPLATE = """## 節目資訊
+- 標題：{title}
+
+## 本段位置
+第 {part}/{total} 部分（{time_range}）
+
+## 本段原始內容（含時間軸）
+{content}"""
+
+
+class SummarizerService:
+    # Prompt 或輸出格式調整時請更新版本號，舊的快取摘要會自動失效
+    PROMPT_VERSION = "v3.4"
+    MODEL = "claude-sonnet-4-20250514"
+    SUMMARY_MAX_TOKENS = 4000
+    CHUNK_MAX_TOKENS = 1500
+    REPAIR_MAX_TOKENS = 1500
+
+    def __init__(self, client=None, async_client=None, rate_limiter: RateLimiter = None):
+        """
+        Args:
+            client: Anthropic 客戶端（可注入本機 stub 供測試），預設延遲建立
+            async_client: AsyncAnthropic 客戶端（ASGI 模式使用），預設延遲建立
+            rate_limiter: 所有 Claude 呼叫共用的速率限制（預設依環境變數建立）
+        """
+        self.client = client
+        self.async_client = async_client
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # 依文字稿長度與詳細程度選擇模型與輸出上限
+        self.router = ModelRouter(self.MODEL, self.SUMMARY_MAX_TOKENS)
+        # 文字稿超過此 token 數時改用分段摘要（map-reduce）
+        self.map_reduce_threshold = int(os.getenv('SUMMARY_MAP_REDUCE_TOKENS', 25000))
+        self.chunk_tokens = int(os.getenv('SUMMARY_CHUNK_TOKENS', 8000))
+        self.max_concurrency = int(os.getenv('SUMMARY_MAX_CONCURRENCY', 4))
+        # 送入模型前合併為約 N 秒的段落（只在段落開頭標時間軸）；單次摘要的文字稿 token 上限
+        self.paragraph_seconds = float(os.getenv('SUMMARY_PARAGRAPH_SECONDS', 30))
+        self.token_budget = int(os.getenv('SUMMARY_TOKEN_BUDGET', 25000))
+        # 以 tool use 約束輸出為 V3 schema；不合格欄位的重新生成次數
+        self.structured_output = os.getenv('SUMMARY_STRUCTURED_OUTPUT', '1').lower() not in ('0', 'false', 'no')
+        self.repair_attempts = int(os.getenv('SUMMARY_REPAIR_ATTEMPTS', 1))
+        # 固定指示標記 cache_control（Anthropic prompt caching）
+        self.prompt_cache = os.getenv('SUMMARY_PROMPT_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+        self._usage_lock = threading.Lock()
+        self.usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+                      "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0,
+                      "repair_calls": 0, "repaired_sections": 0, "batch_calls": 0}
+        self.latency = {
+            kind: {"cache_hit": Histogram(), "cache_miss": Histogram()} for kind in SYSTEM_PROMPTS
+        }
+
+    @property
+    def version(self) -> str:
+        """完整摘要的版本（Prompt 版本 + 模型），用於快取鍵"""
+        return self.cache_version("full")
+
+    def cache_version(self, detail: str = "full") -> str:
+        """各詳細程度的快取版本：Prompt 版本 +（非 full 時）詳細程度 + 可能使用的模型"""
+        models = "+".join(self.router.models(detail))
+        if detail == "full":
+            return f"{self.PROMPT_VERSION}:{models}"
+        return f"{self.PROMPT_VERSION}:{detail}:{models}"
+
+    def _get_client(self):
+        """取得 Anthropic 客戶端"""
+        if self.client is None:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("請設定 ANTHROPIC_API_KEY 環境變數")
+            # 重試與退避由 rate_limiter 處理（依 retry-after 標頭並與其他呼叫協調），關閉 SDK 內建重試
+            self.client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+        return self.client
+
+    def _get_async_client(self):
+        """取得非同步 Anthropic 客戶端（ASGI 模式）"""
+        if self.async_client is None:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("請設定 ANTHROPIC_API_KEY 環境變數")
+            self.async_client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+        return self.async_client
+
+    def generate_summary(self, transcript: dict, metadata: dict, mode: str = "auto", detail: str = "full") -> dict:
+        """
+        生成 Podcast 深度摘要 (V3)
+
+        Args:
+            transcript: 語音轉文字結果 {"text": str, "segments": list}
+            metadata: Podcast 元資料
+            mode: auto（依長度自動選擇）/ single（單次呼叫）/ map_reduce（分段摘要再彙整）
+            detail: full（完整精華文章）/ quick（只有一句話總結與時間軸）
+
+        Returns:
+            dict: {
+                "one_liner": 一句話總結,
+                "article": [精華段落],
+                "insights": [看點與延伸思考],
+                "data_highlights": [數據亮點],
+                "quotes": [金句摘錄],
+                "timestamps": [時間軸],
+                "routing": {"detail", "tier", "model"}
+            }
+        """
+        start = time.perf_counter()
+        with span('summarize'):
+            prompt, mode, tier = self._prepare_prompt(transcript["segments"], metadata, mode, detail)
+            output = self._call_model(prompt, max_tokens=tier.max_tokens, tier=tier)
+            result = self._parse_summary(output, prompt, tier)
+        return self._finish_routing(result, tier, detail, mode, start)
+
+    def stream_summary(self, transcript: dict, metadata: dict, mode: str = "auto", detail: str = "full"):
+        """
+        串流生成摘要（使用 Anthropic streaming API）
+
+        Yields:
+            tuple: ("section", {"key": 欄位, "value": 內容}) 每完成一個 JSON 欄位就送出
+                   （重新生成的欄位會再送出一次）；最後送出 ("summary", 完整摘要 dict)
+        """
+        start = time.perf_counter()
+        with span('summarize'):
+            prompt, mode, tier = self._prepare_prompt(transcript["segments"], metadata, mode, detail)
+
+            parser = IncrementalJsonObject()
+            streamed = {}
+            for text in self._stream_model(prompt, max_tokens=tier.max_tokens, tier=tier):
+                yield from self._section_events(parser, text, streamed)
+
+            summary = self._parse_summary(parser.buffer, prompt, tier)
+        yield from self._final_events(summary, streamed, tier, detail, mode, start)
+
+    async def agenerate_summary(self, transcript: dict, metadata: dict, mode: str = "auto",
+                                detail: str = "full") -> dict:
+        """generate_summary 的非同步版本（ASGI 模式，等待模型回應時不佔用執行緒）"""
+        start = time.perf_counter()
+        with span('summarize'):
+            prompt, mode, tier = await self._aprepare_prompt(transcript["segments"], metadata, mode, detail)
+            output = await self._acall_model(prompt, max_tokens=tier.max_tokens, tier=tier)
+            result = await self._aparse_summary(output, prompt, tier)
+        return self._finish_routing(result, tier, detail, mode, start)
+
+    async def astream_summary(self, transcript: dict, metadata: dict, mode: str = "auto", detail: str = "full"):
+        """stream_summary 的非同步版本，產生的事件格式相同"""
+        start = time.perf_counter()
+        with span('summarize'):
+            prompt, mode, tier = await self._aprepare_prompt(transcript["segments"], metadata, mode, detail)
+
+            parser = IncrementalJsonObject()
+            streamed = {}
+            async for text in self._astream_model(prompt, max_tokens=tier.max_tokens, tier=tier):
+                for event in self._section_events(parser, text, streamed):
+                    yield event
+
+            summary = await self._aparse_summary(parser.buffer, prompt, tier)
+        for event in self._final_events(summary, streamed, tier, detail, mode, start):
+            yield event
+
+    def _section_events(self, parser: IncrementalJsonObject, text: str, streamed: dict) -> list:
+        """餵入一段串流輸出，回傳新完成欄位的 section 事件（並記錄已送出的內容）"""
+        events = []
+        for key, value in parser.feed(text):
+            streamed[key] = value
+            events.append(("section", {"key": key, "value": value}))
+        return events
+
+    def _final_events(self, summary: dict, streamed: dict, tier, detail: str, mode: str, start: float) -> list:
+        """串流結束後的事件：重新生成而內容有變的欄位再送一次，最後是完整摘要"""
+        events = [("section", {"key": key, "value": summary[key]})
+                  for key in SUMMARY_FIELDS if key in summary and summary[key] != streamed.get(key)]
+        events.append(("summary", self._finish_routing(summary, tier, detail, f"{mode} 串流", start)))
+        return events
+
+    def _prepare_prompt(self, segments: list, metadata: dict, mode: str, detail: str = "full") -> tuple:
+        """
+        依模式準備最終（單次或 reduce）Prompt；map-reduce 模式會先完成各段摘要
+
+        Returns:
+            tuple: (prompt, 實際使用的模式, 使用的 ModelTier)
+        """
+        segments, mode, tier = self._route(segments, mode, detail)
+
+        if mode == "map_reduce":
+            prompt = self._build_reduce_prompt(self._map_chunks(segments, metadata, tier), metadata)
+        else:
+            # 準備帶時間軸的文字稿
+            segments_text = self._format_segments(segments)
+            prompt = self._build_prompt(segments_text, metadata, fields=tier.fields)
+        return prompt, mode, tier
+
+    async def _aprepare_prompt(self, segments: list, metadata: dict, mode: str, detail: str = "full") -> tuple:
+        """_prepare_prompt 的非同步版本"""
+        segments, mode, tier = self._route(segments, mode, detail)
+
+        if mode == "map_reduce":
+            prompt = self._build_reduce_prompt(await self._amap_chunks(segments, metadata, tier), metadata)
+        else:
+            prompt = self._build_prompt(self._format_segments(segments), metadata, fields=tier.fields)
+        return prompt, mode, tier
+
+    def _route(self, segments: list, mode: str, detail: str) -> tuple:
+        """
+        壓縮文字稿後依 token 數選擇 tier 與模式（quick 只需單次呼叫，超過預算的文字稿取樣截斷）
+
+        Returns:
+            tuple: (壓縮後的段落, 模式, ModelTier)
+        """
+        segments = self._compact(segments)
+        tokens = estimate_tokens("\n".join(self._format_line(seg) for seg in segments))
+        tier = self.router.route(tokens, detail)
+        mode = "single" if tier.fields else self._select_mode(segments, mode)
+        print(f"[Summarizer] 文字稿約 {tokens} tokens，使用 {tier.name}（{tier.model}）")
+        return segments, mode, tier
+
+    def _finish_routing(self, summary: dict, tier, detail: str, mode: str, start: float) -> dict:
+        """記錄該 tier 的摘要耗時，並在結果中標示使用的詳細程度與模型"""
+        seconds = time.perf_counter() - start
+        self.router.observe(tier, seconds)
+        print(f"[Summarizer] {mode} 模式完成（{tier.name}），耗時 {seconds:.1f} 秒")
+        summary["routing"] = {"detail": detail, "tier": tier.name, "model": tier.model}
+        return summary
+
+    def _compact(self, segments: list) -> list:
+        """合併零碎段落為約 paragraph_seconds 秒的段落（0 表示不合併）"""
+        if self.paragraph_seconds <= 0:
+            return segments
+        return compact_segments(segments, self.paragraph_seconds)
+
+    def _select_mode(self, segments: list, mode: str = "auto") -> str:
+        """auto 模式依文字稿長度決定 single 或 map_reduce"""
+        if mode == "auto":
+            full_text = "\n".join(self._format_line(seg) for seg in segments)
+            mode = "map_reduce" if estimate_tokens(full_text) > self.map_reduce_threshold else "single"
+        return mode
+
+    def _build_reduce_prompt(self, notes_text: str, metadata: dict) -> str:
+        """以各段筆記組合最終 Prompt（map-reduce 的 reduce 階段）"""
+        return self._build_prompt(notes_text, metadata, content_label="各段落筆記（依時間順序，由完整文字稿整理）")
+
+    def _build_prompt(self, content: str, metadata: dict,
+                      content_label: str = "原始內容（含時間軸）", fields: tuple = None) -> str:
+        """
+        組合 V3 精華文章的使用者訊息（固定指示在 SUMMARY_INSTRUCTIONS）
+        fields 指定時只要求輸出這些欄位（quick 模式），system prompt 不變以共用 prompt cache
+        """
+        prompt = SUMMARY_USER_TEMPLATE.format(
+            title=metadata.get('title', '未知'),
+            duration=metadata.get('duration', '未知'),
+            content_label=content_label,
+            content=content,
+        )
+        if fields:
+            prompt += f"\n\n## 任務\n本次只需輸出以下欄位：{', '.join(fields)}（不需撰寫精華文章）"
+        return prompt
+
+    def _request_params(self, prompt: str, max_tokens: int, kind: str = "summary", tool: dict = None,
+                        tier=None) -> dict:
+        """
+        Messages API 請求參數（一般呼叫、串流與 Message Batches 共用）
+
+        Args:
+            prompt: 使用者訊息（節目資訊 + 文字稿）
+            kind: summary（最終摘要）/ chunk（分段筆記），決定使用的固定指示
+            tool: 指定輸出的 tool 定義；summary 預設使用該 tier 欄位的 V3 schema（SUMMARY_STRUCTURED_OUTPUT 開啟時）
+            tier: 路由結果（ModelTier），決定模型；預設為 standard tier
+        """
+        tier = tier or self.router.tiers["standard"]
+        system = SYSTEM_PROMPTS[kind]
+        if not self.prompt_cache:
+            system = [{"type": "text", "text": block["text"]} for block in system]
+        params = {
+            "model": tier.model,
+            "max_tokens": max_tokens,
+            "system": system,
+            "messages": [
                 {"role": "user", "content": prompt}
-            ]
+            ],
+        }
+
+        if tool is None and kind == "summary" and self.structured_output:
+            tool = summary_tool(tier.fields)
+        if tool:
+            params["tools"] = [tool]
+            params["tool_choice"] = {"type": "tool", "name": tool["name"]}
+        return params
+
+    def _call_model(self, prompt: str, max_tokens: int, kind: str = "summary", tool: dict = None, tier=None):
+        """
+        呼叫 Claude（經過速率限制，429 / 529 時退避重試）
+
+        Returns:
+            使用 tool 時為 tool 輸入（dict），否則為文字內容
+        """
+        client = self._get_client()
+        params = self._request_params(prompt, max_tokens, kind, tool, tier)
+        ticket, raw = self.rate_limiter.send(
+            lambda: client.messages.with_raw_response.create(**params), self._estimate_input(params), max_tokens
+        )
+        return self._finish_call(ticket, raw, kind, tier)
+
+    async def _acall_model(self, prompt: str, max_tokens: int, kind: str = "summary", tool: dict = None,
+                           tier=None):
+        """_call_model 的非同步版本（AsyncAnthropic）"""
+        client = self._get_async_client()
+        params = self._request_params(prompt, max_tokens, kind, tool, tier)
+        ticket, raw = await self.rate_limiter.asend(
+            lambda: client.messages.with_raw_response.create(**params), self._estimate_input(params), max_tokens
+        )
+        return self._finish_call(ticket, raw, kind, tier)
+
+    async def _astream_model(self, prompt: str, max_tokens: int, kind: str = "summary", tier=None):
+        """_stream_model 的非同步版本"""
+        client = self._get_async_client()
+        params = self._request_params(prompt, max_tokens, kind, tier=tier)
+        async with AsyncExitStack() as stack:
+            ticket, stream = await self.rate_limiter.asend(
+                lambda: stack.enter_async_context(client.messages.stream(**params)),
+                self._estimate_input(params), max_tokens,
+            )
+            async for event in stream:
+                text = self._delta_text(event)
+                if text is not None:
+                    yield text
+            self._finish_stream(ticket, stream, (await stream.get_final_message()).usage, kind, tier)
+
+    def _message_output(self, message):
+        """取出回應內容：tool_use 區塊的輸入（dict）或文字"""
+        for block in message.content:
+            if block.type == "tool_use":
+                return block.input
+        return "".join(block.text for block in message.content if block.type == "text")
+
+    def _stream_model(self, prompt: str, max_tokens: int, kind: str = "summary", tier=None):
+        """
+        串流呼叫 Claude，逐段產生文字（使用 tool 時為 tool 輸入的 JSON 片段）
+        只有建立串流時的錯誤會重試；已開始輸出後中斷則直接拋出
+        """
+        client = self._get_client()
+        params = self._request_params(prompt, max_tokens, kind, tier=tier)
+        with ExitStack() as stack:
+            ticket, stream = self.rate_limiter.send(
+                lambda: stack.enter_context(client.messages.stream(**params)),
+                self._estimate_input(params), max_tokens,
+            )
+            for event in stream:
+                text = self._delta_text(event)
+                if text is not None:
+                    yield text
+            self._finish_stream(ticket, stream, stream.get_final_message().usage, kind, tier)
+
+    def _finish_call(self, ticket: dict, raw, kind: str, tier=None):
+        """單次呼叫完成：以實際用量與回應標頭校正速率限制、記錄用量，回傳回應內容"""
+        message = raw.parse()
+        self.rate_limiter.settle(ticket, message.usage, raw.headers)
+        self._record_usage(kind, message.usage, time.perf_counter() - ticket["sent_at"], tier)
+        return self._message_output(message)
+
+    def _finish_stream(self, ticket: dict, stream, usage, kind: str, tier=None):
+        """串流呼叫完成：校正速率限制並記錄用量"""
+        self.rate_limiter.settle(ticket, usage, getattr(getattr(stream, 'response', None), 'headers', None))
+        self._record_usage(kind, usage, time.perf_counter() - ticket["sent_at"], tier)
+
+    def _delta_text(self, event) -> str:
+        """串流事件中的輸出片段（tool 輸入的 JSON 片段或文字）；其他事件為 None"""
+        if event.type != "content_block_delta":
+            return None
+        if event.delta.type == "input_json_delta":
+            return event.delta.partial_json
+        if event.delta.type == "text_delta":
+            return event.delta.text
+        return None
+
+    def _estimate_input(self, params: dict) -> int:
+        """預估計入輸入額度的 token 數（system + 使用者訊息；實際用量於回應後校正）"""
+        return sum(estimate_tokens(block["text"]) for block in params["system"]) + sum(
+            estimate_tokens(message["content"]) for message in params["messages"]
         )
 
-        # 解析回應
-        response_text = message.content[0].text
+    def _record_usage(self, kind: str, usage, seconds: float, tier=None):
+        """記錄 token 用量與 prompt cache 命中情形（並累計到所屬 tier 的用量與費用）"""
+        cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["input_tokens"] += input_tokens
+            self.usage["output_tokens"] += output_tokens
+            self.usage["cache_read_input_tokens"] += cache_read
+            self.usage["cache_creation_input_tokens"] += cache_write
+        self.latency[kind]["cache_hit" if cache_read else "cache_miss"].observe(seconds)
+        self.router.record_call(tier or self.router.tiers["standard"], usage)
+        observe(f"llm_{kind}", seconds, llm_calls=1, input_tokens=input_tokens, output_tokens=output_tokens,
+                cache_read_input_tokens=cache_read)
+        print(f"[Summarizer] {kind} 呼叫 {seconds:.1f} 秒，快取讀取 {cache_read} tokens，快取寫入 {cache_write} tokens")
+
+    def record_batch_usage(self, kind: str, usage, tier=None):
+        """記錄 Message Batches 請求的 token 用量（不計入延遲，費用以批次折扣計算）"""
+        with self._usage_lock:
+            self.usage["batch_calls"] += 1
+            for key in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+                self.usage[key] += getattr(usage, key, 0) or 0
+        self.router.record_call(tier or self.router.tiers["standard"], usage, batch=True)
+
+    def get_metrics(self) -> dict:
+        """Token 用量、prompt cache 命中率與延遲（命中 vs 未命中）"""
+        with self._usage_lock:
+            usage = dict(self.usage)
+        cached = usage["cache_read_input_tokens"]
+        prompt_tokens = usage["input_tokens"] + cached + usage["cache_creation_input_tokens"]
+
+        latency = {}
+        for kind, histograms in self.latency.items():
+            hit, miss = histograms["cache_hit"].snapshot(), histograms["cache_miss"].snapshot()
+            latency[kind] = {
+                "cache_hit": hit,
+                "cache_miss": miss,
+                # 粗估：每次命中比未命中平均少花的時間（文字稿長度不同時僅供參考）
+                "saved_seconds_per_hit": round(miss["avg"] - hit["avg"], 3) if hit["count"] and miss["count"] else None,
+            }
+
+        return {
+            "prompt_version": self.PROMPT_VERSION,
+            "model": self.router.tiers["standard"].model,
+            "routing": self.router.stats(),
+            "prompt_cache": self.prompt_cache,
+            "structured_output": self.structured_output,
+            "usage": usage,
+            "cache_read_ratio": round(cached / prompt_tokens, 3) if prompt_tokens else 0,
+            "latency_seconds": latency,
+            "rate_limit": self.rate_limiter.stats(),
+        }
+
+    def _extract_json(self, response_text: str) -> dict:
+        """從回應中取出 JSON 物件"""
+        start = response_text.find('{')
+        end = response_text.rfind('}') + 1
+        return json.loads(response_text[start:end])
+
+    def _parse_summary(self, output, prompt: str = None, tier=None) -> dict:
+        """
+        解析並驗證 V3 摘要；不合格的欄位只重新生成該欄位（需提供原始 prompt）
 
+        Args:
+            output: tool 輸入（dict）或模型輸出文字
+            prompt: 原始使用者訊息，用於重新生成不合格欄位
+            tier: 產生摘要的 ModelTier（只驗證該 tier 的欄位，重新生成也使用同一模型）
+        """
+        steps = self._repair_steps(output, prompt, tier)
         try:
-            # 找到 JSON 部分
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            json_str = response_text[start:end]
-            result = json.loads(json_str)
-
-            # 確保向後兼容（V1 格式）
-            if 'points' not in result:
-                result['points'] = []
-            if 'timestamps' not in result:
-                result['timestamps'] = []
-
-            return result
-        except Exception as e:
-            print(f"[Summarizer] JSON 解析失敗: {e}")
+            sections, fields = next(steps)
+            while True:
+                try:
+                    repaired = self._repair_sections(prompt, sections, fields, tier)
+                except Exception as e:
+                    repaired = e
+                sections, fields = steps.send(repaired)
+        except StopIteration as done:
+            return done.value
+
+    async def _aparse_summary(self, output, prompt: str = None, tier=None) -> dict:
+        """_parse_summary 的非同步版本（重新生成欄位時不阻塞 event loop）"""
+        steps = self._repair_steps(output, prompt, tier)
+        try:
+            sections, fields = next(steps)
+            while True:
+                try:
+                    repaired = await self._arepair_sections(prompt, sections, fields, tier)
+                except Exception as e:
+                    repaired = e
+                sections, fields = steps.send(repaired)
+        except StopIteration as done:
+            return done.value
+
+    def _repair_steps(self, output, prompt: str = None, tier=None):
+        """
+        驗證與重新生成的流程（不含 I/O，由 _parse_summary / _aparse_summary 執行模型呼叫）
+
+        Yields:
+            tuple: (目前的欄位, 需重新生成的欄位)；呼叫端以 send() 傳回重新生成結果（或失敗的例外）
+
+        Returns:
+            dict: 最終摘要（StopIteration.value）
+        """
+        fields = tier.fields if tier else None
+        sections = output if isinstance(output, dict) else self._salvage_sections(output)
+        errors = validate_summary(sections, fields)
+
+        for attempt in range(self.repair_attempts if prompt else 0):
+            if not errors:
+                break
+            print(f"[Summarizer] 重新生成欄位（第 {attempt + 1} 次）: {errors}")
+            repaired = yield sections, list(errors)
+            if isinstance(repaired, Exception):
+                print(f"[Summarizer] 重新生成失敗: {repaired}")
+                break
+            errors = self._merge_repaired(sections, errors, repaired, fields)
+
+        return self._finish_summary(output, sections, errors)
+
+    def _merge_repaired(self, sections: dict, errors: dict, repaired: dict, fields: tuple = None) -> dict:
+        """合併重新生成且通過驗證的欄位，回傳剩餘的錯誤"""
+        fixed = {key: value for key, value in repaired.items()
+                 if key in errors and not validate_summary(repaired, [key])}
+        sections.update(fixed)
+        with self._usage_lock:
+            self.usage["repair_calls"] += 1
+            self.usage["repaired_sections"] += len(fixed)
+        return validate_summary(sections, fields)
+
+    def _finish_summary(self, output, sections: dict, errors: dict) -> dict:
+        """解析失敗時回傳基本格式，並補上向後兼容欄位"""
+        if not sections:
+            print(f"[Summarizer] JSON 解析失敗")
             # 如果解析失敗，返回基本格式
             return {
                 "one_liner": "",
-                "points": [response_text],
+                "points": [output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)],
                 "data_highlights": [],
                 "quotes": [],
                 "chapters": [],
                 "timestamps": []
             }
+        if errors:
+            print(f"[Summarizer] 仍有不合格欄位: {errors}")
+
+        # 確保向後兼容（V1 格式）
+        if 'points' not in sections:
+            sections['points'] = []
+        if 'timestamps' not in sections:
+            sections['timestamps'] = []
+        return sections
+
+    def _salvage_sections(self, response_text: str) -> dict:
+        """從文字輸出取出 JSON；格式錯誤時保留錯誤位置之前已完整的欄位"""
+        try:
+            result = self._extract_json(response_text)
+            if isinstance(result, dict):
+                return result
+        except Exception as e:
+            print(f"[Summarizer] JSON 解析失敗，保留已完整的欄位: {e}")
+        parser = IncrementalJsonObject()
+        parser.feed(response_text)
+        return dict(parser.sections)
+
+    def _repair_sections(self, prompt: str, sections: dict, fields: list, tier=None) -> dict:
+        """只重新生成指定欄位（已完成的欄位作為參考，不重新輸出）"""
+        repair_prompt, max_tokens = self._build_repair_prompt(prompt, sections, fields, tier)
+        tool = summary_tool(fields) if self.structured_output else None
+        return self._repair_output(self._call_model(repair_prompt, max_tokens, tool=tool, tier=tier))
+
+    async def _arepair_sections(self, prompt: str, sections: dict, fields: list, tier=None) -> dict:
+        """_repair_sections 的非同步版本"""
+        repair_prompt, max_tokens = self._build_repair_prompt(prompt, sections, fields, tier)
+        tool = summary_tool(fields) if self.structured_output else None
+        return self._repair_output(await self._acall_model(repair_prompt, max_tokens, tool=tool, tier=tier))
+
+    def _repair_request(self, prompt: str, sections: dict, fields: list, tier=None) -> dict:
+        """重新生成欄位的請求參數（Message Batches 使用）"""
+        repair_prompt, max_tokens = self._build_repair_prompt(prompt, sections, fields, tier)
+        tool = summary_tool(fields) if self.structured_output else None
+        return self._request_params(repair_prompt, max_tokens, tool=tool, tier=tier)
+
+    def _repair_output(self, output) -> dict:
+        """重新生成的回應（tool 輸入或文字）→ 欄位"""
+        return output if isinstance(output, dict) else self._salvage_sections(output)
+
+    def _build_repair_prompt(self, prompt: str, sections: dict, fields: list, tier=None) -> tuple:
+        """
+        Args:
+            tier: 產生摘要的 ModelTier，重新生成的輸出上限不超過該 tier 的 max_tokens
+
+        Returns:
+            tuple: (重新生成用的 prompt, max_tokens)
+        """
+        tier = tier or self.router.tiers["standard"]
+        done = {key: sections[key] for key in SUMMARY_FIELDS if key in sections and key not in fields}
+        repair_prompt = (
+            f"{prompt}\n\n## 已完成的欄位（僅供參考，不需重新輸出）\n"
+            f"{json.dumps(done, ensure_ascii=False)}\n\n"
+            f"## 任務\n請只輸出以下欄位：{', '.join(fields)}"
+        )
+        max_tokens = tier.max_tokens if 'article' in fields else min(self.REPAIR_MAX_TOKENS, tier.max_tokens)
+        return repair_prompt, max_tokens
+
+    def _map_chunks(self, segments: list, metadata: dict, tier=None) -> str:
+        """
+        長文字稿分段摘要（map）：依 token 預算切段後並行摘要各段
+        不再取樣截斷，完整涵蓋全片內容；回傳依時間順序串接的筆記，供 reduce 使用
+        """
+        chunks = self._chunk_segments(segments, self.chunk_tokens)
+        print(f"[Summarizer] 分段摘要：共 {len(chunks)} 段，並行數 {self.max_concurrency}")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            notes = list(executor.map(
+                bind(lambda item: self._summarize_chunk(item[1], item[0], len(chunks), metadata, tier)),
+                enumerate(chunks)
+            ))
+
+        return "\n\n".join(notes)
+
+    async def _amap_chunks(self, segments: list, metadata: dict, tier=None) -> str:
+        """_map_chunks 的非同步版本（以 Semaphore 限制同時呼叫數）"""
+        chunks = self._chunk_segments(segments, self.chunk_tokens)
+        print(f"[Summarizer] 分段摘要：共 {len(chunks)} 段，並行數 {self.max_concurrency}")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize(index, chunk):
+            async with semaphore:
+                prompt, time_range = self._build_chunk_prompt(chunk, index, len(chunks), metadata)
+                response_text = await self._acall_model(prompt, max_tokens=self.CHUNK_MAX_TOKENS, kind="chunk",
+                                                        tier=tier)
+                return self._format_chunk_note(response_text, index, time_range)
+
+        notes = await asyncio.gather(*(summarize(index, chunk) for index, chunk in enumerate(chunks)))
+        return "\n\n".join(notes)
+
+    def _chunk_segments(self, segments: list, max_tokens: int) -> list:
+        """依 token 預算將段落切成數塊（只在段落邊界切開）"""
+        chunks = []
+        current = []
+        current_tokens = 0
+
+        for seg in segments:
+            tokens = estimate_tokens(self._format_line(seg)) + 1
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(seg)
+            current_tokens += tokens
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _summarize_chunk(self, chunk: list, index: int, total: int, metadata: dict, tier=None) -> str:
+        """摘要單一區段，回傳帶時間範圍的筆記文字"""
+        prompt, time_range = self._build_chunk_prompt(chunk, index, total, metadata)
+        response_text = self._call_model(prompt, max_tokens=self.CHUNK_MAX_TOKENS, kind="chunk", tier=tier)
+        return self._format_chunk_note(response_text, index, time_range)
+
+    def _build_chunk_prompt(self, chunk: list, index: int, total: int, metadata: dict) -> tuple:
+        """
+        組合單一區段的筆記 Prompt
+
+        Returns:
+            tuple: (prompt, 時間範圍文字)
+        """
+        time_range = f"{self._format_time(chunk[0]['start'])} - {self._format_time(chunk[-1]['end'])}"
+        chunk_text = "\n".join(self._format_line(seg) for seg in chunk)
+
+        prompt = CHUNK_USER_TEMPLATE.format(
+            title=metadata.get('title', '未知'),
+            part=index + 1,
+            total=total,
+            time_range=time_range,
+            content=chunk_text,
+        )
+        return prompt, time_range
+
+    def _format_chunk_note(self, response_text: str, index: int, time_range: str) -> str:
+        """將區段筆記 JSON 轉為 reduce 用的文字"""
+        try:
+            note = self._extract_json(response_text)
+        except Exception as e:
+            print(f"[Summarizer] 第 {index + 1} 段 JSON 解析失敗: {e}")
+            return f"### 第 {index + 1} 部分（{time_range}）\n{response_text}"
+
+        lines = [f"### 第 {index + 1} 部分（{time_range}）", note.get('summary', '')]
+        for point in note.get('key_points', []):
+            lines.append(f"- {point}")
+        for data in note.get('data', []):
+            lines.append(f"- 數據：{data}")
+        for quote in note.get('quotes', []):
+            if isinstance(quote, dict):
+                lines.append(f"- 金句 [{quote.get('time', '')}]：{quote.get('text', '')}")
+        for ts in note.get('timestamps', []):
+            if isinstance(ts, dict):
+                lines.append(f"- [{ts.get('time', '')}] {ts.get('topic', '')}")
+        return "\n".join(lines)
 
     def _format_segments(self, segments: list) -> str:
-        """格式化段落（含時間軸）- 智慧取樣確保涵蓋全片"""
+        """格式化段落（含時間軸）；超過 token 預算時平均取樣確保涵蓋全片"""
         if not segments:
             return ""
+        lines = [self._format_line(seg) for seg in segments]
+        return "\n".join(fit_to_budget(lines, self.token_budget))
 
-        max_chars = 100000  # 約 25000 tokens
-        total_segments = len(segments)
-
-        # 計算全部內容的長度
-        all_lines = []
-        for seg in segments:
-            time = self._format_time(seg["start"])
-            all_lines.append(f"[{time}] {seg['text']}")
-
-        total_content = "\n".join(all_lines)
-
-        # 如果內容不超過限制，直接返回全部
-        if len(total_content) <= max_chars:
-            return total_content
-
-        # 內容過長：採用分段取樣策略
-        # 將影片分成 5 個區段，每區段取一定比例
-        formatted = []
-        chars_per_section = max_chars // 5  # 每區段約 20000 字元
-
-        section_size = total_segments // 5
-        sections = [
-            (0, section_size, "【開場】"),
-            (section_size, section_size * 2, "【前段】"),
-            (section_size * 2, section_size * 3, "【中段】"),
-            (section_size * 3, section_size * 4, "【後段】"),
-            (section_size * 4, total_segments, "【結尾】"),
-        ]
-
-        for start_idx, end_idx, label in sections:
-            section_chars = 0
-            formatted.append(f"\n{label}")
-
-            for i in range(start_idx, end_idx):
-                if i >= len(segments):
-                    break
-                seg = segments[i]
-                time = self._format_time(seg["start"])
-                line = f"[{time}] {seg['text']}"
-
-                if section_chars + len(line) > chars_per_section:
-                    formatted.append("...")
-                    break
-
-                formatted.append(line)
-                section_chars += len(line)
-
-        return "\n".join(formatted)
+    def _format_line(self, seg: dict) -> str:
+        """單一段落加上時間軸"""
+        return f"[{self._format_time(seg['start'])}] {seg['text']}"
 
     def _format_time(self, seconds: float) -> str:
         """格式化時間"""
@@ -0,0 +1,111 @@
+"""
+V3 摘要的 JSON Schema
+- 作為 tool use 的 input_schema，讓模型輸出受結構約束的 JSON
+- 逐欄驗證，只重新生成不合格的欄位
+"""
+
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "one_liner": {"type": "string", "minLength": 1, "description": "一句話總結（30字內）"},
+        "article": {
+            "type": "array",
+            "minItems": 1,
+            "description": "精華內容，3-5 個段落",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "subtitle": {"type": "string", "minLength": 1},
+                    "content": {"type": "string", "minLength": 1},
+                },
+                "required": ["subtitle", "content"],
+            },
+        },
+        "insights": {"type": "array", "items": {"type": "string"}, "description": "看點與延伸思考"},
+        "data_highlights": {"type": "array", "items": {"type": "string"}, "description": "數據 → 意義"},
+        "quotes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"time": {"type": "string"}, "text": {"type": "string", "minLength": 1}},
+                "required": ["time", "text"],
+            },
+        },
+        "timestamps": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"time": {"type": "string"}, "topic": {"type": "string", "minLength": 1}},
+                "required": ["time", "topic"],
+            },
+        },
+    },
+    "required": ["one_liner", "article", "insights", "data_highlights", "quotes", "timestamps"],
+}
+
+SUMMARY_FIELDS = tuple(SUMMARY_SCHEMA["required"])
+
+_TYPES = {"object": dict, "array": list, "string": str}
+
+
+def summary_tool(fields: list = None) -> dict:
+    """
+    產生 tool 定義（fields 指定時只包含這些欄位，用於重新生成部分欄位）
+    """
+    fields = list(fields or SUMMARY_FIELDS)
+    return {
+        "name": "submit_summary",
+        "description": "提交整理好的精華文章（依 schema 填寫各欄位）",
+        "input_schema": {
+            "type": "object",
+            "properties": {field: SUMMARY_SCHEMA["properties"][field] for field in fields},
+            "required": fields,
+        },
+    }
+
+
+def validate_summary(data: dict, fields: list = None) -> dict:
+    """
+    逐欄驗證摘要
+
+    Returns:
+        dict: {欄位: 錯誤原因}，全部合格時為空 dict
+    """
+    errors = {}
+    for field in fields or SUMMARY_FIELDS:
+        if field not in data:
+            errors[field] = "缺少欄位"
+            continue
+        error = _validate(data[field], SUMMARY_SCHEMA["properties"][field], field)
+        if error:
+            errors[field] = error
+    return errors
+
+
+def _validate(value, schema: dict, path: str) -> str:
+    """依 schema 子集（type / required / properties / items / minItems / minLength）驗證，回傳第一個錯誤"""
+    expected = _TYPES[schema["type"]]
+    if not isinstance(value, expected):
+        return f"{path} 應為 {schema['type']}"
+
+    if expected is str and len(value.strip()) < schema.get("minLength", 0):
+        return f"{path} 不可為空"
+
+    if expected is list:
+        if len(value) < schema.get("minItems", 0):
+            return f"{path} 至少需要 {schema['minItems']} 項"
+        for i, item in enumerate(value):
+            error = _validate(item, schema["items"], f"{path}[{i}]")
+            if error:
+                return error
+
+    if expected is dict:
+        for key in schema.get("required", []):
+            if key not in value:
+                return f"{path} 缺少 {key}"
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                error = _validate(value[key], sub_schema, f"{path}.{key}")
+                if error:
+                    return error
+    return None
@@ -0,0 +1,15 @@
+"""
+Token 估算（不需呼叫 API）
+中日韓文字約 1 字 1 token，其他文字約 4 字元 1 token
+"""
+import re
+
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文字的 token 數（偏保守）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
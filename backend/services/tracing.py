@@ -0,0 +1,138 @@
+"""
+各階段耗時追蹤
+- span(stage) 包住下載、字幕、轉錄、模型呼叫等階段，記錄耗時與數量（bytes、段落數、tokens）
+- 全域累計為各階段的延遲分佈（供 /metrics 匯出）
+- start_trace() 期間的 span 另外彙整到該請求的 Trace，作為回應中的 timings 欄位
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from .metrics import Histogram
+
+_current = contextvars.ContextVar('trace', default=None)
+
+_lock = threading.Lock()
+_durations = {}   # 階段 → Histogram
+_errors = {}      # 階段 → 失敗次數
+_totals = {}      # 階段 → {數量名稱: 累計值}
+
+
+class Trace:
+    """單一請求的各階段耗時與數量"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        """同一階段出現多次（例如分段摘要）時累加"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self.counts[key] = self.counts.get(key, 0) + value
+
+    def timings(self) -> dict:
+        """回應中的 timings 欄位"""
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.start, 3),
+                "stages": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                **self.counts,
+            }
+
+
+@contextmanager
+def start_trace():
+    """開始追蹤目前請求（同一執行緒內的 span 都會記到此 Trace）"""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current_trace() -> Trace:
+    return _current.get()
+
+
+def bind(func):
+    """
+    包裝要交給其他執行緒執行的函式，使其 span 仍記到目前請求的 Trace
+    （一併沿用其他 context 變數，例如 Claude 呼叫的優先順序）
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # 每次呼叫使用各自的副本，多個執行緒可同時執行
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+@contextmanager
+def span(stage: str, **counts):
+    """
+    記錄一個階段的耗時；可在區塊內填入數量（bytes、segments、input_tokens 等）
+
+    用法:
+        with span('download') as stage:
+            stage['bytes'] = size
+    """
+    start = time.perf_counter()
+    try:
+        yield counts
+    except BaseException:
+        with _lock:
+            _errors[stage] = _errors.get(stage, 0) + 1
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, **counts)
+
+
+def observe(stage: str, seconds: float, **counts):
+    """記錄已量好的階段耗時（呼叫端自行計時時使用）"""
+    with _lock:
+        histogram = _durations.get(stage)
+        if histogram is None:
+            histogram = _durations[stage] = Histogram()
+    histogram.observe(seconds)
+    record(stage, **counts)
+
+    trace = _current.get()
+    if trace is not None:
+        trace.add_stage(stage, seconds)
+
+
+def record(stage: str, **counts):
+    """不計時，只累加數量（例如串流下載的 bytes）"""
+    counts = {key: value for key, value in counts.items() if isinstance(value, (int, float))}
+    if not counts:
+        return
+    with _lock:
+        totals = _totals.setdefault(stage, {})
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+
+    trace = _current.get()
+    if trace is not None:
+        trace.add(**counts)
+
+
+def snapshot() -> dict:
+    """各階段延遲分佈、失敗次數與數量累計"""
+    with _lock:
+        durations = dict(_durations)
+        errors = dict(_errors)
+        totals = {stage: dict(values) for stage, values in _totals.items()}
+    return {
+        "durations": {stage: histogram.snapshot() for stage, histogram in durations.items()},
+        "errors": errors,
+        "totals": totals,
+    }
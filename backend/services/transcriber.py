@@ -1,45 +1,108 @@
 """
-語音轉文字服務 (使用 OpenAI Whisper)
-Whisper 為可選依賴，主要使用 YouTube 字幕模式
+語音轉文字服務 (使用 OpenAI Whisper 或 faster-whisper)
+轉錄引擎為可選依賴，主要使用 YouTube 字幕模式
 """
 import os
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
-# Whisper 為可選依賴
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-    print("[Transcriber] Whisper 未安裝，僅支援字幕模式")
+from .metrics import Histogram
+from .tracing import span
+from .audio import probe_duration, detect_silences, plan_chunks, extract_chunk, iter_pcm_windows, SAMPLE_RATE
+from .transcription_backends import get_backend
+
+
+class TranscriberBusyError(Exception):
+    """等待轉錄的請求已達上限"""
 
 
 class TranscriberService:
-    def __init__(self, model_size: str = "base"):
+    def __init__(self, model_size: str = None, max_concurrent: int = None, max_queue: int = None,
+                 backend: str = None):
         """
-        初始化 Whisper 模型
+        初始化 Whisper 模型池（每個行程每種大小只載入一份模型）
 
         Args:
-            model_size: 模型大小 (tiny, base, small, medium, large)
+            backend: 轉錄引擎 whisper / faster-whisper，預設使用 TRANSCRIBER_BACKEND
+            model_size: 預設模型大小 (tiny, base, small, medium, large)
+            max_concurrent: 同時進行推論的數量（CPU 環境建議 1）
+            max_queue: 等待中的轉錄請求上限，超過時直接拒絕
         """
-        self.model = None
-        self.model_size = model_size
-        self.available = WHISPER_AVAILABLE
-
-    def _load_model(self):
-        """延遲載入模型"""
-        if not WHISPER_AVAILABLE:
-            raise RuntimeError("Whisper 未安裝，無法進行語音轉文字。請使用有字幕的 YouTube 影片。")
-        if self.model is None:
-            print(f"載入 Whisper {self.model_size} 模型...")
-            self.model = whisper.load_model(self.model_size)
-        return self.model
-
-    def transcribe(self, audio_path: str) -> dict:
+        self.model_size = model_size or os.getenv('WHISPER_MODEL', 'base')
+        self.allowed_models = [
+            size.strip() for size in os.getenv('WHISPER_ALLOWED_MODELS', 'tiny,base,small').split(',')
+        ]
+        if self.model_size not in self.allowed_models:
+            self.allowed_models.append(self.model_size)
+        self.max_concurrent = max_concurrent or int(os.getenv('WHISPER_CONCURRENCY', 1))
+        self.max_queue = max_queue or int(os.getenv('WHISPER_MAX_QUEUE', 4))
+        self.backend = get_backend(backend)
+        self.available = self.backend.available
+        if not self.available:
+            print(f"[Transcriber] {self.backend.name} 未安裝，僅支援字幕模式")
+
+        # 長音訊平行轉錄：依靜音切段後分給多個子行程（0 或 1 表示關閉）
+        self.parallel_workers = int(os.getenv('WHISPER_PARALLEL_WORKERS', 0))
+        self.chunk_seconds = float(os.getenv('WHISPER_CHUNK_SECONDS', 300))
+        # 只保留一個常駐行程池（模型大小或行程數改變時關閉舊的），閒置超過此秒數後關閉（0 表示不關閉）
+        self.pool_idle_seconds = float(os.getenv('WHISPER_POOL_IDLE_SECONDS', 600))
+        self._pool = None
+        self._pool_key = None
+        self._pool_users = 0
+        self._idle_timer = None
+        self._pool_lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+        # 邊下載邊轉錄（Spotify / RSS 音訊），每次送入模型的音訊長度
+        self.streaming = os.getenv('WHISPER_STREAMING', '').lower() in ('1', 'true', 'yes')
+        self.stream_window_seconds = float(os.getenv('WHISPER_STREAM_WINDOW_SECONDS', 120))
+
+        self.models = {}
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._state_lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+
+        self.queue_wait = Histogram()
+        self.inference_time = Histogram()
+        self.load_time = {}
+
+    def preload(self, model_size: str = None):
+        """啟動時預先載入模型，避免第一個請求承擔載入時間"""
+        self._load_model(model_size or self.model_size)
+
+    def _load_model(self, model_size: str = None):
+        """載入模型（同一大小只載入一次，多執行緒共用）"""
+        self._check_available()
+
+        model_size = model_size or self.model_size
+        model = self.models.get(model_size)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            if model_size not in self.models:
+                print(f"載入 {self.backend.name} {model_size} 模型...")
+                start = time.perf_counter()
+                self.models[model_size] = self.backend.load(model_size)
+                self.load_time[model_size] = round(time.perf_counter() - start, 2)
+        return self.models[model_size]
+
+    def transcribe(self, audio_path: str, model_size: str = None, workers: int = None) -> dict:
         """
         將音訊轉換為文字（含時間軸）
 
         Args:
             audio_path: 音訊檔案路徑
+            model_size: 模型大小（需在 WHISPER_ALLOWED_MODELS 內），預設使用 self.model_size
+            workers: 平行轉錄的子行程數，預設使用 WHISPER_PARALLEL_WORKERS
 
         Returns:
             dict: {
@@ -51,28 +114,223 @@ class TranscriberService:
                 }]
             }
         """
+        with span('transcribe') as stage:
+            transcript = self._transcribe_file(audio_path, model_size, workers)
+            stage.update(self._transcript_counts(transcript))
+        return transcript
+
+    def _transcribe_file(self, audio_path: str, model_size: str = None, workers: int = None) -> dict:
+        """transcribe 的實作（單一行程或切段平行轉錄）"""
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"找不到音訊檔案: {audio_path}")
 
-        model = self._load_model()
+        model_size = model_size or self.model_size
+        if model_size not in self.allowed_models:
+            raise ValueError(f"不支援的 Whisper 模型: {model_size}（可用：{', '.join(self.allowed_models)}）")
+
+        workers = self.parallel_workers if workers is None else workers
+        if workers > 1:
+            self._check_available()
+            duration = probe_duration(audio_path)
+            if duration > self.chunk_seconds * 1.5:
+                return self._transcribe_parallel(audio_path, model_size, workers, duration)
+
+        with self._slot():
+            model = self._load_model(model_size)
+
+            print("正在轉換語音為文字...")
+            start = time.perf_counter()
+            segments = self.backend.transcribe(
+                model,
+                audio_path,
+                language="zh"  # 可改為 None 讓模型自動偵測
+            )
+            self.inference_time.observe(time.perf_counter() - start)
+
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments
+        }
+
+    def transcribe_stream(self, byte_chunks, model_size: str = None) -> dict:
+        """
+        邊下載邊轉錄：音訊一邊抵達一邊解碼，每累積一個視窗就送入模型
+        總耗時接近 max(下載, 轉錄)，而非兩者相加
+
+        Args:
+            byte_chunks: 逐塊產生編碼音訊內容的可迭代物件（例如 SpotifyService.stream_audio）
+            model_size: 模型大小
+
+        Returns:
+            dict: 與 transcribe 相同格式
+        """
+        self._check_available()
+        model_size = model_size or self.model_size
+        if model_size not in self.allowed_models:
+            raise ValueError(f"不支援的 Whisper 模型: {model_size}（可用：{', '.join(self.allowed_models)}）")
+
+        segments = []
+        inference_seconds = 0.0
+        with span('transcribe') as stage, self._slot():
+            model = self._load_model(model_size)
+
+            print("正在邊下載邊轉換語音為文字...")
+            for offset, audio in iter_pcm_windows(byte_chunks, self.stream_window_seconds):
+                start = time.perf_counter()
+                window_segments = self.backend.transcribe(model, audio, language="zh")
+                inference_seconds += time.perf_counter() - start
+
+                for segment in window_segments:
+                    segment["start"] += offset
+                    segment["end"] += offset
+                segments.extend(window_segments)
+                print(f"已轉錄至 {self.format_timestamp(offset + len(audio) / SAMPLE_RATE)}")
 
-        print("正在轉換語音為文字...")
-        result = model.transcribe(
-            audio_path,
-            language="zh",  # 可改為 None 讓模型自動偵測
-            verbose=False
-        )
+            self.inference_time.observe(inference_seconds)
+            stage.update(self._transcript_counts({"segments": segments}))
 
         return {
-            "text": result["text"],
-            "segments": [
-                {
-                    "start": segment["start"],
-                    "end": segment["end"],
-                    "text": segment["text"].strip()
-                }
-                for segment in result["segments"]
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments
+        }
+
+    def _transcript_counts(self, transcript: dict) -> dict:
+        """追蹤用的數量：段落數與音訊秒數"""
+        segments = transcript.get("segments", [])
+        return {
+            "segments": len(segments),
+            "audio_seconds": round(segments[-1]["end"], 1) if segments else 0,
+        }
+
+    def _check_available(self):
+        if not self.available:
+            raise RuntimeError(f"{self.backend.name} 未安裝，無法進行語音轉文字。請使用有字幕的 YouTube 影片。")
+
+    def _transcribe_parallel(self, audio_path: str, model_size: str, workers: int, duration: float) -> dict:
+        """依靜音切段，以行程池平行轉錄後校正時間軸並合併"""
+        chunks = plan_chunks(duration, detect_silences(audio_path), self.chunk_seconds)
+        print(f"平行轉換語音為文字：{len(chunks)} 段，{workers} 個行程...")
+
+        chunk_dir = tempfile.mkdtemp(prefix='whisper_chunks_')
+        try:
+            paths = [
+                extract_chunk(audio_path, start, end, os.path.join(chunk_dir, f"chunk_{i:04d}.wav"))
+                for i, (start, end) in enumerate(chunks)
             ]
+
+            # 平行轉錄會佔滿 CPU，與一般轉錄共用同一組名額
+            with self._slot(), self._lease_pool(model_size, workers) as pool:
+                start = time.perf_counter()
+                results = list(pool.map(_transcribe_chunk, paths, [offset for offset, _ in chunks]))
+                self.inference_time.observe(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+        segments = [segment for chunk_segments in results for segment in chunk_segments]
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments
+        }
+
+    @contextmanager
+    def _lease_pool(self, model_size: str, workers: int):
+        """
+        取得常駐行程池（每個子行程載入一份模型後重複使用）
+        模型大小或行程數與現有的池不同時先關閉舊的池；使用結束且閒置 pool_idle_seconds 後關閉
+        """
+        key = (model_size, workers)
+        with self._pool_lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._pool is not None and self._pool_key != key:
+                print(f"[Transcriber] 關閉行程池 {self._pool_key}，改用 {key}")
+                # 已送出的工作仍會完成，不影響正在使用舊池的請求
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                # 使用 spawn，避免在多執行緒的行程中 fork
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.backend.name, model_size)
+                )
+                self._pool_key = key
+            pool = self._pool
+            self._pool_users += 1
+        try:
+            yield pool
+        finally:
+            with self._pool_lock:
+                self._pool_users -= 1
+                if not self._pool_users and pool is self._pool and self.pool_idle_seconds:
+                    self._idle_timer = threading.Timer(self.pool_idle_seconds, self._close_idle_pool, (pool,))
+                    self._idle_timer.daemon = True
+                    self._idle_timer.start()
+
+    def _close_idle_pool(self, pool: ProcessPoolExecutor):
+        """閒置逾時：關閉行程池並釋放子行程載入的模型"""
+        with self._pool_lock:
+            if pool is not self._pool or self._pool_users:
+                return
+            self._pool = None
+            self._pool_key = None
+            self._idle_timer = None
+        print(f"[Transcriber] 行程池閒置 {self.pool_idle_seconds:.0f} 秒，已關閉")
+        pool.shutdown(wait=True)
+
+    def shutdown(self):
+        """關閉行程池（行程結束時自動呼叫）"""
+        with self._pool_lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            pool, self._pool, self._pool_key = self._pool, None, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @contextmanager
+    def _slot(self):
+        """取得推論名額；等待中的請求過多時拒絕"""
+        with self._state_lock:
+            if self.waiting >= self.max_queue:
+                raise TranscriberBusyError("語音轉文字忙碌中，請稍後再試")
+            self.waiting += 1
+
+        start = time.perf_counter()
+        self._slots.acquire()
+        self.queue_wait.observe(time.perf_counter() - start)
+
+        with self._state_lock:
+            self.waiting -= 1
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._state_lock:
+                self.active -= 1
+            self._slots.release()
+
+    def get_metrics(self) -> dict:
+        """轉錄佇列與推論時間統計"""
+        return {
+            "available": self.available,
+            "backend": self.backend.name,
+            "default_model": self.model_size,
+            "allowed_models": self.allowed_models,
+            "loaded_models": list(self.models),
+            "load_seconds": self.load_time,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "parallel_workers": self.parallel_workers,
+            "parallel_pool": list(self._pool_key) if self._pool_key else None,
+            "chunk_seconds": self.chunk_seconds,
+            "streaming": self.streaming,
+            "waiting": self.waiting,
+            "active": self.active,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "inference_seconds": self.inference_time.snapshot(),
         }
 
     def format_timestamp(self, seconds: float) -> str:
@@ -84,3 +342,23 @@ class TranscriberService:
         if hours > 0:
             return f"{hours:02d}:{minutes:02d}:{secs:02d}"
         return f"{minutes:02d}:{secs:02d}"
+
+
+# 平行轉錄子行程：各自載入一份模型
+_worker_backend = None
+_worker_model = None
+
+
+def _init_worker(backend_name: str, model_size: str):
+    global _worker_backend, _worker_model
+    _worker_backend = get_backend(backend_name)
+    _worker_model = _worker_backend.load(model_size)
+
+
+def _transcribe_chunk(chunk_path: str, offset: float) -> list:
+    """轉錄單一區段，時間軸加上區段起點"""
+    segments = _worker_backend.transcribe(_worker_model, chunk_path, language="zh")
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+    return segments
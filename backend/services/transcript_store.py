@@ -0,0 +1,237 @@
+"""
+文字稿儲存（與摘要分離）
+重新摘要（新 Prompt 版本等）時不需重新下載字幕或執行 Whisper
+
+檔案格式（每份文字稿一個 .tscr 檔）:
+    header   struct '<4sIII'：magic、段落數、壓縮後文字長度、元資料長度
+    metadata UTF-8 JSON（補齊至 4 bytes 對齊）
+    starts   float32 × 段落數
+    ends     float32 × 段落數
+    offsets  uint32 × (段落數 + 1)，各段文字在解壓後文字中的位置
+    text     zlib 壓縮的 UTF-8 文字
+時間欄位可直接以 mmap 讀取，不需整份解析
+
+每次儲存後依 TRANSCRIPT_STORE_MAX_BYTES（總大小）與 TRANSCRIPT_STORE_TTL（保留時間）淘汰最舊的檔案
+"""
+import os
+import re
+import json
+import mmap
+import zlib
+import time
+import array
+import struct
+import tempfile
+import threading
+
+_MAGIC = b'TSC1'
+_HEADER = struct.Struct('<4sIII')
+SOURCES = ('subtitles', 'whisper')
+
+
+class TranscriptStore:
+    def __init__(self, root_dir: str = None, max_bytes: int = None, ttl_seconds: int = None):
+        """
+        Args:
+            root_dir: 儲存目錄（預設為暫存目錄下的 transcripts）
+            max_bytes: 所有文字稿的總大小上限，超過時刪除最早儲存的檔案，0 表示不限制
+            ttl_seconds: 文字稿保留時間（依儲存時間），0 表示永久保留
+        """
+        self.root_dir = root_dir or os.getenv(
+            'TRANSCRIPT_STORE_DIR',
+            os.path.join(tempfile.gettempdir(), 'transcripts')
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv('TRANSCRIPT_STORE_MAX_BYTES', 1024 ** 3)
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.getenv('TRANSCRIPT_STORE_TTL', 90 * 24 * 3600)
+        )
+        self._prune_lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def save(self, source_id: str, source: str, transcript: dict, metadata: dict) -> str:
+        """
+        儲存文字稿
+
+        Args:
+            source_id: 來源 ID（例如 youtube:xxxx）
+            source: 文字稿來源 subtitles / whisper
+            transcript: {"text": str, "segments": list}
+            metadata: 節目元資料（title、duration 等）
+
+        Returns:
+            str: 檔案路徑
+        """
+        segments = transcript.get('segments', [])
+        starts = array.array('f', (seg['start'] for seg in segments))
+        ends = array.array('f', (seg['end'] for seg in segments))
+
+        offsets = array.array('I', [0])
+        pieces = []
+        position = 0
+        for seg in segments:
+            encoded = seg['text'].encode('utf-8')
+            pieces.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        text = zlib.compress(b''.join(pieces), 6)
+
+        meta = {key: value for key, value in metadata.items() if key != 'transcript'}
+        meta.update({'source_id': source_id, 'source': source, 'saved_at': time.time()})
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        meta_bytes += b' ' * (-len(meta_bytes) % 4)
+
+        path = self._path(source_id, source)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(segments), len(text), len(meta_bytes)))
+            f.write(meta_bytes)
+            for column in (starts, ends, offsets):
+                if column.itemsize != 4:
+                    raise RuntimeError("此平台不支援 4 bytes 的 array 型別")
+                f.write(column.tobytes())
+            f.write(text)
+        os.replace(tmp_path, path)
+        self.prune(keep=path)
+        return path
+
+    def prune(self, keep: str = None) -> int:
+        """
+        刪除超過保留時間的文字稿，總大小超過上限時再從最早儲存的開始刪除
+
+        Args:
+            keep: 不刪除的檔案（剛儲存的文字稿）
+
+        Returns:
+            int: 刪除的檔案數
+        """
+        if not self.max_bytes and not self.ttl_seconds:
+            return 0
+        with self._prune_lock:
+            files = []
+            for entry in os.scandir(self.root_dir):
+                if entry.name.endswith('.tscr'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            files.sort()
+
+            oldest = time.time() - self.ttl_seconds if self.ttl_seconds else None
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for mtime, size, path in files:
+                expired = oldest is not None and mtime < oldest
+                if not expired and (not self.max_bytes or total <= self.max_bytes):
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        if removed:
+            print(f"[TranscriptStore] 淘汰 {removed} 份文字稿")
+        return removed
+
+    def load(self, source_id: str, source: str = None) -> tuple:
+        """
+        讀取文字稿
+
+        Args:
+            source_id: 來源 ID
+            source: 指定文字稿來源；未指定時依 subtitles、whisper 順序尋找
+
+        Returns:
+            tuple: (文字稿, 元資料)，不存在時回傳 None
+
+        Raises:
+            ValueError: source 不是 subtitles / whisper
+        """
+        for candidate in ([source] if source else SOURCES):
+            path = self._path(source_id, candidate)
+            if os.path.exists(path):
+                return self._read(path)
+        return None
+
+    def list_transcripts(self) -> list:
+        """列出所有已儲存的文字稿"""
+        items = []
+        for name in sorted(os.listdir(self.root_dir)):
+            if not name.endswith('.tscr'):
+                continue
+            path = os.path.join(self.root_dir, name)
+            try:
+                with open(path, 'rb') as f:
+                    _, count, _, meta_len = _HEADER.unpack(f.read(_HEADER.size))
+                    meta = json.loads(f.read(meta_len))
+            except Exception as e:
+                print(f"[TranscriptStore] 讀取 {name} 失敗: {e}")
+                continue
+            items.append({
+                'source_id': meta.get('source_id'),
+                'source': meta.get('source'),
+                'title': meta.get('title', ''),
+                'segments': count,
+                'bytes': os.path.getsize(path),
+                'saved_at': meta.get('saved_at'),
+            })
+        return items
+
+    def delete(self, source_id: str) -> int:
+        """刪除指定來源的所有文字稿，回傳刪除數量"""
+        removed = 0
+        for source in SOURCES:
+            path = self._path(source_id, source)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def _read(self, path: str) -> tuple:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, count, text_len, meta_len = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"不是有效的文字稿檔案: {path}")
+
+            offset = _HEADER.size
+            metadata = json.loads(mm[offset:offset + meta_len])
+            offset += meta_len
+
+            view = memoryview(mm)
+            try:
+                starts = view[offset:offset + 4 * count].cast('f').tolist()
+                offset += 4 * count
+                ends = view[offset:offset + 4 * count].cast('f').tolist()
+                offset += 4 * count
+                offsets = view[offset:offset + 4 * (count + 1)].cast('I').tolist()
+                offset += 4 * (count + 1)
+            finally:
+                view.release()
+
+            text = zlib.decompress(mm[offset:offset + text_len])
+
+        segments = [
+            {
+                'start': round(starts[i], 3),
+                'end': round(ends[i], 3),
+                'text': text[offsets[i]:offsets[i + 1]].decode('utf-8'),
+            }
+            for i in range(count)
+        ]
+        transcript = {
+            'text': ' '.join(seg['text'] for seg in segments),
+            'segments': segments,
+        }
+        return transcript, metadata
+
+    def _path(self, source_id: str, source: str) -> str:
+        # source 直接組成檔名，只接受已知來源（避免路徑穿越）
+        if source not in SOURCES:
+            raise ValueError(f"未知的文字稿來源: {source}")
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', source_id)
+        return os.path.join(self.root_dir, f"{safe_id}.{source}.tscr")
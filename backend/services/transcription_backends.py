@@ -0,0 +1,89 @@
+"""
+語音轉文字引擎
+- whisper: OpenAI Whisper（PyTorch）
+- faster-whisper: CTranslate2 量化引擎（預設 int8，CPU 上明顯較快、記憶體較少）
+兩者回傳相同格式的段落 [{"start", "end", "text"}]
+"""
+import os
+
+# 各引擎皆為可選依賴
+try:
+    import whisper
+except ImportError:
+    whisper = None
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+
+class WhisperBackend:
+    name = "whisper"
+
+    @property
+    def available(self) -> bool:
+        return whisper is not None
+
+    def load(self, model_size: str):
+        return whisper.load_model(model_size)
+
+    def transcribe(self, model, audio, language: str = None) -> list:
+        """
+        Args:
+            audio: 音訊檔案路徑，或 16kHz 單聲道 float32 numpy 陣列
+        """
+        result = model.transcribe(audio, language=language, verbose=False)
+        return [
+            {
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": segment["text"].strip()
+            }
+            for segment in result["segments"]
+        ]
+
+
+class FasterWhisperBackend:
+    name = "faster-whisper"
+
+    def __init__(self):
+        self.compute_type = os.getenv('FASTER_WHISPER_COMPUTE_TYPE', 'int8')
+        self.cpu_threads = int(os.getenv('FASTER_WHISPER_CPU_THREADS', 0))
+
+    @property
+    def available(self) -> bool:
+        return WhisperModel is not None
+
+    def load(self, model_size: str):
+        return WhisperModel(model_size, device="cpu", compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads)
+
+    def transcribe(self, model, audio, language: str = None) -> list:
+        """
+        Args:
+            audio: 音訊檔案路徑，或 16kHz 單聲道 float32 numpy 陣列
+        """
+        segments, _ = model.transcribe(audio, language=language)
+        return [
+            {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text.strip()
+            }
+            for segment in segments
+        ]
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def get_backend(name: str = None):
+    """依名稱（或 TRANSCRIBER_BACKEND 環境變數）取得轉錄引擎"""
+    name = name or os.getenv('TRANSCRIBER_BACKEND', WhisperBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"不支援的轉錄引擎: {name}（可用：{', '.join(BACKENDS)}）")
+    return BACKENDS[name]()
@@ -0,0 +1,14 @@
+"""
+pytest 共用設定（在 backend 目錄執行 python -m pytest）
+快取、解析索引與文字稿改存到暫存目錄，避免測試寫入預設路徑
+"""
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix='podcast_tests_')
+os.environ.setdefault('SUMMARY_CACHE_PATH', os.path.join(_TMP, 'summary_cache.sqlite3'))
+os.environ.setdefault('RESOLUTION_INDEX_PATH', os.path.join(_TMP, 'resolution_index.sqlite3'))
+os.environ.setdefault('TRANSCRIPT_STORE_DIR', os.path.join(_TMP, 'transcripts'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
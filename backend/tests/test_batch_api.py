@@ -0,0 +1,52 @@
+import pytest
+
+import app as backend
+
+
+@pytest.fixture
+def client(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(backend.job_queue, 'submit', lambda func, progress: submitted.append(progress) or 'job-1')
+    monkeypatch.setattr(backend, 'batches', {})
+    test_client = backend.app.test_client()
+    test_client.submitted = submitted
+    return test_client
+
+
+@pytest.mark.parametrize('body', [
+    {'urls': 'https://www.youtube.com/watch?v=abc'},
+    {'urls': ['https://www.youtube.com/watch?v=abc', '']},
+    {'urls': ['https://www.youtube.com/watch?v=abc', 3]},
+    {'urls': ['https://www.youtube.com/watch?v=abc'], 'limit': 'ten'},
+    {'urls': ['https://www.youtube.com/watch?v=abc'], 'limit': -1},
+    {'urls': ['https://www.youtube.com/watch?v=abc'], 'limit': 0},
+    {'urls': ['https://www.youtube.com/watch?v=abc'], 'limit': True},
+    {'urls': ['https://www.youtube.com/watch?v=abc'], 'limit': 2.5},
+    {},
+])
+def test_invalid_requests_are_rejected(client, body):
+    response = client.post('/api/batch', json=body)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert client.submitted == []
+
+
+def test_urls_are_truncated_to_limit(client):
+    urls = [f'https://www.youtube.com/watch?v=video{i:05d}' for i in range(5)]
+
+    response = client.post('/api/batch', json={'urls': urls, 'limit': 3})
+
+    assert response.status_code == 202
+    assert response.get_json()['total'] == 3
+    assert [item['url'] for item in client.submitted[0].items] == urls[:3]
+
+
+def test_limit_is_capped_by_max_items(client, monkeypatch):
+    monkeypatch.setenv('BATCH_MAX_ITEMS', '2')
+    urls = [f'https://www.youtube.com/watch?v=video{i:05d}' for i in range(5)]
+
+    response = client.post('/api/batch', json={'urls': urls, 'limit': 100})
+
+    assert response.status_code == 202
+    assert response.get_json()['total'] == 2
@@ -0,0 +1,88 @@
+import pytest
+
+import app as backend
+from services import cache as cache_module
+from services.cache import SummaryCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    return SummaryCache(str(tmp_path / 'cache.sqlite3'), **kwargs)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60, max_entries=0)
+    cache.set('a|v1', 'a', {"one_liner": "A"})
+
+    clock.now += 59
+    assert cache.get('a|v1') == {"one_liner": "A"}
+
+    clock.now += 2
+    assert cache.get('a|v1') is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=0, max_entries=2)
+    cache.set('a|v1', 'a', {"one_liner": "A"})
+    clock.now += 1
+    cache.set('b|v1', 'b', {"one_liner": "B"})
+    clock.now += 1
+    assert cache.get('a|v1')  # a 變成最近使用
+    clock.now += 1
+
+    cache.set('c|v1', 'c', {"one_liner": "C"})
+
+    assert cache.get('b|v1') is None
+    assert cache.get('a|v1') and cache.get('c|v1')
+
+
+def test_invalidate_by_source_keeps_other_sources(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=0, max_entries=0)
+    cache.set('a|v1', 'a', {"one_liner": "A"})
+    cache.set('a|v2', 'a', {"one_liner": "A2"})
+    cache.set('b|v1', 'b', {"one_liner": "B"})
+
+    assert cache.invalidate('a') == 2
+    assert cache.get('b|v1') == {"one_liner": "B"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl_seconds=0, max_entries=0)
+    cache.set('youtube:aaaaaaaaaaa|v1', 'youtube:aaaaaaaaaaa', {"one_liner": "A"})
+    cache.set('youtube:bbbbbbbbbbb|v1', 'youtube:bbbbbbbbbbb', {"one_liner": "B"})
+    monkeypatch.setattr(backend, 'summary_cache', cache)
+    return backend.app.test_client()
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'json': {}}, {'json': {'all': 'yes'}}, {'data': 'not json'}])
+def test_invalidate_endpoint_requires_explicit_target(client, kwargs):
+    response = client.post('/api/cache/invalidate', **kwargs)
+
+    assert response.status_code == 400
+    assert backend.summary_cache.stats()["entries"] == 2
+
+
+def test_invalidate_endpoint_by_source_or_all(client):
+    response = client.post('/api/cache/invalidate', json={'source_id': 'youtube:aaaaaaaaaaa'})
+    assert response.get_json()["removed"] == 1
+
+    response = client.post('/api/cache/invalidate', json={'all': True})
+    assert response.get_json()["removed"] == 1
+    assert backend.summary_cache.stats()["entries"] == 0
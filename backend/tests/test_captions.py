@@ -0,0 +1,87 @@
+from services.captions import parse_captions
+
+# YouTube 自動字幕的滾動格式：每個 cue 重複上一行，中間夾著 10ms 的快照 cue
+ROLLING_VTT = '''﻿WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+hello<00:00:00.500><c> world</c>
+
+00:00:02.000 --> 00:00:02.010 align:start position:0%
+hello world
+ 
+
+00:00:02.010 --> 00:00:04.000 align:start position:0%
+hello world
+this<00:00:02.500><c> is</c><c> a test</c>
+
+00:00:04.000 --> 00:00:04.010 align:start position:0%
+this is a test
+ 
+
+00:00:04.010 --> 00:00:06.000 align:start position:0%
+this is a test
+goodbye
+'''
+
+REPEATED_SPEECH_VTT = '''WEBVTT
+
+00:00:01.000 --> 00:00:02.000
+yes
+
+00:00:02.000 --> 00:00:03.000
+yes
+
+00:00:09.000 --> 00:00:10.000
+I think so
+
+00:00:16.000 --> 00:00:17.000
+I think so
+'''
+
+
+def texts(result):
+    return [segment["text"] for segment in result["segments"]]
+
+
+def test_rolling_auto_captions_are_merged():
+    result = parse_captions(ROLLING_VTT, 'vtt', rolling=True)
+
+    assert texts(result) == ["hello world", "this is a test", "goodbye"]
+    assert result["segments"][0]["start"] == 0.0
+    assert result["segments"][-1]["end"] == 6.0
+    assert result["text"] == "hello world this is a test goodbye"
+
+
+def test_input_types_give_the_same_result():
+    expected = parse_captions(ROLLING_VTT, 'vtt', rolling=True)
+
+    assert parse_captions(ROLLING_VTT.encode('utf-8'), 'vtt', rolling=True) == expected
+    assert parse_captions(iter(ROLLING_VTT.splitlines(True)), 'vtt', rolling=True) == expected
+    assert parse_captions(iter(ROLLING_VTT.encode('utf-8').splitlines()), 'vtt', rolling=True) == expected
+
+
+def test_manual_subtitles_are_not_merged():
+    result = parse_captions(ROLLING_VTT, 'vtt')
+
+    assert len(result["segments"]) == 5
+    assert texts(result)[2] == "hello world this is a test"
+
+
+def test_repeated_speech_is_kept():
+    for rolling in (False, True):
+        result = parse_captions(REPEATED_SPEECH_VTT, 'vtt', rolling=rolling)
+
+        assert texts(result) == ["yes", "yes", "I think so", "I think so"]
+
+
+def test_srt_timestamps_and_markup():
+    srt = "1\n00:01:02,500 --> 00:01:04,000\n<i>Tom &amp; Jerry</i>\n\n2\n01:00:00,000 --> 01:00:01,250\n第二句\n"
+
+    result = parse_captions(srt, 'srt')
+
+    assert result["segments"] == [
+        {"start": 62.5, "end": 64.0, "text": "Tom & Jerry"},
+        {"start": 3600.0, "end": 3601.25, "text": "第二句"},
+    ]
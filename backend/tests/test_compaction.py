@@ -0,0 +1,55 @@
+from services.compaction import fit_to_budget
+from services.tokens import estimate_tokens
+
+
+def cost(lines):
+    return sum(estimate_tokens(line) + 1 for line in lines)
+
+
+def make_lines(count):
+    return [f"[{i:02d}:00] 第 {i} 段的內容，討論主題與細節。" for i in range(count)]
+
+
+def test_lines_within_budget_are_unchanged():
+    lines = make_lines(5)
+
+    result = fit_to_budget(lines, cost(lines))
+
+    assert result == lines
+    assert result is not lines
+
+
+def test_selection_stays_within_budget():
+    lines = make_lines(200)
+    budget = cost(lines) // 4
+
+    result = fit_to_budget(lines, budget)
+
+    assert cost(result) <= budget
+    assert len([line for line in result if line != "..."]) < len(lines)
+
+
+def test_selection_spans_the_whole_transcript_in_order():
+    lines = make_lines(200)
+
+    result = fit_to_budget(lines, cost(lines) // 4)
+    kept = [line for line in result if line != "..."]
+
+    assert kept[0] == lines[0]
+    # 平均取樣：最後保留的段落接近結尾，而不是只保留開頭
+    assert lines.index(kept[-1]) > len(lines) * 3 // 4
+    assert [lines.index(line) for line in kept] == sorted(lines.index(line) for line in kept)
+
+
+def test_skipped_ranges_are_marked():
+    lines = make_lines(50)
+
+    result = fit_to_budget(lines, cost(lines) // 3, gap_marker="[略]")
+
+    assert "[略]" in result
+    assert result[-1] == "[略]" or result[-1] == lines[-1]
+    assert all(not (a == "[略]" and b == "[略]") for a, b in zip(result, result[1:]))
+
+
+def test_budget_too_small_returns_nothing():
+    assert fit_to_budget(make_lines(10), 1) == []
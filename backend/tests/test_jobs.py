@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from services import jobs as jobs_module
+from services.jobs import JobQueue, QueueFullError
+
+
+def wait_for(queue, job_id, status):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"{job_id} 未進入 {status}：{queue.get(job_id)}")
+
+
+def test_rejects_jobs_beyond_max_pending():
+    queue = JobQueue(max_workers=1, max_pending=2, ttl_seconds=60)
+    release = threading.Event()
+
+    def blocked(report):
+        release.wait(5)
+        return "ok"
+
+    first = queue.submit(blocked)
+    queue.submit(blocked)
+    with pytest.raises(QueueFullError):
+        queue.submit(blocked)
+
+    release.set()
+    assert wait_for(queue, first, 'done')['result'] == "ok"
+
+
+def test_reports_progress_and_failures():
+    queue = JobQueue(max_workers=1, max_pending=5, ttl_seconds=60)
+
+    def failing(report):
+        report('transcribe', 40)
+        raise RuntimeError("boom")
+
+    job = wait_for(queue, queue.submit(failing), 'failed')
+
+    assert (job['stage'], job['progress'], job['error']) == ('transcribe', 40, "boom")
+
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    queue = JobQueue(max_workers=1, max_pending=5, ttl_seconds=60)
+    job_id = queue.submit(lambda report: "ok")
+    finished_at = wait_for(queue, job_id, 'done')['finished_at']
+
+    monkeypatch.setattr(jobs_module.time, 'time', lambda: finished_at + 61)
+    queue.submit(lambda report: "ok")
+
+    assert queue.get(job_id) is None
@@ -0,0 +1,82 @@
+import re
+
+import pytest
+
+from services.summarizer import SummarizerService
+from services.tokens import estimate_tokens
+from benchmarks.stub_llm import StubAnthropic
+from benchmarks.bench_map_reduce import make_transcript
+
+METADATA = {"title": "測試節目", "duration": ""}
+
+
+@pytest.fixture
+def service():
+    service = SummarizerService(client=StubAnthropic(time_scale=0))
+    service.chunk_tokens = 600
+    return service
+
+
+def chunk_cost(service, chunk):
+    return sum(estimate_tokens(service._format_line(seg)) + 1 for seg in chunk)
+
+
+def note_parts(text):
+    """筆記標題中的 (部分編號, 時間範圍)"""
+    return re.findall(r'### 第 (\d+) 部分（([^）]+)）', text)
+
+
+def test_chunks_split_only_at_paragraph_boundaries(service):
+    segments = service._compact(make_transcript(0.5)["segments"])
+
+    chunks = service._chunk_segments(segments, service.chunk_tokens)
+
+    assert len(chunks) > 1
+    assert [seg for chunk in chunks for seg in chunk] == segments
+    for chunk in chunks:
+        assert chunk_cost(service, chunk) <= service.chunk_tokens
+
+
+def test_oversized_paragraph_gets_its_own_chunk(service):
+    segments = [
+        {"start": 0, "end": 30, "text": "短段落"},
+        {"start": 30, "end": 60, "text": "很長的段落。" * 400},
+        {"start": 60, "end": 90, "text": "短段落"},
+    ]
+
+    chunks = service._chunk_segments(segments, service.chunk_tokens)
+
+    assert chunks == [[segments[0]], [segments[1]], [segments[2]]]
+
+
+def test_map_makes_one_call_per_chunk_in_time_order(service):
+    segments = service._compact(make_transcript(0.5)["segments"])
+    chunks = service._chunk_segments(segments, service.chunk_tokens)
+
+    notes = service._map_chunks(segments, METADATA)
+
+    assert len(service.client.calls) == len(chunks)
+    parts = note_parts(notes)
+    assert [int(part) for part, _ in parts] == list(range(1, len(chunks) + 1))
+    assert [time_range for _, time_range in parts] == [
+        f"{service._format_time(chunk[0]['start'])} - {service._format_time(chunk[-1]['end'])}" for chunk in chunks
+    ]
+
+
+def test_reduce_prompt_holds_every_note_in_order(service, monkeypatch):
+    transcript = make_transcript(0.5)
+    chunks = service._chunk_segments(service._compact(transcript["segments"]), service.chunk_tokens)
+    reduce_notes = []
+    build_reduce_prompt = service._build_reduce_prompt
+
+    def spy(notes_text, metadata):
+        reduce_notes.append(notes_text)
+        return build_reduce_prompt(notes_text, metadata)
+
+    monkeypatch.setattr(service, '_build_reduce_prompt', spy)
+
+    summary = service.generate_summary(transcript, METADATA, mode="map_reduce")
+
+    assert len(service.client.calls) == len(chunks) + 1
+    assert [int(part) for part, _ in note_parts(reduce_notes[0])] == list(range(1, len(chunks) + 1))
+    assert summary["one_liner"]
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.model_router import ModelRouter, QUICK_FIELDS, BATCH_PRICE_FACTOR
+from services.summarizer import SummarizerService
+from benchmarks.stub_llm import StubAnthropic
+
+
+@pytest.fixture
+def router():
+    router = ModelRouter('claude-sonnet-4-20250514', 8000)
+    router.small_tokens = 3000
+    return router
+
+
+def test_route_picks_tier_by_detail_and_length(router):
+    assert router.route(3000).name == "small"
+    assert router.route(3001).name == "standard"
+    assert router.route(100, detail="quick").name == "quick"
+    assert router.route(100_000, detail="quick").fields == QUICK_FIELDS
+
+    router.small_tokens = 0
+    assert router.route(100).name == "standard"
+
+
+def test_batch_calls_cost_less(router):
+    usage = SimpleNamespace(input_tokens=10_000, output_tokens=1_000)
+    tier = router.tiers["standard"]
+    router.record_call(tier, usage)
+    router.record_call(tier, usage, batch=True)
+
+    totals = router.stats()["tiers"]["standard"]
+    full_price = tier.cost(10_000, 1_000)
+    assert (totals["calls"], totals["batch_calls"]) == (1, 1)
+    assert totals["cost_usd"] == pytest.approx(full_price * (1 + BATCH_PRICE_FACTOR), abs=1e-6)
+
+
+def test_cache_version_differs_per_detail_and_models():
+    service = SummarizerService(client=StubAnthropic(time_scale=0))
+    service.router.small_tokens = 3000
+    full, quick = service.cache_version("full"), service.cache_version("quick")
+
+    assert full == service.version
+    assert full != quick
+    assert ":quick:" in quick
+
+    service.router.small_tokens = 0
+    assert service.cache_version("full") != full  # small tier 不再使用，舊快取不可沿用
+    assert service.cache_version("quick") == quick
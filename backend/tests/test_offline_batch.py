@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from services import offline_batch
+from services.offline_batch import OfflineBatchSummarizer
+from services.summarizer import SummarizerService
+from benchmarks.stub_llm import StubAnthropic, CANNED_SUMMARY
+from benchmarks.bench_map_reduce import make_transcript
+
+
+class Overloaded(Exception):
+    status_code = 529
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture
+def stub():
+    return StubAnthropic(time_scale=0)
+
+
+@pytest.fixture
+def service(stub, monkeypatch):
+    monkeypatch.setattr(offline_batch.random, 'uniform', lambda low, high: 0)
+    return SummarizerService(client=stub)
+
+
+def episodes(long_items=0, items=2):
+    return [
+        (f"test:{i}", make_transcript(3 if i < long_items else 0.2), {"title": f"節目 {i}", "duration": ""})
+        for i in range(items)
+    ]
+
+
+def run(service, items):
+    summaries = {}
+    outcome = OfflineBatchSummarizer(service, poll_interval=0.01).run(
+        items, lambda source_id, metadata, summary: summaries.__setitem__(source_id, summary)
+    )
+    return outcome, summaries
+
+
+def test_map_and_reduce_are_sent_as_batches(service, stub):
+    outcome, summaries = run(service, episodes(long_items=1))
+
+    assert outcome["results"] == {"test:0": "done", "test:1": "done"}
+    assert summaries["test:1"]["one_liner"] == CANNED_SUMMARY["one_liner"]
+    assert outcome["usage"]["batches"] == 2
+    assert outcome["usage"]["input_tokens"] == sum(call["input_tokens"] for call in stub.calls)
+
+
+def test_invalid_sections_are_regenerated_in_a_follow_up_batch(service, stub):
+    stub.response_text = json.dumps(dict(CANNED_SUMMARY, one_liner=""), ensure_ascii=False)
+    create = stub.messages.batches.create
+    sent = []
+
+    def create_batch(requests):
+        sent.append([request["custom_id"] for request in requests])
+        if sent[-1][0].startswith("repair-"):
+            stub.response_text = json.dumps(CANNED_SUMMARY, ensure_ascii=False)
+        return create(requests=requests)
+
+    stub.messages.batches.create = create_batch
+    outcome, summaries = run(service, episodes(items=1))
+
+    assert sent == [["summary-0"], ["repair-0-1"]]
+    assert outcome["results"] == {"test:0": "done"}
+    assert summaries["test:0"]["one_liner"] == CANNED_SUMMARY["one_liner"]
+
+
+def test_batch_creation_is_not_retried(service, stub):
+    calls = []
+
+    def create_batch(requests):
+        calls.append(requests)
+        raise Overloaded("overloaded")
+
+    stub.messages.batches.create = create_batch
+    with pytest.raises(Overloaded):
+        run(service, episodes(items=1))
+    assert len(calls) == 1
+
+
+def test_polling_outlasts_transient_errors_without_touching_the_rate_limiter(service, stub):
+    retrieve = stub.messages.batches.retrieve
+    failures = iter([Overloaded("overloaded")] * (service.rate_limiter.max_retries + 2))
+
+    def flaky_retrieve(batch_id):
+        error = next(failures, None)
+        if error:
+            raise error
+        return retrieve(batch_id)
+
+    stub.messages.batches.retrieve = flaky_retrieve
+    counters = dict(service.rate_limiter.counters)
+    outcome, _ = run(service, episodes(items=1))
+
+    assert outcome["results"] == {"test:0": "done"}
+    assert service.rate_limiter.counters == counters
+
+
+def test_polling_gives_up_on_permanent_errors(service, stub):
+    def broken_retrieve(batch_id):
+        raise BadRequest("bad request")
+
+    stub.messages.batches.retrieve = broken_retrieve
+    with pytest.raises(BadRequest):
+        run(service, episodes(items=1))
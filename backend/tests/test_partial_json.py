@@ -0,0 +1,55 @@
+import json
+
+from services.partial_json import IncrementalJsonObject
+
+
+def feed_all(parser, pieces):
+    completed = []
+    for piece in pieces:
+        completed.extend(parser.feed(piece))
+    return completed
+
+
+def test_fields_complete_in_order_when_fed_char_by_char():
+    data = {"one_liner": "一句話", "article": [{"title": "段落", "body": "內容"}], "count": 12}
+    parser = IncrementalJsonObject()
+
+    completed = feed_all(parser, json.dumps(data, ensure_ascii=False))
+
+    assert completed == list(data.items())
+    assert parser.sections == data
+    assert parser.closed
+
+
+def test_field_is_not_emitted_until_value_is_complete():
+    parser = IncrementalJsonObject()
+
+    assert parser.feed('{"one_liner": "還沒') == []
+    assert parser.feed('完", "quotes": [') == [("one_liner", "還沒完")]
+    assert parser.feed('"a"]}') == [("quotes", ["a"])]
+
+
+def test_number_waits_for_following_delimiter():
+    parser = IncrementalJsonObject()
+
+    assert parser.feed('{"count": 12') == []
+    assert parser.feed('3') == []
+    assert parser.feed('}') == [("count", 123)]
+    assert parser.sections == {"count": 123}
+
+
+def test_text_before_object_is_ignored():
+    parser = IncrementalJsonObject()
+
+    completed = feed_all(parser, ['以下是摘要：\n```json\n', '{"a": 1, ', '"b": "x"}\n```'])
+
+    assert completed == [("a", 1), ("b", "x")]
+
+
+def test_truncated_output_keeps_completed_fields():
+    parser = IncrementalJsonObject()
+
+    parser.feed('{"one_liner": "完整", "article": [{"title": "被截斷')
+
+    assert parser.sections == {"one_liner": "完整"}
+    assert not parser.closed
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app as backend
+from services.rate_limit import RateLimiter, ModelBusyError, lane, _Bucket
+
+
+def test_bucket_shortfall_is_time_to_refill():
+    bucket = _Bucket(60)
+    bucket.take(60)
+
+    assert bucket.shortfall(1) == pytest.approx(1, abs=0.01)
+    assert bucket.shortfall(120) == pytest.approx(60, abs=0.01)  # 超過上限時只等滿整個 bucket
+    assert bucket.shortfall(1, reserve=0.5) == pytest.approx(31, abs=0.01)
+    assert _Bucket(0).shortfall(10 ** 9) == 0
+
+
+def test_check_rejects_when_the_interactive_backlog_is_too_long():
+    limiter = RateLimiter(rpm=10, itpm=0, otpm=0, max_wait=5)
+    for _ in range(10):
+        limiter.acquire(0, 0)
+
+    with pytest.raises(ModelBusyError) as busy:
+        limiter.check()
+    limiter.check("batch")  # batch 不拒絕，排隊等待
+
+    assert busy.value.retry_after == 6
+    assert limiter.counters["rejected"] == 1
+
+
+def test_settle_returns_unused_reservation():
+    limiter = RateLimiter(rpm=0, itpm=1000, otpm=1000)
+    ticket = limiter.acquire(100, 500)
+    assert limiter.buckets["output_tokens"].level == pytest.approx(500, abs=1)
+
+    limiter.settle(ticket, SimpleNamespace(input_tokens=50, cache_creation_input_tokens=10, output_tokens=100))
+
+    assert limiter.buckets["input_tokens"].level == pytest.approx(940, abs=1)
+    assert limiter.buckets["output_tokens"].level == pytest.approx(900, abs=1)
+
+
+def test_batch_lane_yields_to_interactive():
+    limiter = RateLimiter(rpm=10, itpm=0, otpm=0, batch_reserve=0.2)
+    for _ in range(8):
+        limiter.acquire(0, 0)
+
+    with lane("batch"):
+        batch = limiter._enqueue(0, 0)
+    assert limiter._try_take(batch) > 0  # 只剩保留給 interactive 的額度
+
+    interactive = limiter._enqueue(0, 0)
+    assert limiter._try_take(interactive) == 0
+    limiter._dequeue(interactive)
+
+    limiter.buckets["requests"].level = 10
+    waiting = limiter._enqueue(0, 0)
+    assert limiter._try_take(batch) == 0.1  # 有 interactive 在等待時讓先
+    limiter._dequeue(waiting)
+    assert limiter._try_take(batch) == 0
+
+
+def test_busy_model_returns_503_with_retry_after(monkeypatch):
+    def busy(lane_name=None):
+        raise ModelBusyError("Claude 呼叫排隊中", 12.3)
+
+    monkeypatch.setattr(backend.summarizer_service.rate_limiter, 'check', busy)
+    response = backend.app.test_client().post('/api/jobs', json={'url': 'https://youtu.be/aaaaaaaaaaa'})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "13"
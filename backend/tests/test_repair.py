@@ -0,0 +1,66 @@
+import copy
+
+import pytest
+
+from services.summarizer import SummarizerService
+from benchmarks.stub_llm import StubAnthropic, CANNED_SUMMARY
+
+
+@pytest.fixture
+def service():
+    return SummarizerService(client=StubAnthropic(time_scale=0))
+
+
+def summary(**overrides):
+    data = copy.deepcopy({key: CANNED_SUMMARY[key] for key in
+                          ("one_liner", "article", "insights", "data_highlights", "quotes", "timestamps")})
+    data.update(overrides)
+    return data
+
+
+def test_repair_merges_only_the_failing_sections(service):
+    tier = service.router.tiers["standard"]
+    steps = service._repair_steps(summary(one_liner="", quotes=[{"time": "01:00"}]), "prompt", tier)
+
+    sections, fields = next(steps)
+    assert fields == ["one_liner", "quotes"]
+
+    repaired = {
+        "one_liner": "修好的一句話",
+        "quotes": [{"time": "01:00"}],  # 仍不合格，不採用
+        "article": [{"subtitle": "不該被覆蓋", "content": "x"}],
+    }
+    with pytest.raises(StopIteration) as done:
+        steps.send(repaired)
+    result = done.value.value
+
+    assert result["one_liner"] == "修好的一句話"
+    assert result["quotes"] == [{"time": "01:00"}]
+    assert result["article"] == CANNED_SUMMARY["article"]
+    assert service.usage["repaired_sections"] == 1
+
+
+def test_failed_repair_keeps_the_original_sections(service):
+    steps = service._repair_steps(summary(one_liner=""), "prompt", service.router.tiers["standard"])
+    next(steps)
+
+    with pytest.raises(StopIteration) as done:
+        steps.send(RuntimeError("timeout"))
+
+    assert done.value.value["one_liner"] == ""
+    assert done.value.value["article"] == CANNED_SUMMARY["article"]
+
+
+def test_valid_summary_needs_no_repair(service):
+    with pytest.raises(StopIteration) as done:
+        next(service._repair_steps(summary(), "prompt", service.router.tiers["standard"]))
+
+    assert done.value.value["one_liner"] == CANNED_SUMMARY["one_liner"]
+
+
+def test_repair_prompt_asks_only_for_failing_sections(service):
+    prompt, _ = service._build_repair_prompt("原始 prompt", summary(one_liner=""), ["one_liner"])
+
+    assert prompt.startswith("原始 prompt")
+    assert prompt.endswith("請只輸出以下欄位：one_liner")
+    assert '"one_liner"' not in prompt
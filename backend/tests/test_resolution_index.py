@@ -0,0 +1,93 @@
+import pytest
+
+from services import resolution_index as index_module
+from services.resolution_index import ResolutionIndex
+from services.spotify import SpotifyService
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(index_module.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def index(tmp_path, clock):
+    return ResolutionIndex(str(tmp_path / 'index.sqlite3'), ttl_seconds=1000, negative_ttl_seconds=100,
+                           feed_ttl_seconds=500)
+
+
+def test_negative_entries_expire_before_resolved_ones(index, clock):
+    index.put('found', 'https://example.com/a.mp3', '第一集', '節目', 60)
+    index.put_miss('missing')
+
+    clock.now += 101
+    assert index.get('missing') is None
+    assert index.get('found')["audio_url"] == 'https://example.com/a.mp3'
+
+    clock.now += 900
+    assert index.get('found') is None
+    assert (index.hits, index.negative_hits, index.misses) == (1, 0, 2)
+
+
+def test_same_title_in_different_feeds_is_kept_apart(index):
+    index.add_feed_entries('https://a.example/feed', [
+        {"title": "EP1 開場", "audio_url": "https://a.example/1.mp3", "podcast_name": "A"},
+    ])
+    index.add_feed_entries('https://b.example/feed', [
+        {"title": "ep1：開場", "audio_url": "https://b.example/1.mp3", "podcast_name": "B"},
+    ])
+
+    matches = index.find_by_title('EP1 開場')
+
+    assert sorted(m["podcast_name"] for m in matches) == ["A", "B"]
+
+
+def test_feed_entries_expire_unless_reimported(index, clock):
+    entry = {"title": "EP1", "audio_url": "https://a.example/1.mp3", "podcast_name": "A"}
+    index.add_feed_entries('https://a.example/feed', [entry])
+    index.add_feed_entries('https://b.example/feed', [dict(entry, podcast_name="B")])
+
+    clock.now += 400
+    index.add_feed_entries('https://a.example/feed', [entry])
+    clock.now += 200
+
+    assert [m["podcast_name"] for m in index.find_by_title('EP1')] == ["A"]
+    index.add_feed_entries('https://c.example/feed', [])
+    assert index.stats()["feed_entries"] == 1
+
+
+class TokenResponse:
+    def __init__(self, token):
+        self.token = token
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"access_token": self.token, "expires_in": 3600}
+
+
+def test_spotify_token_is_reused_until_expiry(tmp_path, clock, monkeypatch):
+    monkeypatch.setenv('SPOTIFY_CLIENT_ID', 'id')
+    monkeypatch.setenv('SPOTIFY_CLIENT_SECRET', 'secret')
+    service = SpotifyService(ResolutionIndex(str(tmp_path / 'index.sqlite3')))
+    posts = []
+    monkeypatch.setattr(service.session, 'post',
+                        lambda *args, **kwargs: posts.append(args) or TokenResponse(f"t{len(posts)}"))
+
+    assert service._spotify_api_headers() == {'Authorization': 'Bearer t1'}
+    clock.now += 3500
+    assert service._spotify_api_headers() == {'Authorization': 'Bearer t1'}
+    clock.now += 100
+    assert service._spotify_api_headers() == {'Authorization': 'Bearer t2'}
+    assert len(posts) == 2
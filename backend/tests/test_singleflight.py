@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_leader_error_is_shared_with_every_waiter():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+
+    def leader():
+        started.set()
+        release.wait(5)
+        raise ValueError("下載失敗")
+
+    def call(func):
+        try:
+            outcomes.append(flights.do("key", func))
+        except ValueError as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call, args=(leader,))]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call, args=(pytest.fail,)) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    while flights.stats()["waiting"] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(outcomes) == 4
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flights.stats() == {"leaders": 1, "coalesced": 3, "coalesced_ratio": 0.75, "shared_errors": 3,
+                               "in_flight": 0, "waiting": 0}
+
+
+def test_async_waiters_share_the_leader_result():
+    flights = SingleFlight()
+    calls = []
+
+    async def summarize():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"one_liner": "摘要"}
+
+    async def main():
+        return await asyncio.gather(*(flights.do_async("key", summarize) for _ in range(3)))
+
+    results = asyncio.run(main())
+
+    assert calls == [1]
+    assert results == [({"one_liner": "摘要"}, False)] + [({"one_liner": "摘要"}, True)] * 2
+
+
+def test_async_waiter_wakes_on_a_thread_leader():
+    flights = SingleFlight()
+    flight, leader = flights.begin("key")
+    assert leader
+
+    async def main():
+        waiter = asyncio.ensure_future(flights.do_async("key", pytest.fail))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=flights.finish, args=("key", flight), kwargs={"result": "done"}).start()
+        return await asyncio.wait_for(waiter, 5)
+
+    assert asyncio.run(main()) == ("done", True)
+
+
+def test_cancelled_async_leader_fails_waiters_without_cancelling_them():
+    flights = SingleFlight()
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do_async("key", asyncio.sleep, 10))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(flights.do_async("key", pytest.fail))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(RuntimeError, match="已中斷"):
+            await waiter
+
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from services.transcriber import TranscriberService, TranscriberBusyError
+
+
+def wait_until(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("等待逾時")
+
+
+@pytest.fixture
+def service():
+    service = TranscriberService(max_concurrent=1, max_queue=1)
+    yield service
+    service.shutdown()
+
+
+def test_rejects_when_queue_is_full(service):
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with service._slot():
+            holding.set()
+            release.wait(5)
+
+    def queued():
+        with service._slot():
+            pass
+
+    threads = [threading.Thread(target=hold), threading.Thread(target=queued)]
+    threads[0].start()
+    holding.wait(5)
+    threads[1].start()
+    wait_until(lambda: service.waiting == 1)
+
+    with pytest.raises(TranscriberBusyError):
+        with service._slot():
+            pass
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert (service.waiting, service.active) == (0, 0)
+    assert service.queue_wait.snapshot()["count"] == 2
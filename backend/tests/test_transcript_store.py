@@ -0,0 +1,42 @@
+import pytest
+
+import app as backend
+from services.transcript_store import TranscriptStore
+
+TRANSCRIPT = {"text": "開場 正題", "segments": [{"start": 0.0, "end": 2.0, "text": "開場"},
+                                                {"start": 2.0, "end": 5.5, "text": "正題"}]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TranscriptStore(str(tmp_path), max_bytes=0, ttl_seconds=0)
+
+
+def test_round_trip_prefers_subtitles(store):
+    store.save('youtube:aaaaaaaaaaa', 'whisper', dict(TRANSCRIPT, segments=TRANSCRIPT["segments"][:1]), {})
+    store.save('youtube:aaaaaaaaaaa', 'subtitles', TRANSCRIPT, {"title": "節目"})
+
+    transcript, metadata = store.load('youtube:aaaaaaaaaaa')
+
+    assert [segment["text"] for segment in transcript["segments"]] == ["開場", "正題"]
+    assert metadata["title"] == "節目"
+    assert len(store.load('youtube:aaaaaaaaaaa', 'whisper')[0]["segments"]) == 1
+
+
+@pytest.mark.parametrize('source', ['../../etc/passwd', 'subtitles/../x', 'other'])
+def test_unknown_sources_are_rejected(store, source):
+    with pytest.raises(ValueError):
+        store.load('youtube:aaaaaaaaaaa', source)
+    with pytest.raises(ValueError):
+        store.save('youtube:aaaaaaaaaaa', source, TRANSCRIPT, {})
+
+
+def test_transcript_endpoint_validates_source(store, monkeypatch):
+    monkeypatch.setattr(backend, 'transcript_store', store)
+    store.save('youtube:aaaaaaaaaaa', 'subtitles', TRANSCRIPT, {})
+    client = backend.app.test_client()
+
+    assert client.get('/api/transcripts/youtube:aaaaaaaaaaa?source=../../x').status_code == 400
+    assert client.get('/api/transcripts/youtube:aaaaaaaaaaa?source=whisper').status_code == 404
+    assert client.get('/api/transcripts/youtube:aaaaaaaaaaa?source=subtitles').status_code == 200
+    assert client.get('/api/transcripts/youtube:aaaaaaaaaaa').status_code == 200
@@ -40,6 +40,9 @@ const elements = {
     }
 };
 
+// 工作輪詢間隔
+const POLL_INTERVAL_MS = 2000;
+
 // 狀態
 let currentResult = null;
 
@@ -75,31 +78,144 @@ async function handleSubmit() {
         // 進度更新
         updateStep('download', 'active');
 
-        const response = await fetch(`${API_URL}/summarize`, {
+        // 優先使用串流（逐段顯示），不支援時改用背景工作輪詢
+        let result;
+        try {
+            result = await streamSummary(url);
+        } catch (error) {
+            if (!error.fallback) throw error;
+            result = await runJob(url);
+        }
+
+        updateStep('download', 'completed');
+        updateStep('summarize', 'completed');
+
+        // 顯示結果
+        currentResult = result;
+        showResult(result);
+
+    } catch (error) {
+        showError(error.message);
+    }
+}
+
+// 串流摘要（Server-Sent Events），各區塊生成後立即顯示
+async function streamSummary(url) {
+    let response;
+    try {
+        response = await fetch(`${API_URL}/summarize/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({ url })
         });
+    } catch (error) {
+        throw Object.assign(error, { fallback: true });
+    }
 
-        updateStep('download', 'completed');
-        updateStep('summarize', 'active');
+    if (!response.ok || !response.body) {
+        throw Object.assign(new Error('串流不可用'), { fallback: true });
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+            const event = parseSseEvent(raw);
+            if (!event) continue;
+
+            switch (event.type) {
+                case 'metadata':
+                    showResultHeader(event.data);
+                    break;
+                case 'stage':
+                    if (event.data.stage === 'summarize') {
+                        updateStep('download', 'completed');
+                        updateStep('summarize', 'active');
+                    }
+                    break;
+                case 'section':
+                    renderSection(event.data.key, event.data.value);
+                    revealResult();
+                    break;
+                case 'done':
+                    return event.data;
+                case 'error':
+                    throw new Error(event.data.error || '處理失敗');
+            }
+        }
+    }
+
+    throw new Error('連線中斷，請重試');
+}
+
+// 解析單一 SSE 事件
+function parseSseEvent(raw) {
+    let type = 'message';
+    const dataLines = [];
+
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) type = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+    });
+
+    if (dataLines.length === 0) return null;
+    return { type, data: JSON.parse(dataLines.join('\n')) };
+}
+
+// 提交背景工作並輪詢結果
+async function runJob(url) {
+    const response = await fetch(`${API_URL}/jobs`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ url })
+    });
+
+    const data = await response.json();
+
+    if (!response.ok) {
+        throw new Error(data.error || '處理失敗');
+    }
+
+    return pollJob(data.job_id);
+}
 
-        const data = await response.json();
+// 輪詢工作狀態直到完成
+async function pollJob(jobId) {
+    while (true) {
+        await delay(POLL_INTERVAL_MS);
+
+        const response = await fetch(`${API_URL}/jobs/${jobId}`);
+        const job = await response.json();
 
         if (!response.ok) {
-            throw new Error(data.error || '處理失敗');
+            throw new Error(job.error || '查詢進度失敗');
         }
 
-        updateStep('summarize', 'completed');
-
-        // 顯示結果
-        currentResult = data;
-        showResult(data);
+        if (job.status === 'done') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || '處理失敗');
+        }
 
-    } catch (error) {
-        showError(error.message);
+        // 轉錄與下載同屬第一步；進入摘要階段時切換步驟
+        if (job.stage === 'summarize') {
+            updateStep('download', 'completed');
+            updateStep('summarize', 'active');
+        }
     }
 }
 
@@ -116,6 +232,9 @@ function showLoading() {
     elements.errorSection.hidden = true;
     elements.submitBtn.disabled = true;
 
+    // 清除上一次的結果（串流時會逐段填入）
+    SECTION_KEYS.forEach(key => renderSection(key, null));
+
     // 重置步驟狀態
     Object.values(elements.steps).forEach(step => {
         if (step) step.classList.remove('active', 'completed');
@@ -142,95 +261,126 @@ function updateStep(step, status) {
 
 // 顯示結果
 function showResult(data) {
+    showResultHeader(data);
+    SECTION_KEYS.forEach(key => renderSection(key, data[key]));
+    revealResult();
     elements.loadingSection.hidden = true;
+    elements.submitBtn.disabled = false;
+}
+
+// 顯示結果區塊（串流時載入提示仍保留在上方）
+function revealResult() {
     elements.resultSection.hidden = false;
     elements.errorSection.hidden = true;
-    elements.submitBtn.disabled = false;
+}
 
-    // 標題與來源
+// 標題與來源
+function showResultHeader(data) {
     elements.podcastTitle.textContent = data.title;
     elements.podcastDuration.textContent = data.duration || '';
 
     // 來源標籤
-    if (data.source === 'subtitles') {
+    if (!data.source) {
+        elements.sourceBadge.textContent = '';
+    } else if (data.source === 'subtitles') {
         elements.sourceBadge.textContent = '字幕模式';
         elements.sourceBadge.className = 'source-badge';
     } else {
         elements.sourceBadge.textContent = 'Whisper 轉錄';
         elements.sourceBadge.className = 'source-badge whisper';
     }
+}
 
-    // 一句話總結
-    if (data.one_liner) {
-        elements.oneLiner.textContent = data.one_liner;
-        elements.oneLinerCard.hidden = false;
-    } else {
-        elements.oneLinerCard.hidden = true;
-    }
-
-    // V3: 精華內容
-    if (data.article && data.article.length > 0) {
-        elements.article.innerHTML = data.article
-            .map(section => `
-                <div class="article-section">
-                    <h4 class="article-subtitle">${escapeHtml(section.subtitle || '')}</h4>
-                    <p class="article-text">${escapeHtml(section.content || '')}</p>
-                </div>
-            `)
-            .join('');
-        elements.articleCard.hidden = false;
-    } else {
-        elements.articleCard.hidden = true;
-    }
-
-    // 商業分析師觀點
-    if (data.insights && data.insights.length > 0) {
-        elements.insights.innerHTML = data.insights
-            .map(insight => `
-                <div class="insight-item">
-                    <p>${escapeHtml(insight)}</p>
-                </div>
-            `)
-            .join('');
-        elements.insightsCard.hidden = false;
-    } else {
-        elements.insightsCard.hidden = true;
-    }
-
-    // 數據亮點
-    if (data.data_highlights && data.data_highlights.length > 0) {
-        elements.dataHighlights.innerHTML = data.data_highlights
-            .map(d => `<li>${escapeHtml(d)}</li>`)
-            .join('');
-        elements.dataHighlightsCard.hidden = false;
-    } else {
-        elements.dataHighlightsCard.hidden = true;
-    }
-
-    // 金句摘錄
-    if (data.quotes && data.quotes.length > 0) {
-        elements.quotes.innerHTML = data.quotes
-            .map(q => `
-                <div class="quote-item">
-                    <p class="quote-text">${escapeHtml(q.text || q)}</p>
-                    ${q.time ? `<p class="quote-time">${escapeHtml(q.time)}</p>` : ''}
-                </div>
-            `)
-            .join('');
-        elements.quotesCard.hidden = false;
-    } else {
-        elements.quotesCard.hidden = true;
+// 摘要區塊（依模型輸出順序）
+const SECTION_KEYS = ['one_liner', 'article', 'insights', 'data_highlights', 'quotes', 'timestamps'];
+
+// 顯示單一摘要區塊
+function renderSection(key, value) {
+    switch (key) {
+        // 一句話總結
+        case 'one_liner':
+            if (value) {
+                elements.oneLiner.textContent = value;
+                elements.oneLinerCard.hidden = false;
+            } else {
+                elements.oneLinerCard.hidden = true;
+            }
+            break;
+
+        // V3: 精華內容
+        case 'article':
+            if (value && value.length > 0) {
+                elements.article.innerHTML = value
+                    .map(section => `
+                        <div class="article-section">
+                            <h4 class="article-subtitle">${escapeHtml(section.subtitle || '')}</h4>
+                            <p class="article-text">${escapeHtml(section.content || '')}</p>
+                        </div>
+                    `)
+                    .join('');
+                elements.articleCard.hidden = false;
+            } else {
+                elements.articleCard.hidden = true;
+            }
+            break;
+
+        // 商業分析師觀點
+        case 'insights':
+            if (value && value.length > 0) {
+                elements.insights.innerHTML = value
+                    .map(insight => `
+                        <div class="insight-item">
+                            <p>${escapeHtml(insight)}</p>
+                        </div>
+                    `)
+                    .join('');
+                elements.insightsCard.hidden = false;
+            } else {
+                elements.insightsCard.hidden = true;
+            }
+            break;
+
+        // 數據亮點
+        case 'data_highlights':
+            if (value && value.length > 0) {
+                elements.dataHighlights.innerHTML = value
+                    .map(d => `<li>${escapeHtml(d)}</li>`)
+                    .join('');
+                elements.dataHighlightsCard.hidden = false;
+            } else {
+                elements.dataHighlightsCard.hidden = true;
+            }
+            break;
+
+        // 金句摘錄
+        case 'quotes':
+            if (value && value.length > 0) {
+                elements.quotes.innerHTML = value
+                    .map(q => `
+                        <div class="quote-item">
+                            <p class="quote-text">${escapeHtml(q.text || q)}</p>
+                            ${q.time ? `<p class="quote-time">${escapeHtml(q.time)}</p>` : ''}
+                        </div>
+                    `)
+                    .join('');
+                elements.quotesCard.hidden = false;
+            } else {
+                elements.quotesCard.hidden = true;
+            }
+            break;
+
+        // 時間導航
+        case 'timestamps':
+            elements.timestamps.innerHTML = (value || [])
+                .map(ts => `
+                    <div class="timestamp-item">
+                        <span class="timestamp-time">${escapeHtml(ts.time || '')}</span>
+                        <span class="timestamp-topic">${escapeHtml(ts.topic || '')}</span>
+                    </div>
+                `)
+                .join('');
+            break;
     }
-
-    // 時間導航
-    elements.timestamps.innerHTML = (data.timestamps || [])
-        .map(ts => `
-            <div class="timestamp-item">
-                <span class="timestamp-time">${escapeHtml(ts.time || '')}</span>
-                <span class="timestamp-topic">${escapeHtml(ts.topic || '')}</span>
-            </div>
-        `)
-        .join('');
 }
 
 // 顯示錯誤